@@ -1,11 +1,18 @@
 from flask import Flask, jsonify
 from flask_cors import CORS
 from flask_bcrypt import Bcrypt
-from flask_jwt_extended import JWTManager
+import asyncio
 import os
 import sys
 from dotenv import load_dotenv
 from app.utils.error_handlers import register_error_handlers
+from app.utils.metrics import register_request_metrics
+from app.utils.tracing import query_tracer
+from app.utils.circuit_breaker import configure_breakers, breaker_states, get_breaker
+from app.utils.jwt_verifier import CachedJWTManager
+from app.utils.cache_backends import configure_cache
+from app.models.data_type import data_type_cache
+from app.models.user import package_catalog_cache
 from app.models.token import RevokedToken
 import logging
 from supabase import create_client, Client
@@ -17,7 +24,7 @@ logger = logging.getLogger(__name__)
 
 # Initialize extensions
 bcrypt = Bcrypt()
-jwt = JWTManager()
+jwt = CachedJWTManager()
 
 def create_app(config_name=None):
     app = Flask(__name__)
@@ -103,16 +110,44 @@ def create_app(config_name=None):
     # Register error handlers
     register_error_handlers(app)
     
+    # Register per-request latency/query instrumentation and /metrics
+    register_request_metrics(app)
+    query_tracer.configure(app.config)
+    configure_breakers(app.config)
+    
+    # Select the cache backend shared by signed URLs, role checks and reference data
+    configure_cache(app.config)
+    
+    # Load reference data once per worker so lookups never wait on the database
+    data_type_cache.check_interval = app.config.get('DATA_TYPE_CACHE_CHECK_INTERVAL', 30)
+    package_catalog_cache.check_interval = app.config.get('TOKEN_PACKAGES_CACHE_CHECK_INTERVAL', 30)
+    if app.config.get('DATA_TYPE_CACHE_PRELOAD', True):
+        with app.app_context():
+            try:
+                asyncio.run(data_type_cache.refresh())
+            except Exception as e:
+                logger.warning(f"Could not preload data types, they will load on first use: {str(e)}")
+    
     # Register API v1 blueprints
     from app.api.v1.auth import auth_bp
     from app.api.v1.companies import companies_bp
     from app.api.v1.users import users_bp
     from app.api.v1.tokens import tokens_bp
+    from app.api.v1.admin import admin_bp
+    from app.api.v1.data_types import data_types_bp
+    from app.api.v1.consent import consent_bp
+    from app.api.v1.data_sharing_terms import data_sharing_terms_bp
+    from app.api.v1.user_preferences import user_preferences_bp
     
     app.register_blueprint(auth_bp, url_prefix='/api/v1/auth')
     app.register_blueprint(companies_bp, url_prefix='/api/v1/companies')
     app.register_blueprint(users_bp, url_prefix='/api/v1/users')
     app.register_blueprint(tokens_bp, url_prefix='/api/v1/tokens')
+    app.register_blueprint(admin_bp, url_prefix='/api/v1/admin')
+    app.register_blueprint(data_types_bp, url_prefix='/api/v1/data-types')
+    app.register_blueprint(consent_bp, url_prefix='/api/v1/consent')
+    app.register_blueprint(data_sharing_terms_bp, url_prefix='/api/v1/data-sharing-terms')
+    app.register_blueprint(user_preferences_bp, url_prefix='/api/v1/user-preferences')
     
     # Add a health check endpoint
     @app.route('/health')
@@ -120,17 +155,23 @@ def create_app(config_name=None):
         """Health check endpoint to verify the application is running."""
         health_status = {"status": "ok", "version": "1.0.0"}
         
-        # Check Supabase connection
+        # Check Supabase connection (skipped while the db circuit is open)
         if hasattr(app, 'supabase'):
-            try:
-                response = app.supabase.table("companies").select("count").limit(1).execute()
-                health_status["database"] = "connected"
-            except Exception as e:
-                health_status["database"] = "error"
-                health_status["database_error"] = str(e)
+            if get_breaker('db').is_open:
+                health_status["database"] = "circuit_open"
+            else:
+                try:
+                    response = app.supabase.table("companies").select("count").limit(1).execute()
+                    health_status["database"] = "connected"
+                except Exception as e:
+                    health_status["database"] = "error"
+                    health_status["database_error"] = str(e)
         else:
             health_status["database"] = "not_configured"
         
+        # Report circuit breaker state per dependency
+        health_status["circuit_breakers"] = breaker_states()
+        
         return jsonify(health_status)
     
     return app 
\ No newline at end of file
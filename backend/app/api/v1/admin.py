@@ -0,0 +1,65 @@
+from flask import Blueprint, jsonify, request
+from app.utils.auth import admin_required
+from app.utils.tracing import query_tracer
+from app.utils.error_handlers import APIError
+from app.models.user import User
+from app.repositories.compliance import ComplianceRepository
+from app.services.compliance import compute_policy_compliance
+from app.services.exposure import refresh_all_exposure
+
+admin_bp = Blueprint('admin', __name__)
+
+@admin_bp.route('/slow-queries', methods=['GET'])
+@admin_required
+def get_slow_queries():
+    """Get recent slow repository queries (admin only)."""
+    limit = request.args.get('limit', type=int)
+    return jsonify({
+        'threshold_ms': query_tracer.slow_threshold_ms,
+        'slow_queries': query_tracer.slow_queries(limit)
+    }), 200
+
+@admin_bp.route('/slow-queries', methods=['DELETE'])
+@admin_required
+def clear_slow_queries():
+    """Clear the slow query buffer (admin only)."""
+    query_tracer.clear()
+    return '', 204
+
+@admin_bp.route('/token-ledger/compact', methods=['POST'])
+@admin_required
+async def compact_token_ledger():
+    """Fold pending token ledger entries into materialized balances (admin only)."""
+    compacted = await User.compact_token_ledger()
+    if compacted is None:
+        raise APIError("Failed to compact token ledger")
+    return jsonify({'users_compacted': compacted}), 200
+
+@admin_bp.route('/policy-compliance', methods=['GET'])
+@admin_required
+async def get_policy_compliance():
+    """Get materialized per-policy consent counts, most disallowed first (admin only)."""
+    company_id = request.args.get('company_id', type=int)
+    limit = min(request.args.get('limit', 100, type=int), 1000)
+    offset = request.args.get('offset', 0, type=int)
+    results = await ComplianceRepository.get_results(company_id, limit, offset)
+    return jsonify({
+        'policies': [
+            {**row, 'disallowed_ratio': row['users_disallowed'] / row['users_total'] if row['users_total'] else 0.0}
+            for row in results
+        ]
+    }), 200
+
+@admin_bp.route('/policy-compliance/refresh', methods=['POST'])
+@admin_required
+async def refresh_policy_compliance():
+    """Recompute per-policy consent counts (admin only)."""
+    policies = await compute_policy_compliance()
+    return jsonify({'policies_computed': policies}), 200
+
+@admin_bp.route('/exposure/refresh', methods=['POST'])
+@admin_required
+async def refresh_exposure():
+    """Rebuild every user's materialized data exposure (admin only)."""
+    rows = await refresh_all_exposure()
+    return jsonify({'rows_written': rows}), 200
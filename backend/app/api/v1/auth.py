@@ -8,6 +8,9 @@ from app.models.token import RevokedToken
 from app.utils.error_handlers import (
     ValidationError, AuthenticationError, NotFoundError
 )
+from app.utils.circuit_breaker import get_breaker
+from app.utils.jwt_verifier import verify_supabase_token
+from app.utils.auth import get_cached_user_profile
 import datetime
 import uuid
 import logging
@@ -69,6 +72,34 @@ def register():
         logger.error(f"Registration error: {str(e)}", exc_info=True)
         raise
 
+def _jwt_fallback_login(data):
+    """Authenticate against our users table and issue our own JWTs."""
+    # Find user in our database
+    user = User.get_by_email(current_app.supabase, data['email'])
+    if not user or not User.verify_password(data['password'], user['password_hash']):
+        raise AuthenticationError('Invalid email or password')
+    
+    # Create our own tokens
+    access_token = create_access_token(identity=user['id'])
+    refresh_token = create_refresh_token(identity=user['id'])
+    
+    # Build response
+    response = {
+        'message': 'Login successful (via JWT fallback)',
+        'user': user,
+        'access_token': access_token,
+        'refresh_token': refresh_token,
+        'provider': 'jwt'
+    }
+    
+    # Add token expiration info
+    token_expires = datetime.datetime.now() + current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES', datetime.timedelta(hours=1))
+    response['token_expires_at'] = token_expires.isoformat()
+    
+    logger.info(f"User logged in via JWT fallback: {user['email']}")
+    
+    return jsonify(response), 200
+
 @auth_bp.route('/login', methods=['POST'])
 def login():
     """Login a user with Supabase authentication."""
@@ -79,12 +110,18 @@ def login():
         if 'email' not in data or 'password' not in data:
             raise ValidationError('Email and password are required')
         
+        # Skip the remote call entirely while Supabase auth is known to be failing
+        auth_breaker = get_breaker('auth')
+        if auth_breaker.is_open:
+            logger.warning("Supabase auth circuit is open, using JWT fallback")
+            return _jwt_fallback_login(data)
+        
         # First try to login with Supabase directly
         try:
             supabase = current_app.supabase
             
             # Use Supabase auth to sign in
-            auth_response = supabase.auth.sign_in_with_password({
+            auth_response = auth_breaker.call(supabase.auth.sign_in_with_password, {
                 "email": data['email'],
                 "password": data['password']
             })
@@ -139,32 +176,7 @@ def login():
         except Exception as supabase_error:
             # Log the error but fall back to JWT authentication
             logger.error(f"Supabase auth failed, falling back to JWT: {str(supabase_error)}", exc_info=True)
-            
-            # Find user in our database
-            user = User.get_by_email(current_app.supabase, data['email'])
-            if not user or not User.verify_password(data['password'], user['password_hash']):
-                raise AuthenticationError('Invalid email or password')
-            
-            # Create our own tokens
-            access_token = create_access_token(identity=user['id'])
-            refresh_token = create_refresh_token(identity=user['id'])
-            
-            # Build response
-            response = {
-                'message': 'Login successful (via JWT fallback)',
-                'user': user,
-                'access_token': access_token,
-                'refresh_token': refresh_token,
-                'provider': 'jwt'
-            }
-            
-            # Add token expiration info
-            token_expires = datetime.datetime.now() + current_app.config.get('JWT_ACCESS_TOKEN_EXPIRES', datetime.timedelta(hours=1))
-            response['token_expires_at'] = token_expires.isoformat()
-            
-            logger.info(f"User logged in via JWT fallback: {user['email']}")
-            
-            return jsonify(response), 200
+            return _jwt_fallback_login(data)
         
     except Exception as e:
         logger.error(f"Login error: {str(e)}", exc_info=True)
@@ -202,19 +214,28 @@ def me():
     try:
         current_user_id = get_jwt_identity()
         
-        # Try to get user from Supabase first by using the token
+        def load_user(user_id):
+            return User.get_by_id(current_app.supabase, user_id)
+        
+        # Resolve the Supabase user from the token, locally when possible
         auth_header = request.headers.get('Authorization')
         if auth_header and auth_header.startswith('Bearer '):
             token = auth_header.split(' ')[1]
             
             try:
-                # Try to get user with this token directly from Supabase
-                verify_result = current_app.supabase.auth.get_user(token)
-                if verify_result and verify_result.data and verify_result.data.user:
-                    supabase_user_id = verify_result.data.user.id
-                    
+                supabase_user_id = None
+                claims = verify_supabase_token(token)
+                if claims is not None:
+                    supabase_user_id = claims['sub']
+                else:
+                    # Local verification was inconclusive, ask Supabase directly
+                    verify_result = get_breaker('auth').call(current_app.supabase.auth.get_user, token)
+                    if verify_result and verify_result.data and verify_result.data.user:
+                        supabase_user_id = verify_result.data.user.id
+                
+                if supabase_user_id:
                     # If the token is valid, use that user ID instead of JWT identity
-                    user = User.get_by_id(current_app.supabase, supabase_user_id)
+                    user = get_cached_user_profile(supabase_user_id, load_user)
                     if user:
                         return jsonify({'user': user}), 200
                     else:
@@ -225,7 +246,7 @@ def me():
                 # Fall back to JWT-based identity
         
         # If Supabase verification failed or we didn't get a user, use JWT identity
-        user = User.get_by_id(current_app.supabase, current_user_id)
+        user = get_cached_user_profile(current_user_id, load_user)
         
         if not user:
             raise NotFoundError('The user no longer exists')
@@ -1,27 +1,94 @@
-from flask import Blueprint, request, jsonify
+from flask import Blueprint, current_app, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app.db import get_supabase
 from app.models.company import Company, DataSharingPolicy
 from app.models.user import User
-from app.schemas.company import CompanySchema
+from app.services.storage import CONTENT_PREFIX, SupabaseStorageService, resolve_logo_urls
+from app.services.images import schedule_logo_variants
+from app.services.company_graph import max_depth, related_companies, shortest_path
+from app.services.consent import coerce_id
+from app.repositories.company import DETAIL_INCLUDES, CompanyRepository
+from app.utils.request_args import parse_ids_arg
+from app.utils.error_handlers import ConflictError
 
 companies_bp = Blueprint('companies', __name__)
 
 @companies_bp.route('/', methods=['GET'])
 @jwt_required()
 async def get_companies():
-    """Get all companies for the current user (RLS compatible)."""
+    """
+    Get all companies for the current user (RLS compatible).
+    
+    With ``?ids=1,2,3`` returns those companies instead, in request order,
+    fetched in one query; ids that do not exist are listed in ``missing_ids``.
+    """
+    try:
+        ids = parse_ids_arg('ids', current_app.config.get('MULTI_GET_MAX_IDS', 500))
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid ids',
+            'message': str(e)
+        }), 400
+    
+    if ids is not None:
+        companies = await Company.find_by_ids(ids)
+        found = {company.id for company in companies}
+        return jsonify({
+            'companies': resolve_logo_urls([company.to_dict() for company in companies]),
+            'missing_ids': [id for id in ids if id not in found]
+        }), 200
+    
     current_user_id = get_jwt_identity()
     companies = await Company.get_user_companies(current_user_id)
     
     return jsonify({
-        'companies': [company.to_dict() for company in companies]
+        'companies': resolve_logo_urls([company.to_dict() for company in companies])
     }), 200
 
 @companies_bp.route('/<string:company_id>', methods=['GET'])
 @jwt_required()
 async def get_company(company_id):
-    """Get a specific company."""
+    """
+    Get a specific company.
+    
+    ``?include=policies,third_parties,data_types,related`` embeds the
+    company's data sharing policies (with their third parties and data
+    types) and related companies, all fetched in one database request.
+    """
+    include = [part for part in request.args.get('include', '').split(',') if part]
+    unknown = [part for part in include if part not in DETAIL_INCLUDES]
+    if unknown:
+        return jsonify({
+            'error': 'Invalid include',
+            'message': f"Unknown include: {', '.join(unknown)}; expected some of {', '.join(DETAIL_INCLUDES)}"
+        }), 400
+    
+    if not include:
+        company = await Company.find_by_id(company_id)
+        detail = company.to_dict() if company else None
+    else:
+        detail = await Company.get_detail(company_id, include)
+    
+    if not detail:
+        return jsonify({
+            'error': 'Company not found',
+            'message': 'The company does not exist'
+        }), 404
+    
+    # Sign every embedded company's logo in one batch
+    companies = [detail]
+    for policy in detail.get('policies', ()):
+        companies.extend(policy.get('third_parties', ()))
+    companies.extend(detail.get('related_companies', ()))
+    resolve_logo_urls(companies)
+    
+    return jsonify({
+        'company': detail
+    }), 200
+
+@companies_bp.route('/<string:company_id>/logo', methods=['POST'])
+@jwt_required()
+async def upload_company_logo(company_id):
+    """Upload a company's logo; resized variants are generated in the background."""
     company = await Company.find_by_id(company_id)
     
     if not company:
@@ -30,8 +97,43 @@ async def get_company(company_id):
             'message': 'The company does not exist'
         }), 404
     
+    # Only the company's owner or an administrator may replace its logo
+    current_user_id = get_jwt_identity()
+    if str(company.user_id) != str(current_user_id):
+        user = await User.find_by_id(current_user_id)
+        if not user or not user.is_admin:
+            return jsonify({
+                'error': 'Forbidden',
+                'message': "Only the company's owner or an administrator can change its logo"
+            }), 403
+    
+    logo_file = request.files.get('logo')
+    if not logo_file or not (logo_file.mimetype or '').startswith('image/'):
+        return jsonify({
+            'error': 'Invalid file',
+            'message': 'An image file is required in the "logo" field'
+        }), 400
+    
+    storage = SupabaseStorageService.get_instance()
+    stored = storage.store_content(logo_file)
+    previous_logo = company.logo
+    company.logo = stored['name']
+    try:
+        await company.save()
+    except Exception:
+        # Give back the reference taken by store_content
+        storage.delete_file(stored['name'])
+        raise
+    
+    # Identical logos share one object; drop this company's reference to the old one
+    if previous_logo and previous_logo.startswith(CONTENT_PREFIX):
+        storage.delete_file(previous_logo)
+    # Deduplicated logos may still be missing variants; the job only generates those
+    schedule_logo_variants(stored['name'])
+    
     return jsonify({
-        'company': company.to_dict()
+        'message': 'Logo uploaded successfully',
+        'company': resolve_logo_urls([company.to_dict()])[0]
     }), 200
 
 @companies_bp.route('/<string:company_id>/sharing-policies', methods=['GET'])
@@ -69,7 +171,78 @@ async def get_related_companies(company_id):
     
     return jsonify({
         'company': company.to_dict(),
-        'related_companies': [related_company.to_dict() for related_company in related]
+        'related_companies': resolve_logo_urls([related_company.to_dict() for related_company in related])
+    }), 200
+
+@companies_bp.route('/<string:company_id>/related', methods=['GET'])
+@jwt_required()
+async def get_related_companies_graph(company_id):
+    """
+    Get companies reachable from the specified company within ``depth`` hops.
+    
+    Hops follow company relationships and the third parties named in the
+    company's data sharing policies. Each company comes with its distance
+    and one shortest path.
+    """
+    company = await Company.find_by_id(company_id)
+    
+    if not company:
+        return jsonify({
+            'error': 'Company not found',
+            'message': 'The company does not exist'
+        }), 404
+    
+    depth = request.args.get('depth', 1, type=int)
+    if depth < 1 or depth > max_depth():
+        return jsonify({
+            'error': 'Invalid depth',
+            'message': f'depth must be between 1 and {max_depth()}'
+        }), 400
+    
+    related = await related_companies(company.id, depth)
+    companies = await CompanyRepository.find_by_ids(item['company_id'] for item in related)
+    related = [item for item in related if item['company_id'] in companies]
+    resolved = resolve_logo_urls([companies[item['company_id']].to_dict() for item in related])
+    
+    return jsonify({
+        'company': company.to_dict(),
+        'depth': depth,
+        'related_companies': [
+            dict(related_company, distance=item['distance'], path=item['path'])
+            for related_company, item in zip(resolved, related)
+        ]
+    }), 200
+
+@companies_bp.route('/<string:company_id>/path/<string:target_id>', methods=['GET'])
+@jwt_required()
+async def get_company_path(company_id, target_id):
+    """Get a shortest chain of relationships from one company to another."""
+    depth = request.args.get('depth', max_depth(), type=int)
+    if depth < 1 or depth > max_depth():
+        return jsonify({
+            'error': 'Invalid depth',
+            'message': f'depth must be between 1 and {max_depth()}'
+        }), 400
+    
+    # Check both ends in one lookup before searching the graph
+    if await Company.find_missing_ids([coerce_id(company_id), coerce_id(target_id)]):
+        return jsonify({
+            'error': 'Company not found',
+            'message': 'The company does not exist'
+        }), 404
+    
+    path = await shortest_path(company_id, target_id, depth)
+    if path is None:
+        return jsonify({
+            'error': 'No path found',
+            'message': f'The companies are not connected within {depth} hops'
+        }), 404
+    
+    return jsonify({
+        'source_company_id': company_id,
+        'target_company_id': target_id,
+        'distance': len(path),
+        'path': path
     }), 200
 
 # Routes for creating and managing companies
@@ -96,16 +269,7 @@ async def create_company():
                 'message': 'Name is required'
             }), 400
         
-        # Check if company with same name already exists
-        supabase = get_supabase()
-        existing = supabase.table('companies').select('*').eq('name', data['name']).execute()
-        if existing.data and len(existing.data) > 0:
-            return jsonify({
-                'error': 'Company exists',
-                'message': 'A company with this name already exists'
-            }), 409
-            
-        # Direct insertion method (similar to generate_dummy_data_final.py)
+        # Duplicate names are rejected by the unique constraint on the normalized name
         company_data = {
             'name': data['name'],
             'user_id': current_user_id,  # Set the user_id for RLS
@@ -119,24 +283,19 @@ async def create_company():
             'country': data.get('country')
         }
         
-        # Direct insertion using Supabase client
+        # Single round trip: the insert itself detects duplicates
         try:
-            response = supabase.table('companies').insert(company_data).execute()
+            company = Company(await CompanyRepository.insert(company_data))
             
-            if response.data and len(response.data) > 0:
-                # Convert the response data to a Company object
-                company_schema = CompanySchema.from_dict(response.data[0])
-                company = Company(company_schema)
-                
-                return jsonify({
-                    'message': 'Company created successfully',
-                    'company': company.to_dict()
-                }), 201
-            else:
-                return jsonify({
-                    'error': 'Database error',
-                    'message': 'Failed to create company: No data returned from database'
-                }), 500
+            return jsonify({
+                'message': 'Company created successfully',
+                'company': company.to_dict()
+            }), 201
+        except ConflictError as e:
+            return jsonify({
+                'error': 'Company exists',
+                'message': e.message
+            }), 409
         except Exception as e:
             return jsonify({
                 'error': 'Database error',
@@ -196,28 +355,23 @@ async def create_companies_bulk():
             }
             companies_data.append(company_data)
         
-        # Direct bulk insertion using Supabase client (similar to generate_dummy_data_final.py)
-        supabase = get_supabase()
+        # One insert; names that already exist (or repeat within the request) are skipped and reported
         try:
-            response = supabase.table('companies').insert(companies_data).execute()
+            created, conflicts = await CompanyRepository.insert_many(companies_data)
+            conflicting_names = [companies_data[index]['name'] for index in conflicts]
             
-            if response.data and len(response.data) > 0:
-                # Convert response data to Company objects
-                created_companies = []
-                for company_data in response.data:
-                    company_schema = CompanySchema.from_dict(company_data)
-                    company = Company(company_schema)
-                    created_companies.append(company.to_dict())
-                
-                return jsonify({
-                    'message': f'Successfully created {len(created_companies)} companies',
-                    'companies': created_companies
-                }), 201
-            else:
+            if not created:
                 return jsonify({
-                    'error': 'Database error',
-                    'message': 'Failed to create companies: No data returned from database'
-                }), 500
+                    'error': 'Company exists',
+                    'message': 'All of these companies already exist',
+                    'conflicts': conflicting_names
+                }), 409
+            
+            return jsonify({
+                'message': f'Successfully created {len(created)} companies',
+                'companies': [Company(schema).to_dict() for schema in created],
+                'conflicts': conflicting_names
+            }), 201
         except Exception as e:
             return jsonify({
                 'error': 'Database error',
@@ -0,0 +1,66 @@
+from flask import Blueprint, Response, current_app, jsonify, request, stream_with_context
+from app.services.consent import check_consent_bulk
+from app.utils.auth import admin_required
+
+consent_bp = Blueprint('consent', __name__)
+
+# Results per chunk written to the streamed response
+RESULT_CHUNK_SIZE = 1000
+
+@consent_bp.route('/check', methods=['POST'])
+@admin_required
+async def check_consent():
+    """
+    Check consent for many (user, company, data type) tuples (partner integrations).
+
+    The body is ``{"checks": [...]}`` where each check is either an object with
+    ``user_id``, ``company_id`` and ``data_type_id`` or a
+    ``[user_id, company_id, data_type_id]`` array; a null ``company_id`` asks
+    about the user's global preference. Results are streamed back in request
+    order as ``{"results": [{..., "allowed": bool}, ...]}``.
+    """
+    data = request.get_json(silent=True) or {}
+    raw_checks = data.get('checks')
+
+    if not isinstance(raw_checks, list) or not raw_checks:
+        return jsonify({
+            'error': 'Invalid data',
+            'message': 'checks must be a non-empty array'
+        }), 400
+
+    max_checks = current_app.config.get('CONSENT_CHECK_MAX_BATCH', 20000)
+    if len(raw_checks) > max_checks:
+        return jsonify({
+            'error': 'Too many checks',
+            'message': f'At most {max_checks} checks are allowed per request'
+        }), 400
+
+    checks = []
+    for index, check in enumerate(raw_checks):
+        try:
+            if isinstance(check, dict):
+                user_id, company_id, data_type_id = check['user_id'], check.get('company_id'), check['data_type_id']
+            else:
+                user_id, company_id, data_type_id = check
+            checks.append((int(user_id), None if company_id is None else int(company_id), int(data_type_id)))
+        except (KeyError, TypeError, ValueError):
+            return jsonify({
+                'error': 'Invalid check',
+                'message': f'Check {index} must have integer user_id and data_type_id and an integer or null company_id'
+            }), 400
+
+    # Everything is resolved before streaming; the stream only encodes
+    results = await check_consent_bulk(checks)
+
+    def generate():
+        yield '{"results":['
+        for start in range(0, len(checks), RESULT_CHUNK_SIZE):
+            yield (',' if start else '') + ','.join(
+                f'{{"user_id":{user_id},"company_id":{"null" if company_id is None else company_id},'
+                f'"data_type_id":{data_type_id},"allowed":{"true" if allowed else "false"}}}'
+                for (user_id, company_id, data_type_id), allowed
+                in zip(checks[start:start + RESULT_CHUNK_SIZE], results[start:start + RESULT_CHUNK_SIZE])
+            )
+        yield ']}'
+
+    return Response(stream_with_context(generate()), mimetype='application/json')
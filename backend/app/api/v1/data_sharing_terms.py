@@ -1,26 +1,26 @@
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
 from app.models.company import DataSharingPolicy, Company
 from app.models.data_type import DataType
-from app.models.user import User
+from app.schemas.company import DataSharingPolicySchema
+from app.utils.auth import admin_required
 
 data_sharing_terms_bp = Blueprint('data_sharing_terms', __name__)
 
 @data_sharing_terms_bp.route('/', methods=['GET'])
 @jwt_required()
-def get_data_sharing_terms():
+async def get_data_sharing_terms():
     """Get all data sharing terms."""
-    terms = DataSharingPolicy.query.all()
+    terms = await DataSharingPolicy.get_all()
     return jsonify({
         'data_sharing_terms': [term.to_dict() for term in terms]
     }), 200
 
 @data_sharing_terms_bp.route('/<string:term_id>', methods=['GET'])
 @jwt_required()
-def get_data_sharing_term(term_id):
-    """Get a specific data sharing term."""
-    term = DataSharingPolicy.query.get(term_id)
+async def get_data_sharing_term(term_id):
+    """Get a specific data sharing term with its third parties."""
+    term = await DataSharingPolicy.find_by_id(term_id)
     
     if not term:
         return jsonify({
@@ -29,24 +29,41 @@ def get_data_sharing_term(term_id):
         }), 404
     
     return jsonify({
-        'data_sharing_term': term.to_dict()
+        'data_sharing_term': dict(term.to_dict(), third_party_ids=await term.get_third_party_ids())
     }), 200
 
 # Admin routes for creating and managing data sharing terms
 
-@data_sharing_terms_bp.route('/', methods=['POST'])
-@jwt_required()
-def create_data_sharing_term():
-    """Create a new data sharing term (admin only)."""
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    
-    if not user or not user.is_admin:
+def _parse_company_ids(value):
+    """Parse a list of company ids, dropping duplicates; None if it is not a list of integers."""
+    if not isinstance(value, list):
+        return None
+    try:
+        return list(dict.fromkeys(int(company_id) for company_id in value))
+    except (TypeError, ValueError):
+        return None
+
+async def _third_parties_error(company_ids):
+    """Validate third-party ids with one lookup; returns an error response or None."""
+    if company_ids is None:
         return jsonify({
-            'error': 'Forbidden',
-            'message': 'Only administrators can create data sharing terms'
-        }), 403
+            'error': 'Invalid data',
+            'message': 'third party ids must be an array of integers'
+        }), 400
     
+    missing = await Company.find_missing_ids(company_ids)
+    if missing:
+        return jsonify({
+            'error': 'Not found',
+            'message': 'Some companies were not found',
+            'missing_company_ids': missing
+        }), 404
+    return None
+
+@data_sharing_terms_bp.route('/', methods=['POST'])
+@admin_required
+async def create_data_sharing_term():
+    """Create a new data sharing term (admin only)."""
     data = request.get_json()
     
     # Validate required fields
@@ -59,92 +76,120 @@ def create_data_sharing_term():
             }), 400
     
     # Validate company exists
-    company = Company.query.get(data['company_id'])
+    company = await Company.find_by_id(data['company_id'])
     if not company:
         return jsonify({
             'error': 'Not found',
             'message': 'Company not found'
         }), 404
     
-    # Validate data type exists
-    data_type = DataType.query.get(data['data_type_id'])
-    if not data_type:
+    # Validate data type exists (in-memory reference-data lookup)
+    if not await DataType.exists(data['data_type_id']):
         return jsonify({
             'error': 'Not found',
             'message': 'Data type not found'
         }), 404
     
+    # Validate every third party before writing anything
+    third_party_ids = []
+    if 'third_party_ids' in data:
+        third_party_ids = _parse_company_ids(data['third_party_ids'])
+        error = await _third_parties_error(third_party_ids)
+        if error:
+            return error
+    
     # Create new data sharing term
-    term = DataSharingPolicy(
-        company_id=data['company_id'],
+    term = DataSharingPolicy(DataSharingPolicySchema(
+        company_id=company.id,
         data_type_id=data['data_type_id'],
         purpose=data['purpose'],
         description=data.get('description')
-    )
-    
-    # Add third parties if provided
-    if 'third_party_ids' in data and isinstance(data['third_party_ids'], list):
-        for company_id in data['third_party_ids']:
-            third_party = Company.query.get(company_id)
-            if third_party:
-                term.third_parties.append(third_party)
-    
-    # Save to database
-    db.session.add(term)
-    db.session.commit()
+    ))
+    await term.save(third_party_ids)
     
     return jsonify({
         'message': 'Data sharing term created successfully',
-        'data_sharing_term': term.to_dict()
+        'data_sharing_term': dict(term.to_dict(), third_party_ids=third_party_ids)
     }), 201
 
 @data_sharing_terms_bp.route('/<string:term_id>/third-parties', methods=['POST'])
-@jwt_required()
-def add_third_party(term_id):
-    """Add a third party to a data sharing term (admin only)."""
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    
-    if not user or not user.is_admin:
-        return jsonify({
-            'error': 'Forbidden',
-            'message': 'Only administrators can modify data sharing terms'
-        }), 403
-    
-    term = DataSharingPolicy.query.get(term_id)
+@admin_required
+async def add_third_parties(term_id):
+    """
+    Add third parties to a data sharing term (admin only).
+    
+    The body is ``{"company_ids": [...]}`` (or a single ``company_id``).
+    Companies that are already third parties are left as they are.
+    """
+    term = await DataSharingPolicy.find_by_id(term_id)
     if not term:
         return jsonify({
             'error': 'Not found',
             'message': 'Data sharing term not found'
         }), 404
     
-    data = request.get_json()
+    data = request.get_json() or {}
     
-    if 'company_id' not in data:
+    if 'company_ids' not in data and 'company_id' not in data:
         return jsonify({
             'error': 'Missing field',
-            'message': 'company_id is required'
+            'message': 'company_ids is required'
         }), 400
     
-    company = Company.query.get(data['company_id'])
-    if not company:
-        return jsonify({
-            'error': 'Not found',
-            'message': 'Company not found'
-        }), 404
+    company_ids = _parse_company_ids(data['company_ids'] if 'company_ids' in data else [data['company_id']])
+    error = await _third_parties_error(company_ids)
+    if error:
+        return error
+    
+    added = await term.add_third_parties(company_ids)
     
-    # Check if already a third party
-    if company in term.third_parties:
+    # A single company that was already attached is still a conflict
+    if 'company_ids' not in data and not added:
         return jsonify({
             'error': 'Conflict',
             'message': 'Company is already a third party for this term'
         }), 409
     
-    # Add third party
-    term.third_parties.append(company)
-    db.session.commit()
+    return jsonify({
+        'message': 'Third parties added successfully',
+        'added_company_ids': added,
+        'data_sharing_term': dict(term.to_dict(), third_party_ids=await term.get_third_party_ids())
+    }), 200
+
+@data_sharing_terms_bp.route('/<string:term_id>/third-parties', methods=['PUT'])
+@admin_required
+async def replace_third_parties(term_id):
+    """
+    Replace the full set of third parties of a data sharing term (admin only).
+    
+    The body is ``{"company_ids": [...]}``; only the difference from the
+    current set is written.
+    """
+    term = await DataSharingPolicy.find_by_id(term_id)
+    if not term:
+        return jsonify({
+            'error': 'Not found',
+            'message': 'Data sharing term not found'
+        }), 404
+    
+    data = request.get_json() or {}
+    
+    if 'company_ids' not in data:
+        return jsonify({
+            'error': 'Missing field',
+            'message': 'company_ids is required'
+        }), 400
+    
+    company_ids = _parse_company_ids(data['company_ids'])
+    error = await _third_parties_error(company_ids)
+    if error:
+        return error
+    
+    added, removed = await term.set_third_parties(company_ids)
     
     return jsonify({
-        'message': 'Third party added successfully',
-        'data_sharing_term': term.to_dict()
-    }), 200 
\ No newline at end of file
+        'message': 'Third parties updated successfully',
+        'added_company_ids': added,
+        'removed_company_ids': removed,
+        'data_sharing_term': dict(term.to_dict(), third_party_ids=company_ids)
+    }), 200
@@ -1,25 +1,49 @@
-from flask import Blueprint, request, jsonify
-from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
+from flask import Blueprint, current_app, request, jsonify
+from flask_jwt_extended import jwt_required
 from app.models.data_type import DataType
-from app.models.user import User
+from app.schemas.data_type import DataTypeSchema
+from app.utils.auth import admin_required
+from app.utils.http_cache import conditional_json
+from app.utils.request_args import parse_ids_arg
 
 data_types_bp = Blueprint('data_types', __name__)
 
 @data_types_bp.route('/', methods=['GET'])
 @jwt_required()
-def get_data_types():
-    """Get all data types."""
-    data_types = DataType.query.all()
-    return jsonify({
+async def get_data_types():
+    """
+    Get all data types.
+    
+    With ``?ids=1,2,3`` returns those data types instead, in request order;
+    ids that do not exist are listed in ``missing_ids``.
+    """
+    try:
+        ids = parse_ids_arg('ids', current_app.config.get('MULTI_GET_MAX_IDS', 500))
+    except ValueError as e:
+        return jsonify({
+            'error': 'Invalid ids',
+            'message': str(e)
+        }), 400
+    
+    if ids is not None:
+        data_types = await DataType.find_by_ids(ids)
+        found = {data_type.id for data_type in data_types}
+        return conditional_json({
+            'data_types': [data_type.to_dict() for data_type in data_types],
+            'missing_ids': [id for id in ids if id not in found]
+        }, public=False)
+    
+    data_types = await DataType.get_all()
+    # Data types only change with the reference-data version, so it doubles as the ETag
+    return conditional_json({
         'data_types': [data_type.to_dict() for data_type in data_types]
-    }), 200
+    }, etag=f'data-types-{await DataType.cache_version()}', public=False)
 
 @data_types_bp.route('/<string:data_type_id>', methods=['GET'])
 @jwt_required()
-def get_data_type(data_type_id):
+async def get_data_type(data_type_id):
     """Get a specific data type."""
-    data_type = DataType.query.get(data_type_id)
+    data_type = await DataType.find_by_id(data_type_id)
     
     if not data_type:
         return jsonify({
@@ -34,18 +58,9 @@ def get_data_type(data_type_id):
 # Admin routes for creating and managing data types
 
 @data_types_bp.route('/', methods=['POST'])
-@jwt_required()
-def create_data_type():
+@admin_required
+async def create_data_type():
     """Create a new data type (admin only)."""
-    current_user_id = get_jwt_identity()
-    user = User.query.get(current_user_id)
-    
-    if not user or not user.is_admin:
-        return jsonify({
-            'error': 'Forbidden',
-            'message': 'Only administrators can create data types'
-        }), 403
-    
     data = request.get_json()
     
     # Validate required fields
@@ -56,26 +71,74 @@ def create_data_type():
         }), 400
     
     # Check if data type already exists
-    existing_data_type = DataType.query.filter_by(name=data['name']).first()
+    existing_data_type = await DataType.find_by_name(data['name'])
     if existing_data_type:
         return jsonify({
             'error': 'Data type exists',
             'message': 'A data type with this name already exists'
         }), 409
     
-    # Create new data type
-    data_type = DataType(
+    # Create new data type; saving bumps the reference-data version
+    data_type = DataType(DataTypeSchema(
         name=data['name'],
         description=data.get('description'),
         category=data.get('category'),
         sensitivity_level=data.get('sensitivity_level')
-    )
-    
-    # Save to database
-    db.session.add(data_type)
-    db.session.commit()
+    ))
+    await data_type.save()
     
     return jsonify({
         'message': 'Data type created successfully',
         'data_type': data_type.to_dict()
-    }), 201 
\ No newline at end of file
+    }), 201
+
+@data_types_bp.route('/<string:data_type_id>', methods=['PUT'])
+@admin_required
+async def update_data_type(data_type_id):
+    """Update a data type (admin only)."""
+    data_type = await DataType.find_by_id(data_type_id)
+    
+    if not data_type:
+        return jsonify({
+            'error': 'Data type not found',
+            'message': 'The data type does not exist'
+        }), 404
+    
+    data = request.get_json()
+    
+    if 'name' in data:
+        existing_data_type = await DataType.find_by_name(data['name'])
+        if existing_data_type and existing_data_type.id != data_type.id:
+            return jsonify({
+                'error': 'Data type exists',
+                'message': 'A data type with this name already exists'
+            }), 409
+    
+    # Cached schemas are shared, so edit a copy
+    schema = DataTypeSchema.from_dict({**data_type.to_dict(), **{
+        field: data[field]
+        for field in ('name', 'description', 'category', 'sensitivity_level')
+        if field in data
+    }})
+    data_type = DataType(schema)
+    await data_type.save()
+    
+    return jsonify({
+        'message': 'Data type updated successfully',
+        'data_type': data_type.to_dict()
+    }), 200
+
+@data_types_bp.route('/<string:data_type_id>', methods=['DELETE'])
+@admin_required
+async def delete_data_type(data_type_id):
+    """Delete a data type (admin only)."""
+    data_type = await DataType.find_by_id(data_type_id)
+    
+    if not data_type:
+        return jsonify({
+            'error': 'Data type not found',
+            'message': 'The data type does not exist'
+        }), 404
+    
+    await data_type.delete()
+    return '', 204
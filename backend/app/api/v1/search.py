@@ -25,14 +25,18 @@ async def search():
     # Search companies
     companies = supabase.table('companies').select('*').ilike('name', f'%{query}%').execute()
     
-    # Search data types
-    data_types = supabase.table('data_types').select('*').ilike('name', f'%{query}%').execute()
+    # Search data types in the reference-data cache
+    needle = query.lower()
+    data_types = [
+        data_type.to_dict() for data_type in await DataType.get_all()
+        if needle in data_type.name.lower()
+    ]
     
     # Search user preferences
     preferences = supabase.table('user_preferences').select('*').eq('user_id', current_user_id).execute()
     
     return jsonify({
         'companies': companies.data,
-        'data_types': data_types.data,
+        'data_types': data_types,
         'preferences': preferences.data
     }) 
\ No newline at end of file
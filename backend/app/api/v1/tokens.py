@@ -1,18 +1,22 @@
-from flask import Blueprint, jsonify, request
+from flask import Blueprint, jsonify, request, current_app
 from app.models.user import TokenPackage
 from app.repositories.user import TokenPackageRepository
+from app.schemas.user import TokenPackageSchema
 from app.utils.error_handlers import APIError
 from app.utils.auth import admin_required
+from app.utils.http_cache import conditional_json
 
 tokens_bp = Blueprint('tokens', __name__)
 
+def _catalog_max_age():
+    return current_app.config.get('TOKEN_PACKAGES_MAX_AGE', 60)
+
 @tokens_bp.route('/packages', methods=['GET'])
 async def get_token_packages():
     """Get all available token packages."""
     try:
-        repository = TokenPackageRepository()
-        packages = await repository.get_all()
-        return jsonify([package.model_dump() for package in packages])
+        packages, etag = await TokenPackage.get_catalog()
+        return conditional_json(packages, etag=etag, max_age=_catalog_max_age())
     except Exception as e:
         raise APIError(f"Failed to get token packages: {str(e)}")
 
@@ -20,11 +24,13 @@ async def get_token_packages():
 async def get_token_package(package_id):
     """Get a specific token package by ID."""
     try:
-        repository = TokenPackageRepository()
-        package = await repository.find_by_id(package_id)
+        packages, _ = await TokenPackage.get_catalog()
+        package = next((package for package in packages if package['id'] == package_id), None)
         if not package:
             raise APIError("Token package not found", status_code=404)
-        return jsonify(package.model_dump())
+        return conditional_json(package, max_age=_catalog_max_age())
+    except APIError:
+        raise
     except Exception as e:
         raise APIError(f"Failed to get token package: {str(e)}")
 
@@ -35,7 +41,7 @@ async def create_token_package():
     try:
         data = request.get_json()
         repository = TokenPackageRepository()
-        package = TokenPackage(
+        package = TokenPackageSchema(
             name=data['name'],
             amount=data['amount'],
             price=data['price'],
@@ -44,6 +50,7 @@ async def create_token_package():
         saved_package = await repository.create(package)
         if not saved_package:
             raise APIError("Failed to create token package")
+        TokenPackage.invalidate_catalog()
         return jsonify(saved_package.model_dump()), 201
     except Exception as e:
         raise APIError(f"Failed to create token package: {str(e)}")
@@ -67,6 +74,7 @@ async def update_token_package(package_id):
         updated_package = await repository.update(package)
         if not updated_package:
             raise APIError("Failed to update token package")
+        TokenPackage.invalidate_catalog()
         return jsonify(updated_package.model_dump())
     except Exception as e:
         raise APIError(f"Failed to update token package: {str(e)}")
@@ -80,6 +88,7 @@ async def delete_token_package(package_id):
         success = await repository.delete(package_id)
         if not success:
             raise APIError("Failed to delete token package")
+        TokenPackage.invalidate_catalog()
         return '', 204
     except Exception as e:
         raise APIError(f"Failed to delete token package: {str(e)}") 
\ No newline at end of file
@@ -1,24 +1,31 @@
+import asyncio
 from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
-from app import db
 from app.models.preference import UserPreference, UserProfilePreference
+from app.schemas.preference import UserPreferenceSchema, UserProfilePreferenceSchema
 from app.models.data_type import DataType
 from app.models.company import Company
 from app.models.user import User
 
 user_preferences_bp = Blueprint('user_preferences', __name__)
 
+# Profile preference fields a client may set
+PROFILE_FIELDS = (
+    'email_notifications', 'notification_frequency', 'notification_types', 'privacy_level',
+    'auto_delete_data', 'data_retention_period', 'theme', 'language', 'timezone'
+)
+
 @user_preferences_bp.route('/', methods=['GET'])
 @jwt_required()
-def get_user_preferences():
+async def get_user_preferences():
     """Get all preferences for the current user."""
     current_user_id = get_jwt_identity()
     
     # Get data type preferences
-    preferences = UserPreference.query.filter_by(user_id=current_user_id).all()
+    preferences = await UserPreference.get_user_preferences(current_user_id)
     
     # Get profile preferences
-    profile_prefs = UserProfilePreference.query.filter_by(user_id=current_user_id).first()
+    profile_prefs = await UserProfilePreference.find_by_user(current_user_id)
     
     return jsonify({
         'data_preferences': [pref.to_dict() for pref in preferences],
@@ -27,7 +34,7 @@ def get_user_preferences():
 
 @user_preferences_bp.route('/data', methods=['POST'])
 @jwt_required()
-def set_data_preference():
+async def set_data_preference():
     """Set a data sharing preference."""
     current_user_id = get_jwt_identity()
     data = request.get_json()
@@ -41,9 +48,8 @@ def set_data_preference():
                 'message': f'{field} is required'
             }), 400
     
-    # Validate data type exists
-    data_type = DataType.query.get(data['data_type_id'])
-    if not data_type:
+    # Validate data type exists (in-memory reference-data lookup)
+    if not await DataType.exists(data['data_type_id']):
         return jsonify({
             'error': 'Not found',
             'message': 'Data type not found'
@@ -52,7 +58,7 @@ def set_data_preference():
     # If company_id is provided, validate company exists
     company = None
     if 'company_id' in data and data['company_id']:
-        company = Company.query.get(data['company_id'])
+        company = await Company.find_by_id(data['company_id'])
         if not company:
             return jsonify({
                 'error': 'Not found',
@@ -60,26 +66,26 @@ def set_data_preference():
             }), 404
     
     # Check if preference already exists
-    preference = UserPreference.query.filter_by(
-        user_id=current_user_id,
-        data_type_id=data['data_type_id'],
-        company_id=data.get('company_id')
-    ).first()
+    preference = await UserPreference.find(
+        current_user_id,
+        data['data_type_id'],
+        data.get('company_id') or None
+    )
     
     if preference:
         # Update existing preference
         preference.allowed = data['allowed']
     else:
         # Create new preference
-        preference = UserPreference(
+        preference = UserPreference(UserPreferenceSchema(
             user_id=current_user_id,
             data_type_id=data['data_type_id'],
-            company_id=data.get('company_id'),
-            allowed=data['allowed']
-        )
-        db.session.add(preference)
+            company_id=data.get('company_id') or None,
+            allowed=bool(data['allowed'])
+        ))
     
-    db.session.commit()
+    # Saving also drops the user's compiled consent rules
+    await preference.save()
     
     return jsonify({
         'message': 'Preference updated successfully',
@@ -88,47 +94,22 @@ def set_data_preference():
 
 @user_preferences_bp.route('/profile', methods=['POST'])
 @jwt_required()
-def set_profile_preferences():
+async def set_profile_preferences():
     """Set user profile preferences."""
     current_user_id = get_jwt_identity()
-    data = request.get_json()
+    data = request.get_json() or {}
     
     # Find existing profile preferences or create new ones
-    profile_prefs = UserProfilePreference.query.filter_by(user_id=current_user_id).first()
-    
+    profile_prefs = await UserProfilePreference.find_by_user(current_user_id)
     if not profile_prefs:
-        profile_prefs = UserProfilePreference(user_id=current_user_id)
-        db.session.add(profile_prefs)
+        profile_prefs = UserProfilePreference(UserProfilePreferenceSchema(user_id=current_user_id))
     
     # Update fields that are provided
-    if 'email_notifications' in data:
-        profile_prefs.email_notifications = data['email_notifications']
-    
-    if 'notification_frequency' in data:
-        profile_prefs.notification_frequency = data['notification_frequency']
-    
-    if 'notification_types' in data:
-        profile_prefs.notification_types = data['notification_types']
-    
-    if 'privacy_level' in data:
-        profile_prefs.privacy_level = data['privacy_level']
-    
-    if 'auto_delete_data' in data:
-        profile_prefs.auto_delete_data = data['auto_delete_data']
+    for field in PROFILE_FIELDS:
+        if field in data:
+            setattr(profile_prefs._schema, field, data[field])
     
-    if 'data_retention_period' in data:
-        profile_prefs.data_retention_period = data['data_retention_period']
-    
-    if 'theme' in data:
-        profile_prefs.theme = data['theme']
-    
-    if 'language' in data:
-        profile_prefs.language = data['language']
-    
-    if 'timezone' in data:
-        profile_prefs.timezone = data['timezone']
-    
-    db.session.commit()
+    await profile_prefs.save()
     
     return jsonify({
         'message': 'Profile preferences updated successfully',
@@ -137,7 +118,7 @@ def set_profile_preferences():
 
 @user_preferences_bp.route('/data/clone', methods=['POST'])
 @jwt_required()
-def clone_preferences():
+async def clone_preferences():
     """Clone preferences from one company to another."""
     current_user_id = get_jwt_identity()
     data = request.get_json()
@@ -150,8 +131,11 @@ def clone_preferences():
         }), 400
     
     # Validate companies exist
-    source_company = Company.query.get(data['source_company_id'])
-    target_company = Company.query.get(data['target_company_id'])
+    # Looked up concurrently so both ids share one query
+    source_company, target_company = await asyncio.gather(
+        Company.find_by_id(data['source_company_id']),
+        Company.find_by_id(data['target_company_id'])
+    )
     
     if not source_company or not target_company:
         return jsonify({
@@ -159,21 +143,18 @@ def clone_preferences():
             'message': 'Source or target company not found'
         }), 404
     
-    # Get source company preferences
-    source_prefs = UserPreference.query.filter_by(
-        user_id=current_user_id,
-        company_id=data['source_company_id']
-    ).all()
+    # Get source and existing target preferences in one query each
+    source_prefs = await UserPreference.get_user_preferences(current_user_id, data['source_company_id'])
+    target_prefs = {
+        pref.data_type_id: pref
+        for pref in await UserPreference.get_user_preferences(current_user_id, data['target_company_id'])
+    }
     
-    # Clone preferences to target company
+    # Clone preferences to target company, written together so consent and
+    # exposure are refreshed once
     cloned_prefs = []
     for pref in source_prefs:
-        # Check if preference already exists for target
-        existing_pref = UserPreference.query.filter_by(
-            user_id=current_user_id,
-            data_type_id=pref.data_type_id,
-            company_id=data['target_company_id']
-        ).first()
+        existing_pref = target_prefs.get(pref.data_type_id)
         
         if existing_pref:
             # Update existing preference
@@ -181,16 +162,13 @@ def clone_preferences():
             cloned_prefs.append(existing_pref)
         else:
             # Create new preference
-            new_pref = UserPreference(
+            cloned_prefs.append(UserPreference(UserPreferenceSchema(
                 user_id=current_user_id,
                 data_type_id=pref.data_type_id,
-                company_id=data['target_company_id'],
+                company_id=target_company.id,
                 allowed=pref.allowed
-            )
-            db.session.add(new_pref)
-            cloned_prefs.append(new_pref)
-    
-    db.session.commit()
+            )))
+    await UserPreference.save_many(current_user_id, cloned_prefs)
     
     return jsonify({
         'message': 'Preferences cloned successfully',
@@ -2,6 +2,8 @@ from flask import Blueprint, request, jsonify
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app import db
 from app.models.user import User
+from app.utils.auth import invalidate_user_profile, invalidate_admin_role
+from app.services.exposure import get_user_exposure
 
 users_bp = Blueprint('users', __name__)
 
@@ -23,6 +25,15 @@ def get_users():
         'users': [user.to_dict() for user in users]
     }), 200
 
+@users_bp.route('/me/exposure', methods=['GET'])
+@jwt_required()
+async def get_my_exposure():
+    """Get every company that can receive each of the current user's data types."""
+    current_user_id = get_jwt_identity()
+    return jsonify({
+        'exposure': await get_user_exposure(current_user_id)
+    }), 200
+
 @users_bp.route('/<string:user_id>', methods=['GET'])
 @jwt_required()
 def get_user(user_id):
@@ -50,10 +61,10 @@ def get_user(user_id):
 
 @users_bp.route('/<string:user_id>/tokens', methods=['POST'])
 @jwt_required()
-def add_tokens(user_id):
+async def add_tokens(user_id):
     """Add tokens to a user (admin only)."""
     current_user_id = get_jwt_identity()
-    current_user = User.query.get(current_user_id)
+    current_user = await User.find_by_id(current_user_id)
     
     if not current_user or not current_user.is_admin:
         return jsonify({
@@ -61,27 +72,107 @@ def add_tokens(user_id):
             'message': 'Only administrators can add tokens to users'
         }), 403
     
-    user = User.query.get(user_id)
-    if not user:
+    data = request.get_json()
+    
+    if 'amount' not in data or not isinstance(data['amount'], int) or data['amount'] <= 0:
+        return jsonify({
+            'error': 'Invalid input',
+            'message': 'Amount must be a positive integer'
+        }), 400
+    
+    # Appends one ledger entry; the users row is not touched
+    new_balance = await User.adjust_balance(
+        user_id,
+        data['amount'],
+        reason=data.get('reason', 'admin_grant')
+    )
+    if new_balance is None:
         return jsonify({
             'error': 'Not found',
             'message': 'User not found'
         }), 404
     
+    invalidate_user_profile(user_id)
+    
+    return jsonify({
+        'message': f'{data["amount"]} tokens added to user',
+        'user': {'id': user_id, 'tokens': new_balance}
+    }), 200
+
+@users_bp.route('/tokens/bulk', methods=['POST'])
+@jwt_required()
+async def add_tokens_bulk():
+    """Credit tokens to many users in one request (admin only)."""
+    current_user_id = get_jwt_identity()
+    current_user = await User.find_by_id(current_user_id)
+    
+    if not current_user or not current_user.is_admin:
+        return jsonify({
+            'error': 'Forbidden',
+            'message': 'Only administrators can add tokens to users'
+        }), 403
+    
     data = request.get_json()
+    grants = data.get('grants') if isinstance(data, dict) else None
     
-    if 'amount' not in data or not isinstance(data['amount'], int) or data['amount'] <= 0:
+    if not isinstance(grants, list) or len(grants) == 0:
         return jsonify({
-            'error': 'Invalid input',
-            'message': 'Amount must be a positive integer'
+            'error': 'Invalid data',
+            'message': 'grants must be a non-empty array of {user_id, amount} objects'
         }), 400
     
-    user.tokens += data['amount']
-    db.session.commit()
+    for grant in grants:
+        if (not isinstance(grant, dict) or 'user_id' not in grant
+                or not isinstance(grant.get('amount'), int) or grant['amount'] <= 0):
+            return jsonify({
+                'error': 'Invalid input',
+                'message': 'Each grant needs a user_id and a positive integer amount'
+            }), 400
+    
+    balances = await User.credit_tokens_bulk(
+        [{'user_id': grant['user_id'], 'amount': grant['amount']} for grant in grants],
+        reason=data.get('reason', 'admin_bulk_grant')
+    )
+    
+    for user_id in balances:
+        invalidate_user_profile(user_id)
+    
+    requested_ids = {str(grant['user_id']) for grant in grants}
+    missing = sorted(requested_ids - {str(user_id) for user_id in balances})
     
     return jsonify({
-        'message': f'{data["amount"]} tokens added to user',
-        'user': user.to_dict()
+        'message': f'Tokens credited to {len(balances)} users',
+        'balances': {str(user_id): tokens for user_id, tokens in balances.items()},
+        'missing_user_ids': missing
+    }), 200
+
+@users_bp.route('/<string:user_id>/tokens', methods=['GET'])
+@jwt_required()
+async def get_token_history(user_id):
+    """Get a user's token balance and ledger history (admin or self)."""
+    current_user_id = get_jwt_identity()
+    current_user = await User.find_by_id(current_user_id)
+    
+    if str(current_user_id) != user_id and (not current_user or not current_user.is_admin):
+        return jsonify({
+            'error': 'Forbidden',
+            'message': 'You do not have permission to view this user'
+        }), 403
+    
+    user = current_user if str(current_user_id) == user_id else await User.find_by_id(user_id)
+    if not user:
+        return jsonify({
+            'error': 'Not found',
+            'message': 'User not found'
+        }), 404
+    
+    limit = min(request.args.get('limit', 50, type=int), 200)
+    offset = request.args.get('offset', 0, type=int)
+    
+    return jsonify({
+        'user_id': user_id,
+        'tokens': await user.get_token_balance(),
+        'ledger': await user.get_token_ledger(limit, offset)
     }), 200
 
 @users_bp.route('/<string:user_id>/admin', methods=['PUT'])
@@ -121,6 +212,8 @@ def toggle_admin(user_id):
     
     user.is_admin = data['is_admin']
     db.session.commit()
+    invalidate_admin_role(user_id)
+    invalidate_user_profile(user_id)
     
     return jsonify({
         'message': f'Admin status updated for user',
@@ -14,4 +14,61 @@ class ProductionConfig:
 
     # Use Supabase JWT secret for our app's JWT authentication
     JWT_SECRET_KEY = os.environ.get('SUPABASE_JWT_SECRET')
-    JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour 
\ No newline at end of file
+    JWT_ACCESS_TOKEN_EXPIRES = 3600  # 1 hour
+
+    # Repository query tracing
+    QUERY_TRACE_SAMPLE_RATE = float(os.environ.get('QUERY_TRACE_SAMPLE_RATE', '0.1'))
+    SLOW_QUERY_THRESHOLD_MS = float(os.environ.get('SLOW_QUERY_THRESHOLD_MS', '500'))
+    SLOW_QUERY_BUFFER_SIZE = int(os.environ.get('SLOW_QUERY_BUFFER_SIZE', '100'))
+
+    # Circuit breakers for db, auth, storage and search
+    CIRCUIT_BREAKER_FAILURE_RATE = float(os.environ.get('CIRCUIT_BREAKER_FAILURE_RATE', '0.5'))
+    CIRCUIT_BREAKER_MINIMUM_CALLS = int(os.environ.get('CIRCUIT_BREAKER_MINIMUM_CALLS', '10'))
+    CIRCUIT_BREAKER_WINDOW_SIZE = int(os.environ.get('CIRCUIT_BREAKER_WINDOW_SIZE', '20'))
+    CIRCUIT_BREAKER_RECOVERY_TIMEOUT = float(os.environ.get('CIRCUIT_BREAKER_RECOVERY_TIMEOUT', '30'))
+
+    # Local Supabase JWT verification and profile caching for /auth/me
+    SUPABASE_JWKS_CACHE_SECONDS = int(os.environ.get('SUPABASE_JWKS_CACHE_SECONDS', '600'))
+    USER_PROFILE_CACHE_TTL = int(os.environ.get('USER_PROFILE_CACHE_TTL', '30'))
+
+    # Seconds a process may serve a user's token balance from its local cache
+    TOKEN_BALANCE_CACHE_TTL = int(os.environ.get('TOKEN_BALANCE_CACHE_TTL', '5'))
+
+    # Token package catalog: seconds between version checks and HTTP max-age (seconds)
+    TOKEN_PACKAGES_CACHE_CHECK_INTERVAL = int(os.environ.get('TOKEN_PACKAGES_CACHE_CHECK_INTERVAL', '30'))
+    TOKEN_PACKAGES_MAX_AGE = int(os.environ.get('TOKEN_PACKAGES_MAX_AGE', '60'))
+
+    # DataType reference cache: preload at startup, seconds between version checks
+    DATA_TYPE_CACHE_PRELOAD = os.environ.get('DATA_TYPE_CACHE_PRELOAD', 'true').lower() == 'true'
+    DATA_TYPE_CACHE_CHECK_INTERVAL = int(os.environ.get('DATA_TYPE_CACHE_CHECK_INTERVAL', '30'))
+
+    # Cache backend shared by workers: memory, shared_memory or redis
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'memory')
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', '10000'))
+    CACHE_SHARED_MEMORY_PATH = os.environ.get('CACHE_SHARED_MEMORY_PATH')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_KEY_PREFIX = os.environ.get('CACHE_KEY_PREFIX', 'app:')
+    ADMIN_ROLE_CACHE_TTL = int(os.environ.get('ADMIN_ROLE_CACHE_TTL', '60'))
+
+    # Fraction of a signed URL's lifetime, at the end, during which it is re-signed in the background
+    STORAGE_URL_REFRESH_AHEAD = float(os.environ.get('STORAGE_URL_REFRESH_AHEAD', '0.2'))
+
+    # Upload chunk size in bytes; Supabase's resumable endpoint expects 6MB chunks
+    STORAGE_UPLOAD_CHUNK_SIZE = int(os.environ.get('STORAGE_UPLOAD_CHUNK_SIZE', str(6 * 1024 * 1024)))
+
+    # WebP quality (0-100) of the resized logo variants
+    LOGO_VARIANT_QUALITY = int(os.environ.get('LOGO_VARIANT_QUALITY', '80'))
+
+    # Seconds before a logo whose variants could not be generated is tried again
+    LOGO_VARIANT_RETRY_AFTER = int(os.environ.get('LOGO_VARIANT_RETRY_AFTER', '600'))
+
+    # Consent when a user has no preference for a data type; compiled rules are cached for CONSENT_CACHE_TTL seconds
+    CONSENT_DEFAULT_ALLOWED = os.environ.get('CONSENT_DEFAULT_ALLOWED', 'false').lower() == 'true'
+    CONSENT_CACHE_TTL = int(os.environ.get('CONSENT_CACHE_TTL', '300'))
+    CONSENT_CHECK_MAX_BATCH = int(os.environ.get('CONSENT_CHECK_MAX_BATCH', '20000'))
+
+    # Deepest multi-hop search allowed by GET /companies/<id>/related
+    COMPANY_GRAPH_MAX_DEPTH = int(os.environ.get('COMPANY_GRAPH_MAX_DEPTH', '4'))
+
+    # Most ids accepted by the ?ids= multi-get endpoints
+    MULTI_GET_MAX_IDS = int(os.environ.get('MULTI_GET_MAX_IDS', '500'))
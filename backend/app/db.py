@@ -1,9 +1,11 @@
 from supabase import create_client, Client
 from flask import current_app
 import logging
-import time
 import requests
 from typing import Optional
+from app.utils.metrics import instrument_client
+from app.utils.retry import RetryPolicy
+from app.utils.circuit_breaker import get_breaker
 
 logger = logging.getLogger(__name__)
 
@@ -14,25 +16,32 @@ def check_supabase_connection(client: Client, max_retries: int = 3, retry_delay:
     Args:
         client: The Supabase client to test
         max_retries: Maximum number of retry attempts
-        retry_delay: Delay between retries in seconds
+        retry_delay: Base backoff delay between retries in seconds (jittered, doubling)
     
     Returns:
         bool: True if connection is working, False otherwise
     """
-    for attempt in range(1, max_retries + 1):
-        try:
-            logger.info(f"Testing Supabase connection (Attempt {attempt}/{max_retries})...")
-            # Execute a simple query to verify connection
-            response = client.table("companies").select("count").limit(1).execute()
-            logger.info(f"Supabase connection test successful")
-            return True
-        except Exception as e:
-            logger.error(f"Supabase connection test failed (Attempt {attempt}/{max_retries}): {e}")
-            if attempt < max_retries:
-                logger.info(f"Retrying in {retry_delay} seconds...")
-                time.sleep(retry_delay)
+    def log_retry(attempt, error, delay):
+        logger.error(f"Supabase connection test failed (Attempt {attempt}/{max_retries}): {error}")
+        logger.info(f"Retrying in {delay:.2f} seconds...")
     
-    return False
+    policy = RetryPolicy(
+        max_attempts=max_retries,
+        base_delay=retry_delay,
+        max_delay=retry_delay * 4,
+        deadline=retry_delay * max_retries * 4,
+        on_retry=log_retry
+    )
+    
+    try:
+        logger.info("Testing Supabase connection...")
+        # Execute a simple query to verify connection
+        policy.call(lambda: client.table("companies").select("count").limit(1).execute())
+        logger.info(f"Supabase connection test successful")
+        return True
+    except Exception as e:
+        logger.error(f"Supabase connection test failed: {e}")
+        return False
 
 def verify_supabase_url(url: str, timeout: int = 5) -> bool:
     """
@@ -60,8 +69,8 @@ def get_supabase() -> Client:
         logger.error("Supabase client not initialized!")
         raise RuntimeError("Supabase client not initialized")
     
-    # Return the initialized client
-    return current_app.supabase
+    # Return the initialized client, instrumented for metrics and guarded by the db breaker
+    return instrument_client(current_app.supabase, breaker=get_breaker('db'))
 
 def get_supabase_admin() -> Client:
     """Get the Supabase admin client from the current app context."""
@@ -69,8 +78,8 @@ def get_supabase_admin() -> Client:
         logger.error("Supabase admin client not initialized!")
         raise RuntimeError("Supabase admin client not initialized")
     
-    # Return the initialized client
-    return current_app.supabase_admin
+    # Return the initialized client, instrumented for metrics and guarded by the db breaker
+    return instrument_client(current_app.supabase_admin, breaker=get_breaker('db'))
 
 def init_supabase_client(url: str, key: str, is_admin: bool = False, max_retries: int = 3) -> Optional[Client]:
     """
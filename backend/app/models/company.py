@@ -1,7 +1,10 @@
-from typing import Optional, List
+from typing import Optional, List, Tuple, Dict, Any, Iterable
 from app.schemas.company import CompanySchema, DataSharingPolicySchema
+from app.schemas.data_type import DataTypeSchema
 from app.repositories.company import CompanyRepository, DataSharingPolicyRepository
 from flask_jwt_extended import get_jwt_identity
+from app.services.exposure import refresh_policy_exposure
+from app.services.company_graph import invalidate_company_graph
 
 # Table names for Supabase
 COMPANY_RELATIONSHIPS_TABLE = 'company_relationships'
@@ -34,6 +37,10 @@ class Company:
     def logo(self) -> Optional[str]:
         return self._schema.logo
     
+    @logo.setter
+    def logo(self, value: Optional[str]):
+        self._schema.logo = value
+    
     @property
     def industry(self) -> Optional[str]:
         return self._schema.industry
@@ -68,6 +75,52 @@ class Company:
         schema = await CompanyRepository.find_by_id(id)
         return cls(schema) if schema else None
     
+    @classmethod
+    async def find_by_ids(cls, ids: List[int]) -> List['Company']:
+        """Find several companies at once, in the order of ``ids``; missing ids are skipped."""
+        schemas = await CompanyRepository.find_by_ids(ids)
+        return [cls(schemas[id]) for id in dict.fromkeys(ids) if id in schemas]
+    
+    @classmethod
+    async def get_detail(cls, id: int, include: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """
+        Get a company with its related records, fetched in one request.
+        
+        Args:
+            id: The company ID
+            include: Parts to embed (see ``DETAIL_INCLUDES``)
+            
+        Returns:
+            dict: The company's ``to_dict()`` plus ``policies`` (each with
+            ``data_type`` and/or ``third_parties`` if asked for) and
+            ``related_companies`` as requested, or None if it does not exist
+        """
+        include = set(include)
+        row = await CompanyRepository.get_company_detail(id, include)
+        if row is None:
+            return None
+        
+        detail = CompanySchema.from_dict(row).to_dict()
+        if 'policies' in row:
+            policies = []
+            for item in sorted(row['policies'], key=lambda item: item['id']):
+                policy = DataSharingPolicySchema.from_dict(item).to_dict()
+                if 'data_types' in include:
+                    policy['data_type'] = DataTypeSchema.from_dict(item['data_type']).to_dict() if item.get('data_type') else None
+                if 'third_parties' in include:
+                    policy['third_parties'] = sorted(
+                        (CompanySchema.from_dict(link['company']).to_dict() for link in item['third_parties'] if link.get('company')),
+                        key=lambda company: company['id']
+                    )
+                policies.append(policy)
+            detail['policies'] = policies
+        if 'related' in row:
+            detail['related_companies'] = sorted(
+                (CompanySchema.from_dict(link['target_company']).to_dict() for link in row['related'] if link.get('target_company')),
+                key=lambda company: company['id']
+            )
+        return detail
+    
     @classmethod
     async def get_all(cls) -> List['Company']:
         """Get all companies."""
@@ -102,6 +155,12 @@ class Company:
             return await self._repository.delete(self.id)
         return False
     
+    @classmethod
+    async def find_missing_ids(cls, ids: List[int]) -> List[int]:
+        """Return the ids, in order, that do not belong to any company."""
+        existing = await CompanyRepository.find_existing_ids(ids)
+        return [id for id in dict.fromkeys(ids) if id not in existing]
+    
     async def get_related_companies(self) -> List['Company']:
         """Get companies related to this company."""
         if not self.id:
@@ -146,26 +205,87 @@ class DataSharingPolicy:
         schema = await DataSharingPolicyRepository.find_by_id(id)
         return cls(schema) if schema else None
     
+    @classmethod
+    async def get_all(cls) -> List['DataSharingPolicy']:
+        """Get all policies."""
+        schemas = await DataSharingPolicyRepository.get_all()
+        return [cls(schema) for schema in schemas]
+    
     @classmethod
     async def get_company_policies(cls, company_id: int) -> List['DataSharingPolicy']:
         """Get all policies for a company."""
         schemas = await DataSharingPolicyRepository.get_company_policies(company_id)
         return [cls(schema) for schema in schemas]
     
-    async def save(self) -> 'DataSharingPolicy':
-        """Save the policy."""
+    async def save(self, third_party_ids: Iterable[int] = ()) -> 'DataSharingPolicy':
+        """
+        Save the policy and refresh the data exposure it grants.
+        
+        ``third_party_ids`` are attached before the refresh (see
+        ``add_third_parties``), so a new policy with third parties is
+        refreshed once.
+        """
         if self.id:
             self.schema = await self._repository.update(self.schema)
+            # The policy's third-party edges start from its (possibly new) company
+            invalidate_company_graph()
         else:
             self.schema = await self._repository.create(self.schema)
+        if third_party_ids and await self._repository.add_third_parties(self.id, third_party_ids):
+            invalidate_company_graph()
+        await refresh_policy_exposure(self.id)
         return self
     
     async def delete(self) -> bool:
-        """Delete the policy."""
+        """Delete the policy along with its third-party edges."""
         if self.id:
-            return await self._repository.delete(self.id)
+            deleted = await self._repository.delete(self.id)
+            invalidate_company_graph()
+            return deleted
         return False
     
+    async def get_third_party_ids(self) -> List[int]:
+        """Get the ids of the companies this policy shares data with."""
+        if not self.id:
+            return []
+        return await self._repository.get_third_party_ids(self.id)
+    
+    async def add_third_parties(self, company_ids: List[int]) -> List[int]:
+        """
+        Attach third parties that are not attached yet.
+        
+        The ids must belong to existing companies (see ``Company.find_missing_ids``).
+        
+        Returns:
+            list: The ids that were newly attached
+        """
+        added = await self._repository.add_third_parties(self.id, company_ids)
+        if added:
+            await self._third_parties_changed()
+        return added
+    
+    async def set_third_parties(self, company_ids: List[int]) -> Tuple[List[int], List[int]]:
+        """
+        Replace the policy's third parties with exactly ``company_ids``.
+        
+        Only the difference from the current set is written: one insert for
+        the additions and one delete for the removals.
+        
+        Returns:
+            tuple: The ids added and the ids removed
+        """
+        wanted = list(dict.fromkeys(company_ids))
+        current = set(await self.get_third_party_ids())
+        added = await self._repository.add_third_parties(self.id, [id for id in wanted if id not in current])
+        removed = await self._repository.remove_third_parties(self.id, sorted(current.difference(wanted)))
+        if added or removed:
+            await self._third_parties_changed()
+        return added, removed
+    
+    async def _third_parties_changed(self) -> None:
+        invalidate_company_graph()
+        await refresh_policy_exposure(self.id)
+    
     def to_dict(self):
         """Convert policy to dictionary for API response."""
         return self.schema.to_dict()
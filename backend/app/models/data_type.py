@@ -1,6 +1,14 @@
 from typing import Optional, Dict, Any, List
 from app.schemas.data_type import DataTypeSchema
 from app.repositories.data_type import DataTypeRepository
+from app.utils.reference_cache import ReferenceCache
+
+# Process-wide snapshot of the data_types table
+data_type_cache = ReferenceCache(
+    'data_types',
+    loader=DataTypeRepository.get_all,
+    version_loader=DataTypeRepository.get_version
+)
 
 class DataType:
     """Data type model for categorizing types of personal data."""
@@ -52,15 +60,42 @@ class DataType:
     
     @classmethod
     async def find_by_id(cls, id: int) -> Optional['DataType']:
-        """Find a data type by ID."""
-        schema = await DataTypeRepository.find_by_id(id)
+        """Find a data type by ID (served from the reference cache)."""
+        snapshot = await data_type_cache.snapshot()
+        schema = snapshot.by_id.get(_coerce_id(id))
+        return cls(schema) if schema else None
+    
+    @classmethod
+    async def find_by_ids(cls, ids: List[Any]) -> List['DataType']:
+        """Find several data types, in the order of ``ids`` (served from the reference cache)."""
+        snapshot = await data_type_cache.snapshot()
+        schemas = (snapshot.by_id.get(id) for id in dict.fromkeys(_coerce_id(id) for id in ids))
+        return [cls(schema) for schema in schemas if schema]
+    
+    @classmethod
+    async def find_by_name(cls, name: str) -> Optional['DataType']:
+        """Find a data type by name, case-insensitively (served from the reference cache)."""
+        snapshot = await data_type_cache.snapshot()
+        schema = snapshot.by_name.get(name.lower())
         return cls(schema) if schema else None
     
     @classmethod
     async def get_all(cls) -> List['DataType']:
-        """Get all data types."""
-        schemas = await DataTypeRepository.get_all()
-        return [cls(schema) for schema in schemas]
+        """Get all data types (served from the reference cache)."""
+        snapshot = await data_type_cache.snapshot()
+        return [cls(schema) for schema in snapshot.rows]
+    
+    @classmethod
+    async def exists(cls, id: Any) -> bool:
+        """Check that a data type id is valid without querying the database."""
+        snapshot = await data_type_cache.snapshot()
+        return _coerce_id(id) in snapshot.ids
+    
+    @classmethod
+    async def cache_version(cls) -> int:
+        """Version of the data types currently cached."""
+        snapshot = await data_type_cache.snapshot()
+        return snapshot.version
     
     async def save(self) -> 'DataType':
         """Save the data type."""
@@ -68,4 +103,21 @@ class DataType:
             self._schema = await self._repository.update(self._schema)
         else:
             self._schema = await self._repository.create(self._schema)
-        return self 
\ No newline at end of file
+        # The write bumped the version; reload here now, other workers on their next check
+        data_type_cache.invalidate()
+        return self
+    
+    async def delete(self) -> bool:
+        """Delete the data type."""
+        if not self.id:
+            return False
+        deleted = await self._repository.delete(self.id)
+        data_type_cache.invalidate()
+        return deleted
+
+def _coerce_id(id: Any) -> Any:
+    """Ids arrive as strings from URLs and as ints from JSON bodies."""
+    try:
+        return int(id)
+    except (TypeError, ValueError):
+        return id 
\ No newline at end of file
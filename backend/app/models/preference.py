@@ -1,6 +1,8 @@
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, List
 from app.schemas.preference import UserPreferenceSchema, UserProfilePreferenceSchema
 from app.repositories.preference import UserPreferenceRepository, UserProfilePreferenceRepository
+from app.services.consent import invalidate_consent
+from app.services.exposure import refresh_user_exposure
 
 class UserPreference:
     """User preference model for storing privacy preferences."""
@@ -30,6 +32,10 @@ class UserPreference:
     def allowed(self) -> bool:
         return self._schema.allowed
     
+    @allowed.setter
+    def allowed(self, value: bool):
+        self._schema.allowed = bool(value)
+    
     @property
     def created_at(self):
         return self._schema.created_at
@@ -56,13 +62,47 @@ class UserPreference:
         schema = await UserPreferenceRepository.find_by_id(id)
         return cls(schema) if schema else None
     
+    @classmethod
+    async def find(cls, user_id: int, data_type_id: int, company_id: Optional[int] = None) -> Optional['UserPreference']:
+        """Find a user's preference for a data type, globally or for one company."""
+        schema = await UserPreferenceRepository.find(user_id, data_type_id, company_id)
+        return cls(schema) if schema else None
+    
+    @classmethod
+    async def get_user_preferences(cls, user_id: int, company_id: Optional[int] = None) -> List['UserPreference']:
+        """Get a user's preferences, optionally only those for one company."""
+        schemas = await UserPreferenceRepository.get_user_preferences(user_id, company_id)
+        return [cls(schema) for schema in schemas]
+    
     async def save(self) -> 'UserPreference':
-        """Save the user preference."""
+        """Save the user preference, dropping the user's compiled consent rules and refreshing their exposure."""
         if self.id:
             self._schema = await self._repository.update(self._schema)
         else:
             self._schema = await self._repository.create(self._schema)
+        await self._preferences_changed(self.user_id)
         return self
+    
+    @classmethod
+    async def save_many(cls, user_id: int, preferences: List['UserPreference']) -> List['UserPreference']:
+        """
+        Save several of a user's preferences in bulk.
+        
+        The rows are written together (see ``UserPreferenceRepository.save_many``)
+        and the user's consent rules and exposure are refreshed once afterwards.
+        """
+        if not preferences:
+            return []
+        schemas = await UserPreferenceRepository.save_many([preference._schema for preference in preferences])
+        for preference, schema in zip(preferences, schemas):
+            preference._schema = schema
+        await cls._preferences_changed(user_id)
+        return preferences
+    
+    @staticmethod
+    async def _preferences_changed(user_id: int) -> None:
+        invalidate_consent(user_id)
+        await refresh_user_exposure(user_id)
 
 class UserProfilePreference:
     """User profile preferences for notifications, theme, language, etc."""
@@ -148,6 +188,12 @@ class UserProfilePreference:
         schema = await UserProfilePreferenceRepository.find_by_id(id)
         return cls(schema) if schema else None
     
+    @classmethod
+    async def find_by_user(cls, user_id: int) -> Optional['UserProfilePreference']:
+        """Find a user's profile preferences."""
+        schema = await UserProfilePreferenceRepository.find_by_user(user_id)
+        return cls(schema) if schema else None
+    
     async def save(self) -> 'UserProfilePreference':
         """Save the user profile preference."""
         if self.id:
@@ -1,14 +1,34 @@
-from typing import Optional, List
+from typing import Optional, List, Dict, Any
 from datetime import datetime
 from app.schemas.user import UserSchema, TokenPackageSchema
 from app.repositories.user import UserRepository, TokenPackageRepository
+from flask import current_app
+from app.db import get_supabase_admin
+from app.utils.cache import TTLCache
+from app.utils.reference_cache import ReferenceCache
 from werkzeug.security import generate_password_hash, check_password_hash
 
+# Per-process cache of ledger balances keyed by user id
+_token_balance_cache = TTLCache(maxsize=10000, ttl=5)
+
+# The package catalog, checked against the token_packages reference-data version
+# so admin writes through any worker reach every worker
+package_catalog_cache = ReferenceCache(
+    'token_packages',
+    loader=lambda: TokenPackageRepository().get_all(raise_errors=True),
+    version_loader=lambda: TokenPackageRepository().get_version()
+)
+
+def _remember_balance(user_id, balance: int) -> None:
+    ttl = current_app.config.get('TOKEN_BALANCE_CACHE_TTL', _token_balance_cache.ttl)
+    _token_balance_cache.set(str(user_id), balance, ttl=ttl)
+
 class User:
     """User model with business logic."""
     
-    def __init__(self, schema: UserSchema):
+    def __init__(self, schema: UserSchema, balance: Optional[int] = None):
         self._schema = schema
+        self._balance = balance
         self._repository = UserRepository()
     
     @property
@@ -33,6 +53,14 @@ class User:
     
     @property
     def tokens(self) -> int:
+        # users.tokens is only a snapshot refreshed by ledger compaction; prefer the
+        # ledger balance, either freshly cached or loaded along with the user
+        if self.id:
+            balance = _token_balance_cache.get(str(self.id))
+            if balance is not None:
+                return balance
+        if self._balance is not None:
+            return self._balance
         return self._schema.tokens
     
     @property
@@ -51,26 +79,46 @@ class User:
         """Check if the provided password matches the hash."""
         return check_password_hash(self._schema.password_hash, password)
     
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert user to dictionary for API response (without the password hash)."""
+        return {
+            'id': self.id,
+            'email': self.email,
+            'first_name': self.first_name,
+            'last_name': self.last_name,
+            'is_admin': self.is_admin,
+            'tokens': self.tokens,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+    
+    @classmethod
+    async def _with_balances(cls, schemas: List[UserSchema]) -> List['User']:
+        """Build users with their ledger balances, loaded in one call for all cache misses."""
+        ids = [schema.id for schema in schemas if schema.id]
+        balances = await cls.get_token_balances(ids) if ids else {}
+        return [cls(schema, balances.get(str(schema.id))) for schema in schemas]
+    
     @classmethod
     async def find_by_id(cls, id: int) -> Optional['User']:
         """Find a user by ID."""
         repository = UserRepository()
         schema = await repository.find_by_id(id)
-        return cls(schema) if schema else None
+        return (await cls._with_balances([schema]))[0] if schema else None
     
     @classmethod
     async def find_by_email(cls, email: str) -> Optional['User']:
         """Find a user by email."""
         repository = UserRepository()
         schema = await repository.find_by_email(email)
-        return cls(schema) if schema else None
+        return (await cls._with_balances([schema]))[0] if schema else None
     
     @classmethod
     async def get_all(cls) -> List['User']:
         """Get all users."""
         repository = UserRepository()
         schemas = await repository.get_all()
-        return [cls(schema) for schema in schemas]
+        return await cls._with_balances(schemas)
     
     async def save(self) -> bool:
         """Save the user to the database."""
@@ -87,13 +135,97 @@ class User:
         return await self._repository.delete(self.id)
     
     async def update_tokens(self, new_token_count: int) -> bool:
-        """Update the user's token count."""
+        """Set the user's token count; the server appends the difference to the ledger."""
         if not self.id:
             return False
-        updated = await self._repository.update_tokens(self.id, new_token_count)
-        if updated:
-            self._schema.tokens = new_token_count
-        return bool(updated)
+        return await self.set_balance(self.id, new_token_count, 'manual_adjustment') is not None
+    
+    async def add_tokens(self, amount: int, reason: Optional[str] = None,
+                         package_id: Optional[int] = None) -> bool:
+        """Add tokens to the user's balance."""
+        return await self._adjust_tokens(amount, reason, package_id)
+    
+    async def consume_tokens(self, amount: int, reason: Optional[str] = None) -> bool:
+        """Spend tokens; raises ValidationError if the balance is too low."""
+        return await self._adjust_tokens(-amount, reason)
+    
+    async def purchase_package(self, package: 'TokenPackage') -> bool:
+        """Credit a purchased token package, recording it in the ledger."""
+        return await self._adjust_tokens(package.amount, 'purchase', package.id)
+    
+    async def _adjust_tokens(self, delta: int, reason: Optional[str],
+                             package_id: Optional[int] = None) -> bool:
+        if not self.id:
+            return False
+        return await self.adjust_balance(self.id, delta, reason, package_id) is not None
+    
+    @classmethod
+    async def adjust_balance(cls, user_id: int, delta: int, reason: Optional[str] = None,
+                             package_id: Optional[int] = None) -> Optional[int]:
+        """Append a balance change for a user; returns the new balance or None if the user does not exist."""
+        # Balance functions are only executable by the service role
+        repository = UserRepository(get_supabase_admin())
+        new_balance = await repository.adjust_tokens(user_id, delta, reason, package_id)
+        if new_balance is not None:
+            _remember_balance(user_id, new_balance)
+        return new_balance
+    
+    @classmethod
+    async def set_balance(cls, user_id: int, tokens: int, reason: Optional[str] = None) -> Optional[int]:
+        """Set a user's absolute balance; returns it or None if the user does not exist."""
+        repository = UserRepository(get_supabase_admin())
+        new_balance = await repository.set_tokens(user_id, tokens, reason)
+        if new_balance is not None:
+            _remember_balance(user_id, new_balance)
+        return new_balance
+    
+    async def get_token_balance(self) -> int:
+        """Get the user's current ledger balance."""
+        if not self.id:
+            return self._schema.tokens
+        balances = await self.get_token_balances([self.id])
+        return balances.get(str(self.id), self._schema.tokens)
+    
+    async def get_token_ledger(self, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Get the user's token ledger entries, newest first."""
+        if not self.id:
+            return []
+        repository = UserRepository(get_supabase_admin())
+        return await repository.get_token_ledger(self.id, limit, offset)
+    
+    @classmethod
+    async def get_token_balances(cls, user_ids: List[int]) -> Dict[str, int]:
+        """Get balances for several users, keyed by user id string, using the per-process cache."""
+        balances = {}
+        missing = []
+        for user_id in user_ids:
+            balance = _token_balance_cache.get(str(user_id))
+            if balance is None:
+                missing.append(user_id)
+            else:
+                balances[str(user_id)] = balance
+        
+        if missing:
+            repository = UserRepository(get_supabase_admin())
+            for user_id, balance in (await repository.get_token_balances(missing)).items():
+                _remember_balance(user_id, balance)
+                balances[str(user_id)] = balance
+        return balances
+    
+    @classmethod
+    async def credit_tokens_bulk(cls, grants: List[dict], reason: Optional[str] = None) -> dict:
+        """Credit tokens to many users in a single round trip."""
+        repository = UserRepository(get_supabase_admin())
+        balances = await repository.credit_tokens_bulk(grants, reason)
+        for user_id, balance in balances.items():
+            _remember_balance(user_id, balance)
+        return balances
+    
+    @classmethod
+    async def compact_token_ledger(cls) -> Optional[int]:
+        """Fold pending ledger entries into the materialized balances."""
+        repository = UserRepository(get_supabase_admin())
+        return await repository.compact_token_ledger()
 
 class TokenPackage:
     """Token package model with business logic."""
@@ -144,6 +276,25 @@ class TokenPackage:
         schemas = await repository.get_all()
         return [cls(schema) for schema in schemas]
     
+    @classmethod
+    async def get_catalog(cls) -> tuple:
+        """
+        Get the serialized package catalog and its ETag from the reference cache.
+        
+        The catalog only changes with the token_packages version, so the
+        version doubles as the ETag.
+        
+        Returns:
+            tuple: (list of package dicts, ETag)
+        """
+        snapshot = await package_catalog_cache.snapshot()
+        return [package.model_dump() for package in snapshot.rows], f'token-packages-{snapshot.version}'
+    
+    @classmethod
+    def invalidate_catalog(cls) -> None:
+        """Drop the cached catalog after a package changes."""
+        package_catalog_cache.invalidate()
+    
     async def save(self) -> bool:
         """Save the token package to the database."""
         if self.id:
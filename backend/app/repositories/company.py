@@ -1,15 +1,56 @@
-from typing import Optional, List, Dict, Any
+import re
+from typing import Optional, List, Dict, Any, Iterable, Tuple
+from postgrest.exceptions import APIError
 from app.db import get_supabase
+from app.utils.tracing import traced_execute
+from app.utils.dataloader import forget, request_loader
+from app.utils.error_handlers import ConflictError
 from app.schemas.company import CompanySchema, DataSharingPolicySchema
 
+# SQLSTATE and constraint of a write that repeats an existing normalized name
+UNIQUE_VIOLATION_CODE = '23505'
+NAME_CONSTRAINT = 'companies_name_normalized_key'
+
+# Reference-data versions bumped by writes to the tables behind the company graph
+GRAPH_VERSION_KEYS = ('company_relationships', 'data_sharing_third_parties', 'data_sharing_policies')
+
+# Embeddable parts of a company detail fetch; third parties and data types hang off the policies
+DETAIL_INCLUDES = ('policies', 'third_parties', 'data_types', 'related')
+
+# Rows per request (PostgREST's default row limit) and ids per in_() filter
+PAGE_SIZE = 1000
+IDS_BATCH_SIZE = 200
+
+# Every character str.isspace() accepts, spelled out because the database's \s is
+# ASCII-only; NORMALIZED_NAME in migration d9e4a1b6c572 uses the same class
+WHITESPACE_CLASS = r'[\t\n\v\f\r \u001c-\u001f\u0085\u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]'
+_WHITESPACE_RUN = re.compile(WHITESPACE_CLASS + '+')
+
+def normalize_company_name(name: str) -> str:
+    """Mirror of the ``companies.name_normalized`` column: whitespace runs collapsed to a space, trimmed, lowercased."""
+    return _WHITESPACE_RUN.sub(' ', name).strip(' ').lower()
+
+def _execute_company_write(query):
+    """Execute an insert or update, turning a duplicate name into ``ConflictError``."""
+    try:
+        return traced_execute(query)
+    except APIError as e:
+        # Other unique constraints (e.g. a reused id) are not name conflicts
+        if e.code == UNIQUE_VIOLATION_CODE and NAME_CONSTRAINT in f'{e.message} {e.details}':
+            raise ConflictError('A company with this name already exists', payload={'error': 'Company exists'})
+        raise
+
 class CompanyRepository:
     """Repository for company-related database operations."""
     
     @staticmethod
     async def find_by_id(id: int) -> Optional[CompanySchema]:
-        """Find a company by ID."""
+        """Find a company by ID (batched with the request's other company lookups)."""
+        loader = request_loader('companies', CompanyRepository.find_by_ids)
+        if loader:
+            return await loader.load(id)
         supabase = get_supabase()
-        response = supabase.table('companies').select('*').eq('id', id).execute()
+        response = traced_execute(supabase.table('companies').select('*').eq('id', id))
         if response.data:
             return CompanySchema.from_dict(response.data[0])
         return None
@@ -18,14 +59,14 @@ class CompanyRepository:
     async def get_all() -> List[CompanySchema]:
         """Get all companies."""
         supabase = get_supabase()
-        response = supabase.table('companies').select('*').execute()
+        response = traced_execute(supabase.table('companies').select('*'))
         return [CompanySchema.from_dict(item) for item in response.data]
     
     @staticmethod
     async def get_companies_by_name(name: str) -> List[CompanySchema]:
         """Get companies by name."""
         supabase = get_supabase()
-        response = supabase.table('companies').select('*').ilike('name', f'%{name}%').execute()
+        response = traced_execute(supabase.table('companies').select('*').ilike('name', f'%{name}%'))
         return [CompanySchema.from_dict(item) for item in response.data]
     
     @staticmethod
@@ -37,9 +78,56 @@ class CompanyRepository:
         if 'id' in company_data:
             del company_data['id']
             
-        response = supabase.table('companies').insert(company_data).execute()
+        response = _execute_company_write(supabase.table('companies').insert(company_data))
+        return CompanySchema.from_dict(response.data[0])
+    
+    @staticmethod
+    async def insert(row: Dict[str, Any]) -> CompanySchema:
+        """
+        Insert a company row in one round trip.
+        
+        Uniqueness of the normalized name is enforced by the database, so
+        there is no separate duplicate check.
+        
+        Raises:
+            ConflictError: If a company with the same normalized name exists
+        """
+        supabase = get_supabase()
+        response = _execute_company_write(supabase.table('companies').insert(row))
         return CompanySchema.from_dict(response.data[0])
     
+    @staticmethod
+    async def insert_many(rows: List[Dict[str, Any]]) -> Tuple[List[CompanySchema], List[int]]:
+        """
+        Insert company rows in a single statement, skipping duplicate names.
+        
+        Rows whose normalized name already exists, or repeats an earlier row
+        of the same call, are left out by ``ON CONFLICT DO NOTHING`` instead of
+        failing the statement.
+        
+        Returns:
+            tuple: The created companies and the indexes of the rows that conflicted
+        """
+        if not rows:
+            return [], []
+        supabase = get_supabase()
+        response = traced_execute(supabase.table('companies').upsert(
+            rows, on_conflict='name_normalized', ignore_duplicates=True
+        ))
+        
+        # Match inserted rows back to the input; the first row with a name wins
+        inserted = {}
+        for item in response.data:
+            inserted.setdefault(normalize_company_name(item['name']), []).append(item)
+        created, conflicts = [], []
+        for index, row in enumerate(rows):
+            matches = inserted.get(normalize_company_name(row['name']))
+            if matches:
+                created.append(CompanySchema.from_dict(matches.pop(0)))
+            else:
+                conflicts.append(index)
+        return created, conflicts
+    
     @staticmethod
     async def update(company: CompanySchema) -> CompanySchema:
         """Update an existing company."""
@@ -49,23 +137,118 @@ class CompanyRepository:
         if 'id' in update_data:
             del update_data['id']
             
-        response = supabase.table('companies').update(update_data).eq('id', company.id).execute()
+        response = _execute_company_write(supabase.table('companies').update(update_data).eq('id', company.id))
+        forget('companies', company.id)
         return CompanySchema.from_dict(response.data[0])
     
     @staticmethod
     async def delete(id: int) -> bool:
         """Delete a company."""
         supabase = get_supabase()
-        response = supabase.table('companies').delete().eq('id', id).execute()
+        response = traced_execute(supabase.table('companies').delete().eq('id', id))
+        forget('companies', id)
         return bool(response.data)
     
+    @staticmethod
+    async def find_by_ids(ids: Iterable[int]) -> Dict[int, CompanySchema]:
+        """Find several companies by ID; missing ids are left out."""
+        supabase = get_supabase()
+        ids = list(dict.fromkeys(ids))
+        companies = {}
+        for start in range(0, len(ids), IDS_BATCH_SIZE):
+            response = traced_execute(supabase.table('companies').select('*').in_('id', ids[start:start + IDS_BATCH_SIZE]))
+            companies.update({item['id']: CompanySchema.from_dict(item) for item in response.data})
+        return companies
+    
+    @staticmethod
+    async def get_company_detail(company_id: int, include: Iterable[str] = ()) -> Optional[Dict[str, Any]]:
+        """
+        Fetch a company and the requested related records in one request.
+        
+        Uses PostgREST resource embedding. ``include`` names entries of
+        ``DETAIL_INCLUDES``: ``policies`` embeds the company's data sharing
+        policies, ``third_parties`` and ``data_types`` embed each policy's
+        third-party companies and data type (and imply ``policies``), and
+        ``related`` embeds the targets of the company's relationships.
+        
+        Returns:
+            dict: The company row with ``policies`` (each with ``data_type``
+            and ``third_parties``) and ``related`` lists as requested, or None
+        """
+        include = set(include)
+        policy_columns = ['*']
+        if 'data_types' in include:
+            policy_columns.append('data_type:data_types(*)')
+        if 'third_parties' in include:
+            policy_columns.append('third_parties:data_sharing_third_parties(company:companies(*))')
+        
+        columns = ['*']
+        if include & {'policies', 'data_types', 'third_parties'}:
+            # Hint the foreign key: the third-party table also links companies to policies
+            columns.append(f"policies:data_sharing_policies!company_id({','.join(policy_columns)})")
+        if 'related' in include:
+            columns.append('related:company_relationships!source_company_id(target_company:companies!target_company_id(*))')
+        
+        supabase = get_supabase()
+        response = traced_execute(supabase.table('companies').select(','.join(columns)).eq('id', company_id))
+        return response.data[0] if response.data else None
+    
+    @staticmethod
+    async def find_existing_ids(ids: Iterable[int]) -> set:
+        """Return which of the given company ids exist, reading only the id column."""
+        supabase = get_supabase()
+        ids = list(dict.fromkeys(ids))
+        existing = set()
+        for start in range(0, len(ids), IDS_BATCH_SIZE):
+            response = traced_execute(supabase.table('companies').select('id').in_('id', ids[start:start + IDS_BATCH_SIZE]))
+            existing.update(item['id'] for item in response.data)
+        return existing
+    
+    @staticmethod
+    async def get_graph_edges() -> List[Tuple[int, int, str]]:
+        """
+        Get every edge of the company graph as ``(source, target, kind)``.
+        
+        ``relationship`` edges come from ``company_relationships``; ``third_party``
+        edges go from a policy's company to each of the policy's third parties.
+        """
+        supabase = get_supabase()
+        edges = []
+        for table, columns, order, to_edge in (
+            ('company_relationships', 'source_company_id,target_company_id', ('id',),
+             lambda row: (row['source_company_id'], row['target_company_id'], 'relationship')),
+            # An association table keyed by (policy_id, company_id)
+            ('data_sharing_third_parties', 'company_id,policy:data_sharing_policies(company_id)', ('policy_id', 'company_id'),
+             lambda row: (row['policy']['company_id'], row['company_id'], 'third_party') if row.get('policy') else None),
+        ):
+            offset = 0
+            while True:
+                query = supabase.table(table).select(columns)
+                for column in order:
+                    query = query.order(column)
+                response = traced_execute(query.range(offset, offset + PAGE_SIZE - 1))
+                edges.extend(edge for edge in map(to_edge, response.data) if edge)
+                if len(response.data) < PAGE_SIZE:
+                    break
+                offset += PAGE_SIZE
+        return edges
+    
+    @staticmethod
+    async def get_graph_version() -> int:
+        """Get a version that changes whenever any table behind the company graph is written."""
+        supabase = get_supabase()
+        response = traced_execute(
+            supabase.table('reference_data_versions').select('version').in_('name', list(GRAPH_VERSION_KEYS))
+        )
+        return sum(row['version'] for row in response.data)
+    
     @staticmethod
     async def get_related_companies(company_id: int) -> List[CompanySchema]:
         """Get companies related to a specific company."""
         supabase = get_supabase()
-        response = supabase.table('company_relationships').select(
+        response = traced_execute(supabase.table('company_relationships').select(
             'target_company:companies(*)'
-        ).eq('source_company_id', company_id).execute()
+        ).eq('source_company_id', company_id))
         return [CompanySchema.from_dict(item['target_company']) for item in response.data]
 
 class DataSharingPolicyRepository:
@@ -73,37 +256,114 @@ class DataSharingPolicyRepository:
     
     @staticmethod
     async def find_by_id(id: int) -> Optional[DataSharingPolicySchema]:
-        """Find a policy by ID."""
+        """Find a policy by ID (batched with the request's other policy lookups)."""
+        loader = request_loader('data_sharing_policies', DataSharingPolicyRepository.find_by_ids)
+        if loader:
+            return await loader.load(id)
         supabase = get_supabase()
-        response = supabase.table('data_sharing_policies').select('*').eq('id', id).execute()
+        response = traced_execute(supabase.table('data_sharing_policies').select('*').eq('id', id))
         if response.data:
             return DataSharingPolicySchema.from_dict(response.data[0])
         return None
     
+    @staticmethod
+    async def find_by_ids(ids: Iterable[int]) -> Dict[int, DataSharingPolicySchema]:
+        """Find several policies by ID; missing ids are left out."""
+        supabase = get_supabase()
+        ids = list(dict.fromkeys(ids))
+        policies = {}
+        for start in range(0, len(ids), IDS_BATCH_SIZE):
+            response = traced_execute(
+                supabase.table('data_sharing_policies').select('*').in_('id', ids[start:start + IDS_BATCH_SIZE])
+            )
+            policies.update({item['id']: DataSharingPolicySchema.from_dict(item) for item in response.data})
+        return policies
+    
+    @staticmethod
+    async def get_all() -> List[DataSharingPolicySchema]:
+        """Get every policy, ordered by id, a page at a time."""
+        supabase = get_supabase()
+        policies = []
+        offset = 0
+        while True:
+            response = traced_execute(
+                supabase.table('data_sharing_policies').select('*').order('id').range(offset, offset + PAGE_SIZE - 1)
+            )
+            policies.extend(DataSharingPolicySchema.from_dict(item) for item in response.data)
+            if len(response.data) < PAGE_SIZE:
+                break
+            offset += PAGE_SIZE
+        return policies
+    
     @staticmethod
     async def get_company_policies(company_id: int) -> List[DataSharingPolicySchema]:
         """Get all policies for a company."""
         supabase = get_supabase()
-        response = supabase.table('data_sharing_policies').select('*').eq('company_id', company_id).execute()
+        response = traced_execute(supabase.table('data_sharing_policies').select('*').eq('company_id', company_id))
         return [DataSharingPolicySchema.from_dict(item) for item in response.data]
     
     @staticmethod
     async def create(policy: DataSharingPolicySchema) -> DataSharingPolicySchema:
         """Create a new policy."""
         supabase = get_supabase()
-        response = supabase.table('data_sharing_policies').insert(policy.to_dict()).execute()
+        response = traced_execute(supabase.table('data_sharing_policies').insert(policy.to_dict()))
         return DataSharingPolicySchema.from_dict(response.data[0])
     
     @staticmethod
     async def update(policy: DataSharingPolicySchema) -> DataSharingPolicySchema:
         """Update an existing policy."""
         supabase = get_supabase()
-        response = supabase.table('data_sharing_policies').update(policy.to_dict()).eq('id', policy.id).execute()
+        response = traced_execute(supabase.table('data_sharing_policies').update(policy.to_dict()).eq('id', policy.id))
+        forget('data_sharing_policies', policy.id)
         return DataSharingPolicySchema.from_dict(response.data[0])
     
     @staticmethod
     async def delete(id: int) -> bool:
         """Delete a policy."""
         supabase = get_supabase()
-        response = supabase.table('data_sharing_policies').delete().eq('id', id).execute()
-        return bool(response.data) 
\ No newline at end of file
+        response = traced_execute(supabase.table('data_sharing_policies').delete().eq('id', id))
+        forget('data_sharing_policies', id)
+        return bool(response.data) 
+    
+    @staticmethod
+    async def get_third_party_ids(policy_id: int) -> List[int]:
+        """Get the ids of a policy's third-party companies."""
+        supabase = get_supabase()
+        response = traced_execute(
+            supabase.table('data_sharing_third_parties').select('company_id').eq('policy_id', policy_id).order('company_id')
+        )
+        return [item['company_id'] for item in response.data]
+    
+    @staticmethod
+    async def add_third_parties(policy_id: int, company_ids: Iterable[int]) -> List[int]:
+        """
+        Attach third parties to a policy in a single insert.
+        
+        Companies that are already attached are skipped by the conflict
+        handling rather than failing the statement.
+        
+        Returns:
+            list: The ids that were newly attached
+        """
+        rows = [{'policy_id': policy_id, 'company_id': company_id} for company_id in dict.fromkeys(company_ids)]
+        if not rows:
+            return []
+        supabase = get_supabase()
+        response = traced_execute(
+            supabase.table('data_sharing_third_parties').upsert(
+                rows, on_conflict='policy_id,company_id', ignore_duplicates=True
+            )
+        )
+        return [item['company_id'] for item in response.data]
+    
+    @staticmethod
+    async def remove_third_parties(policy_id: int, company_ids: Iterable[int]) -> List[int]:
+        """Detach third parties from a policy in a single delete; returns the ids removed."""
+        company_ids = list(dict.fromkeys(company_ids))
+        if not company_ids:
+            return []
+        supabase = get_supabase()
+        response = traced_execute(
+            supabase.table('data_sharing_third_parties').delete().eq('policy_id', policy_id).in_('company_id', company_ids)
+        )
+        return [item['company_id'] for item in response.data]
@@ -0,0 +1,54 @@
+from typing import Optional, List, Dict, Any
+from app.db import get_supabase_admin
+from app.utils.tracing import traced_execute
+
+# Rows per request (PostgREST's default row limit)
+PAGE_SIZE = 1000
+
+class ComplianceRepository:
+    """Repository for the policy compliance analytics job and its results."""
+    
+    @staticmethod
+    async def get_policies() -> List[Dict[str, Any]]:
+        """Get the id, company and data type of every data sharing policy."""
+        supabase = get_supabase_admin()
+        policies = []
+        # Page by id since PostgREST caps the rows per response
+        while True:
+            response = traced_execute(
+                supabase.table('data_sharing_policies').select('id,company_id,data_type_id')
+                .gt('id', policies[-1]['id'] if policies else 0).order('id').limit(PAGE_SIZE)
+            )
+            policies.extend(response.data)
+            if len(response.data) < PAGE_SIZE:
+                return policies
+    
+    @staticmethod
+    async def get_user_ids(after_id: int = 0, limit: int = PAGE_SIZE) -> List[int]:
+        """Get a page of user ids greater than ``after_id``, in order (keyset pagination)."""
+        supabase = get_supabase_admin()
+        response = traced_execute(
+            supabase.table('users').select('id').gt('id', after_id).order('id').limit(limit)
+        )
+        return [row['id'] for row in response.data]
+    
+    @staticmethod
+    async def save_results(rows: List[Dict[str, Any]]) -> None:
+        """Replace the materialized counts of the given policies."""
+        supabase = get_supabase_admin()
+        for start in range(0, len(rows), PAGE_SIZE):
+            traced_execute(
+                supabase.table('policy_compliance').upsert(rows[start:start + PAGE_SIZE], on_conflict='policy_id')
+            )
+    
+    @staticmethod
+    async def get_results(company_id: Optional[int] = None, limit: int = 100, offset: int = 0) -> List[Dict[str, Any]]:
+        """Get materialized counts, most disallowed first."""
+        supabase = get_supabase_admin()
+        query = supabase.table('policy_compliance').select('*')
+        if company_id is not None:
+            query = query.eq('company_id', company_id)
+        response = traced_execute(
+            query.order('users_disallowed', desc=True).order('policy_id').range(offset, offset + limit - 1)
+        )
+        return response.data
@@ -0,0 +1,67 @@
+from typing import Optional, List
+from app.db import get_supabase
+from app.utils.tracing import traced_execute
+from app.schemas.data_type import DataTypeSchema
+
+# Row in reference_data_versions bumped on every data_types write
+DATA_TYPES_VERSION_KEY = 'data_types'
+
+class DataTypeRepository:
+    """Repository for data type operations."""
+    
+    @staticmethod
+    async def find_by_id(id: int) -> Optional[DataTypeSchema]:
+        """Find a data type by ID."""
+        supabase = get_supabase()
+        response = traced_execute(supabase.table('data_types').select('*').eq('id', id))
+        if response.data:
+            return DataTypeSchema.from_dict(response.data[0])
+        return None
+    
+    @staticmethod
+    async def get_all() -> List[DataTypeSchema]:
+        """Get all data types."""
+        supabase = get_supabase()
+        response = traced_execute(supabase.table('data_types').select('*').order('id'))
+        return [DataTypeSchema.from_dict(item) for item in response.data]
+    
+    @staticmethod
+    async def create(data_type: DataTypeSchema) -> DataTypeSchema:
+        """Create a new data type."""
+        supabase = get_supabase()
+        data = data_type.to_dict()
+        # Remove fields generated by the database
+        for field in ('id', 'created_at', 'updated_at'):
+            data.pop(field, None)
+        
+        response = traced_execute(supabase.table('data_types').insert(data))
+        return DataTypeSchema.from_dict(response.data[0])
+    
+    @staticmethod
+    async def update(data_type: DataTypeSchema) -> DataTypeSchema:
+        """Update an existing data type."""
+        supabase = get_supabase()
+        data = data_type.to_dict()
+        for field in ('id', 'created_at', 'updated_at'):
+            data.pop(field, None)
+        
+        response = traced_execute(supabase.table('data_types').update(data).eq('id', data_type.id))
+        return DataTypeSchema.from_dict(response.data[0])
+    
+    @staticmethod
+    async def delete(id: int) -> bool:
+        """Delete a data type."""
+        supabase = get_supabase()
+        response = traced_execute(supabase.table('data_types').delete().eq('id', id))
+        return bool(response.data)
+    
+    @staticmethod
+    async def get_version() -> int:
+        """Get the data types reference-data version (0 if never bumped)."""
+        supabase = get_supabase()
+        response = traced_execute(
+            supabase.table('reference_data_versions').select('version').eq('name', DATA_TYPES_VERSION_KEY)
+        )
+        if response.data:
+            return response.data[0]['version']
+        return 0
@@ -0,0 +1,54 @@
+from typing import List, Dict, Any
+from app.db import get_supabase_admin
+from app.utils.tracing import traced_execute
+
+# Rows per request (PostgREST's default row limit)
+PAGE_SIZE = 1000
+
+class ExposureRepository:
+    """Repository for the materialized per-user data exposure."""
+    
+    @staticmethod
+    async def get_user_exposure(user_id: int) -> List[Dict[str, Any]]:
+        """Get a user's exposure rows with the receiving company embedded."""
+        # The table is not exposed to end users; the user id filter is applied here
+        supabase = get_supabase_admin()
+        rows = []
+        while True:
+            response = traced_execute(
+                supabase.table('user_data_exposure')
+                .select('policy_id,data_type_id,company_id,via_company_id,purpose,company:companies!company_id(id,name,logo)')
+                .eq('user_id', user_id)
+                .order('data_type_id').order('policy_id').order('company_id')
+                .range(len(rows), len(rows) + PAGE_SIZE - 1)
+            )
+            rows.extend(response.data)
+            if len(response.data) < PAGE_SIZE:
+                return rows
+    
+    @staticmethod
+    async def refresh_user(user_id: int, default: bool) -> int:
+        """Rebuild a user's exposure rows; returns the number written."""
+        supabase = get_supabase_admin()
+        response = traced_execute(supabase.rpc('refresh_user_exposure', {
+            'p_user_id': user_id,
+            'p_default': default
+        }))
+        return response.data
+    
+    @staticmethod
+    async def refresh_policy(policy_id: int, default: bool) -> int:
+        """Rebuild a policy's exposure rows for every user; returns the number written."""
+        supabase = get_supabase_admin()
+        response = traced_execute(supabase.rpc('refresh_policy_exposure', {
+            'p_policy_id': policy_id,
+            'p_default': default
+        }))
+        return response.data
+    
+    @staticmethod
+    async def refresh_all(default: bool) -> int:
+        """Rebuild every exposure row; returns the number written."""
+        supabase = get_supabase_admin()
+        response = traced_execute(supabase.rpc('refresh_all_exposure', {'p_default': default}))
+        return response.data
@@ -0,0 +1,163 @@
+from typing import Optional, List, Dict, Iterable
+from app.db import get_supabase, get_supabase_admin
+from app.utils.tracing import traced_execute
+from app.schemas.preference import UserPreferenceSchema, UserProfilePreferenceSchema
+
+# Users per get_consent_rules call when loading preferences for many users at once
+RULES_BATCH_SIZE = 5000
+
+class UserPreferenceRepository:
+    """Repository for data sharing preference operations."""
+    
+    @staticmethod
+    async def find_by_id(id: int) -> Optional[UserPreferenceSchema]:
+        """Find a preference by ID."""
+        supabase = get_supabase()
+        response = traced_execute(supabase.table('user_preferences').select('*').eq('id', id))
+        if response.data:
+            return UserPreferenceSchema.from_dict(response.data[0])
+        return None
+    
+    @staticmethod
+    async def find(user_id: int, data_type_id: int, company_id: Optional[int] = None) -> Optional[UserPreferenceSchema]:
+        """Find a user's preference for a data type, globally or for one company."""
+        supabase = get_supabase()
+        query = supabase.table('user_preferences').select('*').eq('user_id', user_id).eq('data_type_id', data_type_id)
+        query = query.is_('company_id', 'null') if company_id is None else query.eq('company_id', company_id)
+        response = traced_execute(query)
+        if response.data:
+            return UserPreferenceSchema.from_dict(response.data[0])
+        return None
+    
+    @staticmethod
+    async def get_user_preferences(user_id: int, company_id: Optional[int] = None) -> List[UserPreferenceSchema]:
+        """Get a user's preferences, optionally only those for one company."""
+        supabase = get_supabase()
+        query = supabase.table('user_preferences').select('*').eq('user_id', user_id)
+        if company_id is not None:
+            query = query.eq('company_id', company_id)
+        response = traced_execute(query)
+        return [UserPreferenceSchema.from_dict(item) for item in response.data]
+    
+    @staticmethod
+    async def get_rules(user_ids: Iterable[int], company_ids: Optional[Iterable[int]] = None) -> Dict[int, List[list]]:
+        """
+        Get several users' preferences as ``[company_id, data_type_id, allowed]`` triples.
+        
+        Args:
+            user_ids: The users to load
+            company_ids: Only load overrides for these companies (global rows are always loaded)
+            
+        Returns:
+            dict: Triples keyed by user id, in insertion order; users without preferences are omitted
+        """
+        # Other users' rows are hidden by RLS, so this goes through the service role
+        supabase = get_supabase_admin()
+        user_ids = list(user_ids)
+        params = {'p_company_ids': list(company_ids) if company_ids is not None else None}
+        rules = {}
+        for start in range(0, len(user_ids), RULES_BATCH_SIZE):
+            params['p_user_ids'] = user_ids[start:start + RULES_BATCH_SIZE]
+            response = traced_execute(supabase.rpc('get_consent_rules', params))
+            rules.update({int(user_id): triples for user_id, triples in (response.data or {}).items()})
+        return rules
+    
+    @staticmethod
+    async def create(preference: UserPreferenceSchema) -> UserPreferenceSchema:
+        """Create a new preference."""
+        supabase = get_supabase()
+        data = preference.to_dict()
+        for field in ('id', 'created_at', 'updated_at'):
+            data.pop(field, None)
+        
+        response = traced_execute(supabase.table('user_preferences').insert(data))
+        return UserPreferenceSchema.from_dict(response.data[0])
+    
+    @staticmethod
+    async def update(preference: UserPreferenceSchema) -> UserPreferenceSchema:
+        """Update an existing preference."""
+        supabase = get_supabase()
+        data = preference.to_dict()
+        for field in ('id', 'created_at', 'updated_at'):
+            data.pop(field, None)
+        
+        response = traced_execute(supabase.table('user_preferences').update(data).eq('id', preference.id))
+        return UserPreferenceSchema.from_dict(response.data[0])
+
+    @staticmethod
+    async def save_many(preferences: List[UserPreferenceSchema]) -> List[UserPreferenceSchema]:
+        """
+        Write several preferences with at most two statements.
+        
+        New preferences are created with one insert and existing ones (those
+        with an id) rewritten with one upsert on their id.
+        
+        Returns:
+            list: The saved preferences, in the order given
+        """
+        supabase = get_supabase()
+        rows = []
+        for preference in preferences:
+            data = preference.to_dict()
+            for field in ('created_at', 'updated_at'):
+                data.pop(field, None)
+            if data['id'] is None:
+                data.pop('id')
+            rows.append(data)
+        
+        existing = [row for row in rows if 'id' in row]
+        new = [row for row in rows if 'id' not in row]
+        updated = {}
+        if existing:
+            response = traced_execute(supabase.table('user_preferences').upsert(existing, on_conflict='id'))
+            updated = {item['id']: UserPreferenceSchema.from_dict(item) for item in response.data}
+        created = []
+        if new:
+            response = traced_execute(supabase.table('user_preferences').insert(new))
+            created = [UserPreferenceSchema.from_dict(item) for item in response.data]
+        
+        created = iter(created)
+        return [updated[row['id']] if 'id' in row else next(created) for row in rows]
+
+class UserProfilePreferenceRepository:
+    """Repository for user profile preference operations."""
+    
+    @staticmethod
+    async def find_by_id(id: int) -> Optional[UserProfilePreferenceSchema]:
+        """Find profile preferences by ID."""
+        supabase = get_supabase()
+        response = traced_execute(supabase.table('user_profile_preferences').select('*').eq('id', id))
+        if response.data:
+            return UserProfilePreferenceSchema.from_dict(response.data[0])
+        return None
+    
+    @staticmethod
+    async def find_by_user(user_id: int) -> Optional[UserProfilePreferenceSchema]:
+        """Find a user's profile preferences."""
+        supabase = get_supabase()
+        response = traced_execute(supabase.table('user_profile_preferences').select('*').eq('user_id', user_id))
+        if response.data:
+            return UserProfilePreferenceSchema.from_dict(response.data[0])
+        return None
+    
+    @staticmethod
+    async def create(preferences: UserProfilePreferenceSchema) -> UserProfilePreferenceSchema:
+        """Create profile preferences."""
+        supabase = get_supabase()
+        data = preferences.to_dict()
+        for field in ('id', 'created_at', 'updated_at'):
+            data.pop(field, None)
+        
+        response = traced_execute(supabase.table('user_profile_preferences').insert(data))
+        return UserProfilePreferenceSchema.from_dict(response.data[0])
+    
+    @staticmethod
+    async def update(preferences: UserProfilePreferenceSchema) -> UserProfilePreferenceSchema:
+        """Update profile preferences."""
+        supabase = get_supabase()
+        data = preferences.to_dict()
+        for field in ('id', 'created_at', 'updated_at'):
+            data.pop(field, None)
+        
+        response = traced_execute(supabase.table('user_profile_preferences').update(data).eq('id', preferences.id))
+        return UserProfilePreferenceSchema.from_dict(response.data[0])
@@ -0,0 +1,117 @@
+from typing import Dict, Iterable, List, Optional
+from app.db import get_supabase_admin
+from app.utils.tracing import traced_execute
+from supabase import Client
+from postgrest.exceptions import APIError
+
+# Paths per in_() filter (content-addressed paths are 71 characters)
+PATHS_BATCH_SIZE = 100
+
+class StorageObjectRepository:
+    """
+    Repository for reference-counted, content-addressed storage objects.
+    
+    Unlike the other repositories its methods are synchronous, because its
+    only caller is the (synchronous) storage service.
+    """
+    
+    def __init__(self, supabase: Optional[Client] = None):
+        # Reference counts are maintained by service-role-only functions
+        self.supabase = supabase or get_supabase_admin()
+    
+    def acquire(self, sha256: str, path: str, size: int,
+                      content_type: Optional[str] = None) -> Optional[str]:
+        """
+        Take a reference on an object, registering it if it is new.
+        
+        Returns:
+            str: 'upload' if the object is not in storage yet and the caller must upload it,
+            'exists' if it is, 'removing' if its last reference is being removed (no
+            reference was taken), or None if the reference could not be recorded
+        """
+        try:
+            response = traced_execute(self.supabase.rpc('acquire_storage_object', {
+                'p_sha256': sha256,
+                'p_path': path,
+                'p_size': size,
+                'p_content_type': content_type
+            }))
+            return response.data
+        except APIError:
+            return None
+    
+    def mark_uploaded(self, path: str) -> bool:
+        """
+        Record that an object is in storage, so later references skip the upload.
+        
+        Returns:
+            bool: True if the object was marked, False otherwise
+        """
+        try:
+            response = traced_execute(self.supabase.rpc('mark_storage_object_uploaded', {'p_path': path}))
+            return bool(response.data)
+        except APIError:
+            return False
+    
+    def release(self, path: str) -> Optional[int]:
+        """
+        Drop a reference on an object.
+        
+        Returns:
+            int: References left (0 means the object should be removed, then ``purge``
+            called), or None if the reference could not be released
+        """
+        try:
+            response = traced_execute(self.supabase.rpc('release_storage_object', {'p_path': path}))
+            return response.data
+        except APIError:
+            return None
+    
+    def purge(self, path: str) -> bool:
+        """
+        Forget an unreferenced object once it has been removed from storage.
+        
+        Returns:
+            bool: True if the record was dropped (or already gone), False otherwise
+        """
+        try:
+            traced_execute(self.supabase.rpc('purge_storage_object', {'p_path': path}))
+            return True
+        except APIError:
+            return False
+    
+    def get_variants(self, paths: Iterable[str]) -> Optional[Dict[str, List[str]]]:
+        """
+        Get the names of the derivatives generated for several objects.
+        
+        Returns:
+            dict: Variant names keyed by path (unregistered paths are left out), or
+            None if they could not be read
+        """
+        paths = list(dict.fromkeys(paths))
+        variants = {}
+        try:
+            for start in range(0, len(paths), PATHS_BATCH_SIZE):
+                response = traced_execute(
+                    self.supabase.table('storage_objects').select('path,variants')
+                    .in_('path', paths[start:start + PATHS_BATCH_SIZE])
+                )
+                variants.update({item['path']: item['variants'] or [] for item in response.data})
+            return variants
+        except APIError:
+            return None
+    
+    def set_variants(self, path: str, variants: List[str]) -> bool:
+        """
+        Record the derivatives generated for an object.
+        
+        Returns:
+            bool: True if the object is registered and was updated, False otherwise
+        """
+        try:
+            response = traced_execute(
+                self.supabase.table('storage_objects').update({'variants': variants}).eq('path', path)
+            )
+            return bool(response.data)
+        except APIError:
+            return False
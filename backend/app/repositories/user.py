@@ -1,8 +1,21 @@
-from typing import Optional, List, Dict, Any
+from typing import Optional, List, Dict, Any, Iterable
 from app.db import get_supabase
+from app.utils.tracing import traced_execute
+from app.utils.dataloader import forget, request_loader
 from app.schemas.user import UserSchema, TokenPackageSchema
 from supabase import Client
 from postgrest.exceptions import APIError
+from app.utils.error_handlers import ValidationError
+
+# SQLSTATE raised by adjust_user_tokens/set_user_tokens when a balance would go negative
+INSUFFICIENT_TOKENS_CODE = '23514'
+
+# Row in reference_data_versions bumped on every token_packages write
+TOKEN_PACKAGES_VERSION_KEY = 'token_packages'
+
+def _client_scope(client) -> int:
+    """Identify the underlying Supabase client behind an instrumented wrapper."""
+    return id(getattr(client, 'unwrapped', client))
 
 class UserRepository:
     """Repository for user-related database operations."""
@@ -11,17 +24,29 @@ class UserRepository:
         self.supabase = supabase or get_supabase()
     
     async def find_by_id(self, id: int) -> Optional[UserSchema]:
-        """Find a user by ID."""
+        """Find a user by ID (batched with the request's other lookups through the same client)."""
+        # Results depend on the client (RLS), so each client gets its own loader
+        loader = request_loader('users', self.find_by_ids, scope=_client_scope(self.supabase))
+        if loader:
+            return await loader.load(id)
         try:
-            response = self.supabase.table('users').select('*').eq('id', id).single().execute()
+            response = traced_execute(self.supabase.table('users').select('*').eq('id', id).single())
             return UserSchema.model_validate(response.data)
         except APIError:
             return None
     
+    async def find_by_ids(self, ids: Iterable[int]) -> Dict[int, UserSchema]:
+        """Find several users by ID with one query; missing ids are left out."""
+        try:
+            response = traced_execute(self.supabase.table('users').select('*').in_('id', list(dict.fromkeys(ids))))
+            return {item['id']: UserSchema.model_validate(item) for item in response.data}
+        except APIError:
+            return {}
+    
     async def find_by_email(self, email: str) -> Optional[UserSchema]:
         """Find a user by email."""
         try:
-            response = self.supabase.table('users').select('*').eq('email', email).single().execute()
+            response = traced_execute(self.supabase.table('users').select('*').eq('email', email).single())
             return UserSchema.model_validate(response.data)
         except APIError:
             return None
@@ -29,7 +54,7 @@ class UserRepository:
     async def get_all(self) -> List[UserSchema]:
         """Get all users."""
         try:
-            response = self.supabase.table('users').select('*').execute()
+            response = traced_execute(self.supabase.table('users').select('*'))
             return [UserSchema.model_validate(item) for item in response.data]
         except APIError:
             return []
@@ -37,7 +62,7 @@ class UserRepository:
     async def create(self, user: UserSchema) -> Optional[UserSchema]:
         """Create a new user."""
         try:
-            response = self.supabase.table('users').insert(user.model_dump(exclude={'id'})).execute()
+            response = traced_execute(self.supabase.table('users').insert(user.model_dump(exclude={'id'})))
             return UserSchema.model_validate(response.data[0])
         except APIError:
             return None
@@ -47,9 +72,10 @@ class UserRepository:
         if not user.id:
             return None
         try:
-            response = self.supabase.table('users').update(
+            response = traced_execute(self.supabase.table('users').update(
                 user.model_dump(exclude={'id', 'created_at'})
-            ).eq('id', user.id).execute()
+            ).eq('id', user.id))
+            forget('users', user.id)
             return UserSchema.model_validate(response.data[0])
         except APIError:
             return None
@@ -57,18 +83,87 @@ class UserRepository:
     async def delete(self, id: int) -> bool:
         """Delete a user."""
         try:
-            response = self.supabase.table('users').delete().eq('id', id).execute()
+            response = traced_execute(self.supabase.table('users').delete().eq('id', id))
+            forget('users', id)
             return bool(response.data)
         except APIError:
             return False
     
-    async def update_tokens(self, user_id: int, new_token_count: int) -> Optional[UserSchema]:
-        """Update user's token count."""
+    async def adjust_tokens(self, user_id: int, delta: int, reason: Optional[str] = None,
+                            package_id: Optional[int] = None) -> Optional[int]:
+        """Append a balance change to the token ledger; returns the new balance."""
         try:
-            response = self.supabase.table('users').update(
-                {'tokens': new_token_count}
-            ).eq('id', user_id).execute()
-            return UserSchema.model_validate(response.data[0])
+            response = traced_execute(self.supabase.rpc('adjust_user_tokens', {
+                'p_user_id': user_id,
+                'p_delta': delta,
+                'p_reason': reason,
+                'p_package_id': package_id
+            }))
+            forget('users', user_id)
+            return response.data
+        except APIError as e:
+            if e.code == INSUFFICIENT_TOKENS_CODE:
+                raise ValidationError('Insufficient tokens')
+            return None
+    
+    async def set_tokens(self, user_id: int, tokens: int, reason: Optional[str] = None) -> Optional[int]:
+        """Set an absolute balance; the server appends the difference under the user's lock."""
+        try:
+            response = traced_execute(self.supabase.rpc('set_user_tokens', {
+                'p_user_id': user_id,
+                'p_tokens': tokens,
+                'p_reason': reason
+            }))
+            forget('users', user_id)
+            return response.data
+        except APIError as e:
+            if e.code == INSUFFICIENT_TOKENS_CODE:
+                raise ValidationError('Token balance cannot be negative')
+            return None
+    
+    async def credit_tokens_bulk(self, grants: List[Dict[str, Any]],
+                                 reason: Optional[str] = None) -> Dict[int, int]:
+        """Credit tokens to many users in one call; returns new balances keyed by user id."""
+        try:
+            response = traced_execute(self.supabase.rpc('credit_user_tokens_bulk', {
+                'p_grants': grants,
+                'p_reason': reason
+            }))
+            for row in response.data:
+                forget('users', row['user_id'])
+            return {row['user_id']: row['tokens'] for row in response.data}
+        except APIError:
+            return {}
+    
+    async def get_token_balances(self, user_ids: List[int]) -> Dict[int, int]:
+        """Get current balances (materialized balance plus pending ledger entries)."""
+        try:
+            response = traced_execute(self.supabase.rpc('get_token_balances', {
+                'p_user_ids': list(user_ids)
+            }))
+            return {row['user_id']: row['tokens'] for row in response.data}
+        except APIError:
+            return {}
+    
+    async def get_token_ledger(self, user_id: int, limit: int = 50, offset: int = 0) -> List[Dict[str, Any]]:
+        """Get a user's ledger entries, newest first."""
+        try:
+            response = traced_execute(
+                self.supabase.table('token_ledger')
+                .select('id, delta, balance_after, reason, package_id, created_at')
+                .eq('user_id', user_id)
+                .order('id', desc=True)
+                .range(offset, offset + limit - 1)
+            )
+            return response.data
+        except APIError:
+            return []
+    
+    async def compact_token_ledger(self) -> Optional[int]:
+        """Fold pending ledger entries into the materialized balances; returns users compacted."""
+        try:
+            response = traced_execute(self.supabase.rpc('compact_token_ledger', {}))
+            return response.data
         except APIError:
             return None
 
@@ -81,25 +176,36 @@ class TokenPackageRepository:
     async def find_by_id(self, id: int) -> Optional[TokenPackageSchema]:
         """Find a token package by ID."""
         try:
-            response = self.supabase.table('token_packages').select('*').eq('id', id).single().execute()
+            response = traced_execute(self.supabase.table('token_packages').select('*').eq('id', id).single())
             return TokenPackageSchema.model_validate(response.data)
         except APIError:
             return None
     
-    async def get_all(self) -> List[TokenPackageSchema]:
-        """Get all token packages."""
+    async def get_all(self, raise_errors: bool = False) -> List[TokenPackageSchema]:
+        """Get all token packages ([] on errors unless ``raise_errors``)."""
         try:
-            response = self.supabase.table('token_packages').select('*').execute()
+            response = traced_execute(self.supabase.table('token_packages').select('*').order('id'))
             return [TokenPackageSchema.model_validate(item) for item in response.data]
         except APIError:
+            if raise_errors:
+                raise
             return []
     
+    async def get_version(self) -> int:
+        """Get the token packages reference-data version (0 if never bumped)."""
+        response = traced_execute(
+            self.supabase.table('reference_data_versions').select('version').eq('name', TOKEN_PACKAGES_VERSION_KEY)
+        )
+        if response.data:
+            return response.data[0]['version']
+        return 0
+    
     async def create(self, package: TokenPackageSchema) -> Optional[TokenPackageSchema]:
         """Create a new token package."""
         try:
-            response = self.supabase.table('token_packages').insert(
+            response = traced_execute(self.supabase.table('token_packages').insert(
                 package.model_dump(exclude={'id'})
-            ).execute()
+            ))
             return TokenPackageSchema.model_validate(response.data[0])
         except APIError:
             return None
@@ -109,9 +215,9 @@ class TokenPackageRepository:
         if not package.id:
             return None
         try:
-            response = self.supabase.table('token_packages').update(
+            response = traced_execute(self.supabase.table('token_packages').update(
                 package.model_dump(exclude={'id', 'created_at'})
-            ).eq('id', package.id).execute()
+            ).eq('id', package.id))
             return TokenPackageSchema.model_validate(response.data[0])
         except APIError:
             return None
@@ -119,7 +225,7 @@ class TokenPackageRepository:
     async def delete(self, id: int) -> bool:
         """Delete a token package."""
         try:
-            response = self.supabase.table('token_packages').delete().eq('id', id).execute()
+            response = traced_execute(self.supabase.table('token_packages').delete().eq('id', id))
             return bool(response.data)
         except APIError:
             return False 
\ No newline at end of file
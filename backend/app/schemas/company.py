@@ -1,11 +1,13 @@
 from typing import Optional, List, Dict, Any
 from datetime import datetime
+from app.schemas.data_type import _parse_datetime
 
 class CompanySchema:
     """Schema for company data."""
     def __init__(self, **kwargs):
         self.id: Optional[int] = kwargs.get('id')
         self.name: str = kwargs.get('name', '')
+        self.user_id: Optional[str] = kwargs.get('user_id')
         self.logo: Optional[str] = kwargs.get('logo')
         self.industry: Optional[str] = kwargs.get('industry')
         self.website: Optional[str] = kwargs.get('website')
@@ -13,8 +15,8 @@ class CompanySchema:
         self.size_range: Optional[str] = kwargs.get('size_range')
         self.city: Optional[str] = kwargs.get('city')
         self.country: Optional[str] = kwargs.get('country')
-        self.created_at: Optional[datetime] = kwargs.get('created_at')
-        self.updated_at: Optional[datetime] = kwargs.get('updated_at')
+        self.created_at: Optional[datetime] = _parse_datetime(kwargs.get('created_at'))
+        self.updated_at: Optional[datetime] = _parse_datetime(kwargs.get('updated_at'))
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'CompanySchema':
@@ -45,8 +47,8 @@ class DataSharingPolicySchema:
         self.data_type_id: int = kwargs.get('data_type_id', 0)
         self.purpose: str = kwargs.get('purpose', '')
         self.description: Optional[str] = kwargs.get('description')
-        self.created_at: Optional[datetime] = kwargs.get('created_at')
-        self.updated_at: Optional[datetime] = kwargs.get('updated_at')
+        self.created_at: Optional[datetime] = _parse_datetime(kwargs.get('created_at'))
+        self.updated_at: Optional[datetime] = _parse_datetime(kwargs.get('updated_at'))
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'DataSharingPolicySchema':
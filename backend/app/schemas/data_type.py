@@ -0,0 +1,36 @@
+from typing import Optional, Dict, Any
+from datetime import datetime
+
+def _parse_datetime(value):
+    """Supabase returns timestamps as ISO 8601 strings."""
+    if isinstance(value, str):
+        return datetime.fromisoformat(value)
+    return value
+
+class DataTypeSchema:
+    """Schema for data type data."""
+    def __init__(self, **kwargs):
+        self.id: Optional[int] = kwargs.get('id')
+        self.name: str = kwargs.get('name', '')
+        self.description: Optional[str] = kwargs.get('description')
+        self.category: Optional[str] = kwargs.get('category')
+        self.sensitivity_level: Optional[str] = kwargs.get('sensitivity_level')
+        self.created_at: Optional[datetime] = _parse_datetime(kwargs.get('created_at'))
+        self.updated_at: Optional[datetime] = _parse_datetime(kwargs.get('updated_at'))
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'DataTypeSchema':
+        """Create a schema instance from a dictionary."""
+        return cls(**data)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert schema to dictionary for API response."""
+        return {
+            'id': self.id,
+            'name': self.name,
+            'description': self.description,
+            'category': self.category,
+            'sensitivity_level': self.sensitivity_level,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
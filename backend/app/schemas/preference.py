@@ -0,0 +1,71 @@
+from typing import Optional, List, Dict, Any
+from datetime import datetime
+from app.schemas.data_type import _parse_datetime
+
+class UserPreferenceSchema:
+    """Schema for a data sharing preference (global when company_id is None)."""
+    def __init__(self, **kwargs):
+        self.id: Optional[int] = kwargs.get('id')
+        self.user_id: int = kwargs.get('user_id', 0)
+        self.data_type_id: int = kwargs.get('data_type_id', 0)
+        self.company_id: Optional[int] = kwargs.get('company_id')
+        self.allowed: bool = kwargs.get('allowed', False)
+        self.created_at: Optional[datetime] = _parse_datetime(kwargs.get('created_at'))
+        self.updated_at: Optional[datetime] = _parse_datetime(kwargs.get('updated_at'))
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'UserPreferenceSchema':
+        """Create a schema instance from a dictionary."""
+        return cls(**data)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert schema to dictionary for API response."""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'data_type_id': self.data_type_id,
+            'company_id': self.company_id,
+            'allowed': self.allowed,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class UserProfilePreferenceSchema:
+    """Schema for user profile preferences."""
+    def __init__(self, **kwargs):
+        self.id: Optional[int] = kwargs.get('id')
+        self.user_id: int = kwargs.get('user_id', 0)
+        self.email_notifications: bool = kwargs.get('email_notifications', True)
+        self.notification_frequency: Optional[str] = kwargs.get('notification_frequency')
+        self.notification_types: Optional[List[str]] = kwargs.get('notification_types')
+        self.privacy_level: Optional[str] = kwargs.get('privacy_level')
+        self.auto_delete_data: bool = kwargs.get('auto_delete_data', False)
+        self.data_retention_period: Optional[int] = kwargs.get('data_retention_period')
+        self.theme: Optional[str] = kwargs.get('theme')
+        self.language: Optional[str] = kwargs.get('language')
+        self.timezone: Optional[str] = kwargs.get('timezone')
+        self.created_at: Optional[datetime] = _parse_datetime(kwargs.get('created_at'))
+        self.updated_at: Optional[datetime] = _parse_datetime(kwargs.get('updated_at'))
+    
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> 'UserProfilePreferenceSchema':
+        """Create a schema instance from a dictionary."""
+        return cls(**data)
+    
+    def to_dict(self) -> Dict[str, Any]:
+        """Convert schema to dictionary for API response."""
+        return {
+            'id': self.id,
+            'user_id': self.user_id,
+            'email_notifications': self.email_notifications,
+            'notification_frequency': self.notification_frequency,
+            'notification_types': self.notification_types,
+            'privacy_level': self.privacy_level,
+            'auto_delete_data': self.auto_delete_data,
+            'data_retention_period': self.data_retention_period,
+            'theme': self.theme,
+            'language': self.language,
+            'timezone': self.timezone,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
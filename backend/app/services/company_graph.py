@@ -0,0 +1,166 @@
+"""
+Multi-hop queries over the company graph.
+
+Companies are linked by ``company_relationships`` rows and by data sharing
+policies that name third parties (an edge from the policy's company to each
+third party). The whole edge list is small compared to the rows it
+summarizes, so it is kept in a ``ReferenceCache``: writes to any of the
+three tables bump their reference-data versions and every worker reloads
+the edges on its next version check. Each snapshot is turned into an
+adjacency list once, and breadth-first searches over it are memoized per
+(snapshot version, company, depth), so a write makes stale answers
+unreachable instead of having to find and delete them.
+"""
+from collections import deque
+from typing import Any, Dict, List, Optional, Tuple
+
+from flask import current_app
+
+from app.repositories.company import CompanyRepository
+from app.services.consent import coerce_id
+from app.utils.cache import TTLCache
+from app.utils.metrics import metrics
+from app.utils.reference_cache import ReferenceCache
+
+# Process-wide snapshot of the graph's (source, target, kind) edges
+company_graph_cache = ReferenceCache(
+    'company_graph',
+    loader=CompanyRepository.get_graph_edges,
+    version_loader=CompanyRepository.get_graph_version,
+    key=lambda edge: edge,
+    row_name=lambda edge: ''
+)
+
+# Adjacency list of the latest snapshot, rebuilt when its version changes
+_adjacency: Tuple[Optional[int], Dict[Any, List[Tuple[Any, str]]]] = (None, {})
+
+# BFS results keyed by (version, company id, depth)
+_reachable_cache = TTLCache(maxsize=4096, ttl=None)
+
+
+def build_adjacency(edges) -> Dict[Any, List[Tuple[Any, str]]]:
+    """
+    Index ``(source, target, kind)`` edges by source.
+
+    Self-loops are dropped; parallel edges of different kinds are kept so
+    paths can report how each hop was made.
+    """
+    adjacency: Dict[Any, List[Tuple[Any, str]]] = {}
+    for source, target, kind in sorted(edges, key=lambda edge: (edge[0], edge[1], edge[2])):
+        if source != target:
+            adjacency.setdefault(source, []).append((target, kind))
+    return adjacency
+
+
+def breadth_first(adjacency: Dict[Any, List[Tuple[Any, str]]], start: Any,
+                  max_depth: int) -> Dict[Any, Tuple[int, Any, str]]:
+    """
+    Find every company reachable from ``start`` in at most ``max_depth`` hops.
+
+    Returns:
+        dict: ``(distance, predecessor, kind)`` keyed by company id, where
+        ``predecessor`` and ``kind`` describe the last hop of a shortest path;
+        ``start`` itself is not included
+    """
+    found: Dict[Any, Tuple[int, Any, str]] = {}
+    queue = deque([(start, 0)])
+    while queue:
+        company_id, distance = queue.popleft()
+        if distance == max_depth:
+            continue
+        for target, kind in adjacency.get(company_id, ()):
+            if target != start and target not in found:
+                found[target] = (distance + 1, company_id, kind)
+                queue.append((target, distance + 1))
+    return found
+
+
+def path_to(found: Dict[Any, Tuple[int, Any, str]], start: Any, target: Any) -> List[Dict[str, Any]]:
+    """Walk the predecessors back from ``target`` into a list of hops from ``start``."""
+    hops = []
+    while target != start:
+        _, predecessor, kind = found[target]
+        hops.append({'from': predecessor, 'to': target, 'kind': kind})
+        target = predecessor
+    hops.reverse()
+    return hops
+
+
+def max_depth() -> int:
+    """The deepest search a caller may ask for."""
+    return current_app.config.get('COMPANY_GRAPH_MAX_DEPTH', 4)
+
+
+async def _graph() -> Tuple[int, Dict[Any, List[Tuple[Any, str]]]]:
+    global _adjacency
+    snapshot = await company_graph_cache.snapshot()
+    version, adjacency = _adjacency
+    if version != snapshot.version:
+        adjacency = build_adjacency(snapshot.rows)
+        _adjacency = (snapshot.version, adjacency)
+    return snapshot.version, adjacency
+
+
+async def reachable(company_id: Any, depth: int) -> Dict[Any, Tuple[int, Any, str]]:
+    """
+    Companies reachable from a company within ``depth`` hops.
+
+    Args:
+        company_id: The starting company
+        depth: The maximum number of hops
+
+    Returns:
+        dict: ``(distance, predecessor, kind)`` keyed by company id (see ``breadth_first``)
+    """
+    company_id = coerce_id(company_id)
+    version, adjacency = await _graph()
+    key = (version, company_id, depth)
+    found = _reachable_cache.get(key)
+    if found is None:
+        metrics.inc('company_graph_searches_total', result='miss')
+        found = breadth_first(adjacency, company_id, depth)
+        _reachable_cache.set(key, found)
+    else:
+        metrics.inc('company_graph_searches_total', result='hit')
+    return found
+
+
+async def related_companies(company_id: Any, depth: int) -> List[Dict[str, Any]]:
+    """
+    Companies reachable from a company, nearest first, each with a shortest path.
+
+    Returns:
+        list: ``{'company_id', 'distance', 'path'}`` dicts ordered by distance then id
+    """
+    company_id = coerce_id(company_id)
+    found = await reachable(company_id, depth)
+    return [
+        {'company_id': target, 'distance': distance, 'path': path_to(found, company_id, target)}
+        for target, (distance, _, _) in sorted(found.items(), key=lambda item: (item[1][0], item[0]))
+    ]
+
+
+async def shortest_path(source_id: Any, target_id: Any, depth: int) -> Optional[List[Dict[str, Any]]]:
+    """
+    The hops of a shortest path between two companies.
+
+    Returns:
+        list: The hops (empty when source and target are the same), or None if
+        ``target_id`` is not reachable within ``depth`` hops
+    """
+    source_id, target_id = coerce_id(source_id), coerce_id(target_id)
+    if source_id == target_id:
+        return []
+    found = await reachable(source_id, depth)
+    if target_id not in found:
+        return None
+    return path_to(found, source_id, target_id)
+
+
+def invalidate_company_graph() -> None:
+    """Reload the graph on the next query after a relationship write through this process."""
+    company_graph_cache.invalidate()
+    _reachable_cache.clear()
+
+
+metrics.describe('company_graph_searches_total', 'counter', 'Company graph searches by cache result (hit or miss).')
@@ -0,0 +1,220 @@
+"""
+Effective-consent resolution for data sharing preferences.
+
+A user's ``user_preferences`` rows are either global (``company_id`` is
+null) or company-specific overrides. The effective answer for a
+(company, data type) pair is the company override if there is one, else the
+global entry, else ``CONSENT_DEFAULT_ALLOWED``.
+
+``ConsentRules`` compiles a user's rows once into bitmasks: every data type
+the user mentions gets a bit, the global entries become a pair of
+(known, allowed) masks, and each company with overrides gets its own pair.
+Answering a question is then two dict lookups and a few bit operations,
+whatever the number of rows. Compiled rules are kept in the cache backend
+and dropped by ``invalidate_consent`` whenever a preference is written.
+That delete has to reach every worker, so rules are only cached when the
+backend is shared (``shared_memory`` or ``redis``); with the per-process
+``memory`` backend another worker would keep answering with a revoked
+consent until the TTL expired, so rules are compiled per call instead.
+"""
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+from flask import current_app
+
+from app.repositories.preference import UserPreferenceRepository
+from app.utils.cache_backends import get_cache
+from app.utils.metrics import metrics
+
+
+class ConsentRules:
+    """A user's preferences compiled for constant-time lookups."""
+
+    __slots__ = ('user_id', 'bits', 'known', 'allowed', 'overrides')
+
+    def __init__(self, user_id: Any, bits: Dict[Any, int], known: int, allowed: int,
+                 overrides: Dict[Any, Tuple[int, int]]):
+        self.user_id = user_id
+        self.bits = bits            # data type id -> bit
+        self.known = known          # data types with a global entry
+        self.allowed = allowed      # ... and which of those are allowed
+        self.overrides = overrides  # company id -> (known, allowed) masks
+
+    def __getstate__(self):
+        return (self.user_id, self.bits, self.known, self.allowed, self.overrides)
+
+    def __setstate__(self, state):
+        self.user_id, self.bits, self.known, self.allowed, self.overrides = state
+
+    @classmethod
+    def compile(cls, user_id: Any, rows: Iterable[Dict[str, Any]]) -> 'ConsentRules':
+        """
+        Compile preference rows (dicts with ``company_id``, ``data_type_id`` and ``allowed``).
+
+        Rows for other users are ignored.
+        """
+        user_id = coerce_id(user_id)
+        return cls.from_triples(user_id, (
+            (row.get('company_id'), row['data_type_id'], row['allowed'])
+            for row in rows if coerce_id(row['user_id']) == user_id
+        ))
+
+    @classmethod
+    def from_triples(cls, user_id: Any, triples: Iterable[Tuple[Any, Any, bool]]) -> 'ConsentRules':
+        """Compile one user's ``(company_id, data_type_id, allowed)`` triples; later ones win."""
+        bits: Dict[Any, int] = {}
+        known = allowed = 0
+        overrides: Dict[Any, List[int]] = {}
+        for company_id, data_type_id, is_allowed in triples:
+            data_type_id = coerce_id(data_type_id)
+            bit = bits.get(data_type_id)
+            if bit is None:
+                bit = bits[data_type_id] = 1 << len(bits)
+
+            if company_id is None:
+                known |= bit
+                allowed = allowed | bit if is_allowed else allowed & ~bit
+            else:
+                masks = overrides.setdefault(coerce_id(company_id), [0, 0])
+                masks[0] |= bit
+                masks[1] = masks[1] | bit if is_allowed else masks[1] & ~bit
+
+        return cls(coerce_id(user_id), bits, known, allowed,
+                   {company_id: (masks[0], masks[1]) for company_id, masks in overrides.items()})
+
+    def is_allowed(self, company_id: Any, data_type_id: Any, default: bool = False) -> bool:
+        """Whether ``company_id`` may use ``data_type_id`` (None asks about the global rule)."""
+        bit = self.bits.get(coerce_id(data_type_id))
+        if bit is None:
+            return default
+        if company_id is not None:
+            override = self.overrides.get(coerce_id(company_id))
+            if override and override[0] & bit:
+                return bool(override[1] & bit)
+        if self.known & bit:
+            return bool(self.allowed & bit)
+        return default
+
+
+def coerce_id(id: Any) -> Any:
+    """Ids arrive as strings from JWTs and URLs and as ints from the database."""
+    try:
+        return int(id)
+    except (TypeError, ValueError):
+        return id
+
+
+def _rules_key(user_id: Any) -> str:
+    return f"consent:{coerce_id(user_id)}"
+
+
+def _rules_cache():
+    """The cache backend for compiled rules, or None when invalidation would not reach other workers."""
+    cache = get_cache()
+    return cache if cache.shared else None
+
+
+def default_allowed() -> bool:
+    """The answer when neither a company nor a global preference exists."""
+    return current_app.config.get('CONSENT_DEFAULT_ALLOWED', False)
+
+
+async def get_consent_rules_bulk(user_ids: Iterable[Any]) -> Dict[Any, ConsentRules]:
+    """
+    Get compiled rules for several users, loading all cache misses in one query.
+
+    Returns:
+        dict: Rules keyed by (coerced) user id; users without preferences get empty rules
+    """
+    cache = _rules_cache()
+    rules = {}
+    missing = []
+    for user_id in dict.fromkeys(coerce_id(user_id) for user_id in user_ids):
+        cached = cache.get(_rules_key(user_id)) if cache else None
+        if cached is None:
+            missing.append(user_id)
+        else:
+            rules[user_id] = cached
+    if rules:
+        metrics.inc('consent_rules_total', result='hit', value=len(rules))
+
+    if missing:
+        metrics.inc('consent_rules_total', result='compile', value=len(missing))
+        triples = await UserPreferenceRepository.get_rules(missing)
+
+        ttl = current_app.config.get('CONSENT_CACHE_TTL', 300)
+        for user_id in missing:
+            compiled = ConsentRules.from_triples(user_id, triples.get(user_id, ()))
+            if cache:
+                cache.set(_rules_key(user_id), compiled, ttl=ttl)
+            rules[user_id] = compiled
+    return rules
+
+
+async def get_consent_rules(user_id: Any) -> ConsentRules:
+    """Get a user's compiled rules, compiling them on a cache miss."""
+    return (await get_consent_rules_bulk([user_id]))[coerce_id(user_id)]
+
+
+async def is_allowed(user_id: Any, company_id: Optional[Any], data_type_id: Any) -> bool:
+    """
+    Whether a user allows a company to use a data type.
+
+    Args:
+        user_id: The user whose preferences apply
+        company_id: The company asking, or None for the user's global rule
+        data_type_id: The data type
+
+    Returns:
+        bool: The effective consent
+    """
+    rules = await get_consent_rules(user_id)
+    return rules.is_allowed(company_id, data_type_id, default_allowed())
+
+
+async def check_consent_bulk(checks: List[Tuple[Any, Any, Any]]) -> List[bool]:
+    """
+    Answer many ``(user_id, company_id, data_type_id)`` questions at once.
+
+    Users with cached rules are answered from the cache. The others are
+    loaded in one set-based query restricted to the companies asked about
+    (plus the global rows); those partial rules are compiled for this call
+    only and not cached.
+
+    Args:
+        checks: Question tuples; ids should already be coerced
+
+    Returns:
+        list: The effective consent for each question, in order
+    """
+    cache = _rules_cache()
+    rules: Dict[Any, ConsentRules] = {}
+    missing = []
+    for user_id in dict.fromkeys(user_id for user_id, _, _ in checks):
+        cached = cache.get(_rules_key(user_id)) if cache else None
+        if cached is None:
+            missing.append(user_id)
+        else:
+            rules[user_id] = cached
+    if rules:
+        metrics.inc('consent_rules_total', result='hit', value=len(rules))
+
+    if missing:
+        metrics.inc('consent_rules_total', result='partial', value=len(missing))
+        company_ids = {company_id for _, company_id, _ in checks if company_id is not None}
+        triples = await UserPreferenceRepository.get_rules(missing, company_ids)
+        for user_id in missing:
+            rules[user_id] = ConsentRules.from_triples(user_id, triples.get(user_id, ()))
+
+    default = default_allowed()
+    return [rules[user_id].is_allowed(company_id, data_type_id, default)
+            for user_id, company_id, data_type_id in checks]
+
+
+def invalidate_consent(user_id: Any) -> None:
+    """Drop a user's compiled rules after their preferences change."""
+    cache = _rules_cache()
+    if cache:
+        cache.delete(_rules_key(user_id))
+
+
+metrics.describe('consent_rules_total', 'counter', 'Compiled consent rule lookups by result (hit, compile or partial).')
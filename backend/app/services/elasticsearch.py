@@ -1,6 +1,8 @@
 from elasticsearch import Elasticsearch
 from flask import current_app
 import json
+from app.utils.metrics import timed_call
+from app.utils.circuit_breaker import get_breaker
 
 class ElasticsearchService:
     """Service for interacting with Elasticsearch."""
@@ -16,6 +18,10 @@ class ElasticsearchService:
         )
         self.index_prefix = current_app.config.get('ELASTICSEARCH_INDEX_PREFIX', 'data_privacy_')
     
+    def _call(self, func, **kwargs):
+        """Call Elasticsearch through the search circuit breaker, recording timing."""
+        return get_breaker('search').call(timed_call, 'elasticsearch', func, **kwargs)
+    
     def get_index_name(self, index_type):
         """Get the full index name for a given type."""
         env = current_app.config.get('FLASK_ENV', 'development')
@@ -36,10 +42,11 @@ class ElasticsearchService:
         index_name = self.get_index_name(index_type)
         
         # Ensure index exists
-        if not self.es.indices.exists(index=index_name):
+        if not self._call(self.es.indices.exists, index=index_name):
             self.create_index(index_type)
         
-        return self.es.index(
+        return self._call(
+            self.es.index,
             index=index_name,
             id=document_id,
             document=document
@@ -83,7 +90,8 @@ class ElasticsearchService:
             }
         
         # Create index with mappings
-        return self.es.indices.create(
+        return self._call(
+            self.es.indices.create,
             index=index_name,
             mappings=mappings
         )
@@ -133,7 +141,7 @@ class ElasticsearchService:
         
         # Execute search
         try:
-            results = self.es.search(index=index_name, body=query)
+            results = self._call(self.es.search, index=index_name, body=query)
             return results
         except Exception as e:
             current_app.logger.error(f"Elasticsearch search error: {e}")
@@ -153,7 +161,7 @@ class ElasticsearchService:
         index_name = self.get_index_name(index_type)
         
         try:
-            return self.es.delete(index=index_name, id=document_id)
+            return self._call(self.es.delete, index=index_name, id=document_id)
         except Exception as e:
             current_app.logger.error(f"Elasticsearch delete error: {e}")
             return {"error": str(e)} 
\ No newline at end of file
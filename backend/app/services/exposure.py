@@ -0,0 +1,68 @@
+"""
+Per-user data exposure: which companies can receive each of a user's data types.
+
+The answer joins preferences, policies, policy third parties and companies,
+so it is materialized in ``user_data_exposure`` and kept current
+incrementally: a user's rows are rebuilt when their preferences change
+(``refresh_user_exposure``) and a policy's rows when the policy or its third
+parties change (``refresh_policy_exposure``). Reading a user's exposure is
+then one indexed query. ``refresh_all_exposure`` rebuilds everything after
+writes made outside the application.
+"""
+import logging
+from typing import Any, Dict, List
+
+from app.models.data_type import DataType
+from app.repositories.exposure import ExposureRepository
+from app.services.consent import coerce_id, default_allowed
+
+logger = logging.getLogger(__name__)
+
+
+async def get_user_exposure(user_id: Any) -> List[Dict[str, Any]]:
+    """
+    Get a user's exposure grouped by data type.
+
+    Returns:
+        list: One entry per data type with its ``recipients`` (company, policy,
+        purpose and, for third parties, the company sharing with them)
+    """
+    grouped: Dict[Any, Dict[str, Any]] = {}
+    for row in await ExposureRepository.get_user_exposure(coerce_id(user_id)):
+        entry = grouped.get(row['data_type_id'])
+        if entry is None:
+            data_type = await DataType.find_by_id(row['data_type_id'])
+            entry = grouped[row['data_type_id']] = {
+                'data_type': data_type.to_dict() if data_type else {'id': row['data_type_id']},
+                'recipients': []
+            }
+        entry['recipients'].append({
+            'company': row.get('company') or {'id': row['company_id']},
+            'policy_id': row['policy_id'],
+            'purpose': row['purpose'],
+            'third_party': row['via_company_id'] is not None,
+            'via_company_id': row['via_company_id']
+        })
+    return list(grouped.values())
+
+
+async def refresh_user_exposure(user_id: Any) -> None:
+    """Rebuild a user's exposure after their preferences change."""
+    try:
+        await ExposureRepository.refresh_user(coerce_id(user_id), default_allowed())
+    except Exception as e:
+        # The preference is saved either way; the next refresh will catch up
+        logger.warning(f"Could not refresh data exposure of user {user_id}: {e}")
+
+
+async def refresh_policy_exposure(policy_id: Any) -> None:
+    """Rebuild a policy's exposure rows after it or its third parties change."""
+    try:
+        await ExposureRepository.refresh_policy(coerce_id(policy_id), default_allowed())
+    except Exception as e:
+        logger.warning(f"Could not refresh data exposure of policy {policy_id}: {e}")
+
+
+async def refresh_all_exposure() -> int:
+    """Rebuild every user's exposure; returns the number of rows written."""
+    return await ExposureRepository.refresh_all(default_allowed())
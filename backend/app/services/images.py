@@ -0,0 +1,142 @@
+"""
+Resized derivatives of uploaded company logos.
+
+Logos are rendered at full size wherever they appear, although most pages
+only show them as thumbnails. When a logo is uploaded, a background worker
+downloads it once and stores a recompressed WebP per entry in
+``LOGO_VARIANTS`` next to it (see ``logo_variant_path``). Derivatives are
+keyed by the original's hash, so they are generated once per distinct image
+and, like the original, never change. The variants generated are recorded on
+the original's ``storage_objects`` row; only those are served, and logos
+found without some of them are scheduled again, with failures backed off.
+"""
+import io
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from flask import current_app
+from PIL import Image, ImageOps
+
+from app.services.storage import (
+    CONTENT_CACHE_MAX_AGE, LOGO_VARIANTS, SupabaseStorageService, logo_variant_path
+)
+from app.utils.cache_backends import get_cache
+
+# Resizing is CPU-bound and Pillow releases the GIL while doing it
+_variant_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='logo-variants')
+_pending_lock = threading.Lock()
+_pending = set()
+
+# Refuse to decode images larger than this many pixels (decompression bombs)
+MAX_IMAGE_PIXELS = 40_000_000
+
+# Seconds before a logo whose variants could not be generated is tried again
+RETRY_AFTER = 600
+
+
+def render_variant(image, size, quality=80):
+    """
+    Shrink an image to fit in ``size`` x ``size`` and encode it as WebP.
+
+    Images already smaller than ``size`` are recompressed but not enlarged.
+
+    Args:
+        image: A Pillow image
+        size: The longest side of the result in pixels
+        quality: WebP quality (0-100)
+
+    Returns:
+        bytes: The encoded WebP image
+    """
+    variant = image.copy()
+    variant.thumbnail((size, size), Image.LANCZOS)
+    if variant.mode not in ('RGB', 'RGBA'):
+        has_alpha = variant.mode in ('LA', 'PA') or 'transparency' in variant.info
+        variant = variant.convert('RGBA' if has_alpha else 'RGB')
+
+    output = io.BytesIO()
+    variant.save(output, format='WEBP', quality=quality, method=4)
+    return output.getvalue()
+
+
+def generate_logo_variants(logo, service=None):
+    """
+    Generate, store and record the missing derivatives of a content-addressed logo.
+
+    Args:
+        logo: The logo's storage path (``sha256/<hex>``)
+        service: The storage service (defaults to the shared instance)
+
+    Returns:
+        dict: Storage path of each generated derivative, keyed by variant name
+    """
+    if not logo_variant_path(logo, next(iter(LOGO_VARIANTS))):
+        return {}
+
+    service = service or SupabaseStorageService.get_instance()
+    recorded = service.get_logo_variants([logo]).get(logo, [])
+    missing = [variant for variant in LOGO_VARIANTS if variant not in recorded]
+    if not missing:
+        return {}
+    quality = current_app.config.get('LOGO_VARIANT_QUALITY', 80)
+
+    with Image.open(io.BytesIO(service.download_file(logo))) as image:
+        if image.width * image.height > MAX_IMAGE_PIXELS:
+            raise ValueError(f"Logo {logo} is too large to resize ({image.width}x{image.height})")
+        image = ImageOps.exif_transpose(image)
+        image.load()
+
+    paths = {}
+    for variant in missing:
+        path = logo_variant_path(logo, variant)
+        service._upload_bytes(path, render_variant(image, LOGO_VARIANTS[variant], quality),
+                              'image/webp', CONTENT_CACHE_MAX_AGE)
+        paths[variant] = path
+    if not service.record_logo_variants(logo, recorded + list(paths)):
+        current_app.logger.warning(f"Could not record the variants of logo {logo}")
+    return paths
+
+
+def schedule_logo_variants(logo):
+    """
+    Generate a logo's derivatives on the background worker pool.
+
+    Returns immediately; duplicate requests for a logo that is already being
+    processed, or whose variants failed less than ``RETRY_AFTER`` seconds
+    ago, are ignored.
+
+    Args:
+        logo: The logo's storage path
+
+    Returns:
+        Future: The pending job, or None if nothing was scheduled
+    """
+    if not logo_variant_path(logo, next(iter(LOGO_VARIANTS))):
+        return None
+    if get_cache().get(_failed_key(logo)):
+        return None
+    with _pending_lock:
+        if logo in _pending:
+            return None
+        _pending.add(logo)
+
+    app = current_app._get_current_object()
+
+    def generate():
+        with app.app_context():
+            try:
+                return generate_logo_variants(logo)
+            except Exception as e:
+                current_app.logger.error(f"Could not generate variants of logo {logo}: {e}")
+                get_cache().set(_failed_key(logo), True,
+                                ttl=current_app.config.get('LOGO_VARIANT_RETRY_AFTER', RETRY_AFTER))
+                return {}
+            finally:
+                with _pending_lock:
+                    _pending.discard(logo)
+
+    return _variant_executor.submit(generate)
+
+
+def _failed_key(logo):
+    return f"logo_variants_failed:{logo}"
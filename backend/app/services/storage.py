@@ -2,10 +2,47 @@ from supabase import Client
 import os
 from flask import current_app
 import io
-from app.utils.supabase_client import get_supabase_client, with_retry
+from app.utils.supabase_client import get_supabase_client
+from app.utils.metrics import timed_call
+from app.utils.retry import storage_retry_policy
+from app.utils.circuit_breaker import get_breaker
+from app.utils.cache_backends import get_cache
+from app.repositories.storage_object import StorageObjectRepository
 import time
 import functools
 from werkzeug.utils import secure_filename
+import threading
+import hashlib
+import base64
+import uuid
+import httpx
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+
+# Supabase's resumable upload endpoint requires 6MB chunks (except the last)
+TUS_CHUNK_SIZE = 6 * 1024 * 1024
+
+# Content-addressed objects live under their SHA-256 and never change
+CONTENT_PREFIX = 'sha256/'
+CONTENT_CACHE_MAX_AGE = 365 * 24 * 3600
+
+# How long to wait for the removal of an object's last reference before storing it again
+ACQUIRE_ATTEMPTS = 10
+ACQUIRE_RETRY_DELAY = 0.2
+
+# WebP renditions of content-addressed logos, by longest side in pixels (see app.services.images)
+LOGO_VARIANTS = {'thumbnail': 64, 'medium': 256}
+VARIANT_PREFIX = 'variants/'
+# Logos with every variant generated keep them for as long as they are stored
+VARIANTS_CACHE_TTL = 24 * 3600
+
+# Background re-signing of cached URLs that are about to expire
+_refresh_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix='signed-url-refresh')
+_refresh_lock = threading.Lock()
+_refreshing = set()
+
+class StorageUploadError(Exception):
+    """Raised when Supabase Storage rejects an upload."""
 
 class SupabaseStorageService:
     """Service for interacting with Supabase Storage."""
@@ -23,99 +60,335 @@ class SupabaseStorageService:
         """Initialize Supabase client and storage."""
         self.supabase = get_supabase_client()
         self.bucket = os.environ.get('SUPABASE_STORAGE_BUCKET', 'uploads')
-        self._url_cache = {}  # Cache for signed URLs
+        self._url_expirations = {3600}  # Expirations signed URLs were cached for
+        self.objects = StorageObjectRepository()
         
         # Ensure the bucket exists
         self._ensure_bucket_exists()
     
+    def _call(self, func, *args, **kwargs):
+        """Call the storage API through the storage circuit breaker, with retries and timing."""
+        return get_breaker('storage').call(
+            storage_retry_policy.call, timed_call, 'storage', func, *args, **kwargs
+        )
+    
     def _ensure_bucket_exists(self):
         """Make sure the storage bucket exists, creating it if needed."""
         try:
             # Check if bucket exists by trying to get info
-            self.supabase.storage.get_bucket(self.bucket)
+            self._call(self.supabase.storage.get_bucket, self.bucket)
             current_app.logger.debug(f"Using existing Supabase Storage bucket: {self.bucket}")
         except Exception as e:
             current_app.logger.warning(f"Error checking bucket: {str(e)}")
             # Create the bucket if it doesn't exist
             try:
-                self.supabase.storage.create_bucket(self.bucket, {'public': False})
+                self._call(self.supabase.storage.create_bucket, self.bucket, {'public': False})
                 current_app.logger.info(f"Created Supabase Storage bucket: {self.bucket}")
             except Exception as e:
                 current_app.logger.error(f"Failed to create bucket: {str(e)}")
                 raise
     
-    @with_retry(max_retries=2)
     def upload_file(self, file_data, file_path=None, content_type=None, acl='private'):
         """
         Upload a file to Supabase Storage.
         
+        Without a ``file_path`` the content is stored once under its SHA-256,
+        see ``store_content``. File-like objects (including Werkzeug
+        ``FileStorage``) are streamed in chunks, see ``upload_stream``; bytes
+        are uploaded in one request.
+        
         Args:
             file_data: The file data to upload (bytes, file-like object, etc.)
-            file_path: Path/name for the file in storage (if None, a unique name is generated)
+            file_path: Path/name for the file in storage (if None, the content's hash is used)
             content_type: The content type of the file (ignored, Supabase detects automatically)
             acl: Access control level (private, public)
             
         Returns:
             dict: Information about the uploaded file including URL
         """
+        if not file_path:
+            return self.store_content(file_data, content_type, acl)
+        
+        if not isinstance(file_data, bytes) and hasattr(file_data, 'read'):
+            return self.upload_stream(file_data, file_path, content_type, acl)
+        
         try:
-            # Convert file_data to bytes if it's not already
             if not isinstance(file_data, bytes):
-                if hasattr(file_data, 'read'):
-                    file_data = file_data.read()
-                else:
-                    file_data = bytes(file_data)
-            
-            # Generate file path if not provided
-            if not file_path:
-                timestamp = int(time.time())
-                file_path = f"upload_{timestamp}_{secure_filename(str(hash(file_data))[:8])}"
-            
-            # Make sure path is sanitized
-            file_path = secure_filename(file_path)
-            
-            # Upload to Supabase
-            response = self.supabase.storage.from_(self.bucket).upload(
-                file_path,
-                file_data,
-                {'upsert': True}
-            )
-            
-            if hasattr(response, 'error') and response.error:
-                current_app.logger.error(f"Supabase upload error: {response.error}")
-                raise Exception(f"Failed to upload file: {response.error}")
-            
-            # Get URLs for the file
-            file_info = {
-                'name': file_path,
-                'size': len(file_data),
-                'url': self.get_file_url(file_path),
-                'public_url': self.get_public_url(file_path) if acl == 'public' else None
-            }
+                file_data = bytes(file_data)
             
-            return file_info
+            sha256 = hashlib.sha256(file_data).hexdigest()
+            file_path = self._storage_path(file_path)
+            self._upload_bytes(file_path, file_data, content_type)
+            return self._file_info(file_path, len(file_data), sha256, acl)
         
         except Exception as e:
             current_app.logger.error(f"Supabase Storage upload error: {e}")
             raise
     
-    @with_retry(max_retries=2)
+    def upload_stream(self, stream, file_path=None, content_type=None, acl='private'):
+        """
+        Upload a file-like object without holding it in memory.
+        
+        The stream is read in ``STORAGE_UPLOAD_CHUNK_SIZE`` chunks while a
+        SHA-256 of the content is computed incrementally. Streams that fit in
+        one chunk are uploaded with a single request; larger ones go through
+        Supabase's resumable (TUS) endpoint one chunk at a time, so memory per
+        upload is bounded by the chunk size whatever the file size.
+        
+        Args:
+            stream: A file-like object or Werkzeug ``FileStorage``
+            file_path: Path/name for the file in storage (if None, a unique name is generated)
+            content_type: The content type of the file
+            acl: Access control level (private, public)
+            
+        Returns:
+            dict: Information about the uploaded file including URL, size and sha256
+        """
+        stream, content_type = _unwrap_file_storage(stream, content_type)
+        
+        try:
+            file_path = self._storage_path(file_path)
+            size, sha256 = self._put_stream(stream, file_path, content_type)
+            return self._file_info(file_path, size, sha256, acl)
+        
+        except Exception as e:
+            current_app.logger.error(f"Supabase Storage streaming upload error: {e}")
+            raise
+    
+    def store_content(self, file_data, content_type=None, acl='private'):
+        """
+        Store content once under its SHA-256, sharing it between uploads.
+        
+        The content is hashed first (streams in chunks; streams that cannot
+        seek are spooled to a temporary file so they can be read again), then
+        a reference is taken on ``sha256/<hex>``. References taken before the
+        object is marked uploaded upload it themselves (the path is the
+        content's hash, so concurrent uploads write the same bytes), so a
+        caller never returns a path whose upload is still in flight or has
+        failed. Later identical uploads just add a reference and
+        ``delete_file`` removes the object with the last one; while that
+        removal runs, new references wait for it. Objects never change, so
+        they are stored with a one-year ``Cache-Control``.
+        
+        Args:
+            file_data: The file data to store (bytes, file-like object or ``FileStorage``)
+            content_type: The content type of the file
+            acl: Access control level (private, public)
+            
+        Returns:
+            dict: Information about the stored file, with ``deduplicated`` set when
+            the content was already stored
+        """
+        file_data, content_type = _unwrap_file_storage(file_data, content_type)
+        chunk_size = current_app.config.get('STORAGE_UPLOAD_CHUNK_SIZE', TUS_CHUNK_SIZE)
+        spool = None
+        
+        try:
+            if hasattr(file_data, 'read'):
+                if not _is_seekable(file_data):
+                    spool = tempfile.SpooledTemporaryFile(max_size=chunk_size)
+                sha256, size = _hash_stream(file_data, chunk_size, copy_to=spool)
+            else:
+                file_data = bytes(file_data)
+                sha256, size = hashlib.sha256(file_data).hexdigest(), len(file_data)
+            
+            file_path = f"{CONTENT_PREFIX}{sha256}"
+            state = self._acquire(sha256, file_path, size, content_type)
+            
+            if state == 'upload':
+                try:
+                    if hasattr(file_data, 'read'):
+                        self._put_stream(spool or file_data, file_path, content_type, CONTENT_CACHE_MAX_AGE)
+                    else:
+                        self._upload_bytes(file_path, file_data, content_type, CONTENT_CACHE_MAX_AGE)
+                except Exception:
+                    self.delete_file(file_path)
+                    raise
+                if not self.objects.mark_uploaded(file_path):
+                    current_app.logger.warning(f"Could not mark {file_path} as uploaded")
+            
+            info = self._file_info(file_path, size, sha256, acl)
+            info['deduplicated'] = state == 'exists'
+            return info
+        
+        except Exception as e:
+            current_app.logger.error(f"Supabase Storage content upload error: {e}")
+            raise
+        finally:
+            if spool is not None:
+                spool.close()
+    
+    def _acquire(self, sha256, file_path, size, content_type):
+        """Take a reference on a content-addressed object, waiting out the removal of its last one."""
+        for attempt in range(ACQUIRE_ATTEMPTS):
+            if attempt:
+                time.sleep(ACQUIRE_RETRY_DELAY)
+            state = self.objects.acquire(sha256, file_path, size, content_type)
+            if state is None:
+                raise StorageUploadError(f"Could not record a reference to {file_path}")
+            if state != 'removing':
+                return state
+        raise StorageUploadError(f"Timed out waiting for the removal of {file_path}")
+    
+    def _put_stream(self, stream, file_path, content_type=None, cache_control=None):
+        """Upload a stream to an already safe path; returns its size and SHA-256."""
+        chunk_size = current_app.config.get('STORAGE_UPLOAD_CHUNK_SIZE', TUS_CHUNK_SIZE)
+        digest = hashlib.sha256()
+        
+        first_chunk = _read_chunk(stream, chunk_size)
+        digest.update(first_chunk)
+        if len(first_chunk) < chunk_size:
+            self._upload_bytes(file_path, first_chunk, content_type, cache_control)
+            return len(first_chunk), digest.hexdigest()
+        
+        size = self._upload_resumable(stream, file_path, content_type, chunk_size, first_chunk, digest,
+                                      cache_control)
+        return size, digest.hexdigest()
+    
+    def _upload_bytes(self, file_path, data, content_type=None, cache_control=None):
+        """Upload an in-memory payload in one request."""
+        options = {'upsert': 'true'}
+        if content_type:
+            options['content-type'] = content_type
+        if cache_control:
+            options['cache-control'] = str(cache_control)
+        response = self._call(self.supabase.storage.from_(self.bucket).upload, file_path, data, options)
+        
+        if hasattr(response, 'error') and response.error:
+            current_app.logger.error(f"Supabase upload error: {response.error}")
+            raise StorageUploadError(f"Failed to upload file: {response.error}")
+    
+    def _upload_resumable(self, stream, file_path, content_type, chunk_size, first_chunk, digest,
+                          cache_control=None):
+        """Upload a stream through the TUS endpoint; returns the number of bytes sent."""
+        headers = {
+            'Authorization': f"Bearer {self.supabase.supabase_key}",
+            'apikey': self.supabase.supabase_key,
+            'Tus-Resumable': '1.0.0',
+        }
+        metadata = {
+            'bucketName': self.bucket,
+            'objectName': file_path,
+            'contentType': content_type or 'application/octet-stream',
+        }
+        if cache_control:
+            metadata['cacheControl'] = str(cache_control)
+        create_headers = {
+            **headers,
+            'x-upsert': 'true',
+            'Upload-Metadata': ','.join(
+                f"{key} {base64.b64encode(value.encode()).decode()}" for key, value in metadata.items()
+            ),
+        }
+        size = _stream_size(stream, already_read=len(first_chunk))
+        if size is None:
+            create_headers['Upload-Defer-Length'] = '1'
+        else:
+            create_headers['Upload-Length'] = str(size)
+        
+        endpoint = f"{self.supabase.supabase_url.rstrip('/')}/storage/v1/upload/resumable"
+        with httpx.Client(timeout=httpx.Timeout(30.0, read=120.0)) as client:
+            response = self._call(client.post, endpoint, headers=create_headers)
+            response.raise_for_status()
+            location = response.headers['Location']
+            
+            offset = 0
+            chunk = first_chunk
+            while chunk:
+                # Read ahead one chunk so the last PATCH can declare a deferred length
+                next_chunk = _read_chunk(stream, chunk_size)
+                digest.update(next_chunk)
+                final_length = offset + len(chunk) if not next_chunk and size is None else None
+                offset = self._send_chunk(client, location, headers, offset, chunk, final_length)
+                chunk = next_chunk
+        
+        return offset
+    
+    def _send_chunk(self, client, location, headers, offset, chunk, final_length=None):
+        """PATCH one chunk, resuming from the server's offset if a previous attempt got through."""
+        attempts = 0
+        
+        def send():
+            nonlocal attempts
+            attempts += 1
+            if attempts > 1:
+                head = client.head(location, headers=headers)
+                head.raise_for_status()
+                server_offset = int(head.headers['Upload-Offset'])
+                if server_offset == offset + len(chunk):
+                    return server_offset
+                if server_offset != offset:
+                    raise StorageUploadError(
+                        f"Upload offset mismatch: server has {server_offset}, expected {offset}"
+                    )
+            
+            patch_headers = {
+                **headers,
+                'Upload-Offset': str(offset),
+                'Content-Type': 'application/offset+octet-stream',
+            }
+            if final_length is not None:
+                patch_headers['Upload-Length'] = str(final_length)
+            response = client.patch(location, headers=patch_headers, content=chunk)
+            response.raise_for_status()
+            return int(response.headers['Upload-Offset'])
+        
+        return self._call(send)
+    
+    def _storage_path(self, file_path):
+        """Sanitize a requested path or generate a unique one."""
+        if not file_path:
+            file_path = f"upload_{int(time.time())}_{uuid.uuid4().hex[:12]}"
+        return secure_filename(file_path)
+    
+    def _file_info(self, file_path, size, sha256, acl):
+        return {
+            'name': file_path,
+            'size': size,
+            'sha256': sha256,
+            'url': self.get_file_url(file_path),
+            'public_url': self.get_public_url(file_path) if acl == 'public' else None
+        }
+    
     def delete_file(self, file_name):
         """
         Delete a file from Supabase Storage.
         
+        Content-addressed files are shared: deleting one drops a reference,
+        and the object is only removed with the last reference. Its record
+        is purged after the removal, so an upload of the same content cannot
+        start in between and lose its object.
+        
         Args:
             file_name: The name of the file to delete
             
         Returns:
-            bool: True if the file was deleted, False otherwise
+            bool: True if the file (or the reference to it) was deleted, False otherwise
         """
         try:
-            response = self.supabase.storage.from_(self.bucket).remove([file_name])
+            if file_name.startswith(CONTENT_PREFIX):
+                remaining = self.objects.release(file_name)
+                if remaining is None:
+                    current_app.logger.error(f"Could not release storage reference to {file_name}")
+                    return False
+                if remaining > 0:
+                    return True
+            
+            # Derivatives of a content-addressed file go with it
+            file_names = [file_name] + [
+                path for path in (logo_variant_path(file_name, variant) for variant in LOGO_VARIANTS) if path
+            ]
+            try:
+                response = self._call(self.supabase.storage.from_(self.bucket).remove, file_names)
+            finally:
+                if file_name.startswith(CONTENT_PREFIX) and not self.objects.purge(file_name):
+                    current_app.logger.error(f"Could not purge storage record of {file_name}")
             
-            # Clear cache entry if it exists
-            if file_name in self._url_cache:
-                del self._url_cache[file_name]
+            # Drop cached signed URLs and variants for the file
+            for expiration in self._url_expirations:
+                for name in file_names:
+                    get_cache().delete(self._url_cache_key(name, expiration))
+            get_cache().delete(self._variants_cache_key(file_name))
                 
             if hasattr(response, 'error') and response.error:
                 current_app.logger.error(f"Supabase delete error: {response.error}")
@@ -126,6 +399,18 @@ class SupabaseStorageService:
             current_app.logger.error(f"Supabase Storage delete error: {e}")
             return False
     
+    def download_file(self, file_name):
+        """
+        Download a file's content.
+        
+        Args:
+            file_name: The name of the file
+            
+        Returns:
+            bytes: The file content
+        """
+        return self._call(self.supabase.storage.from_(self.bucket).download, file_name)
+    
     def get_public_url(self, file_name):
         """
         Get a public URL for a file.
@@ -145,7 +430,8 @@ class SupabaseStorageService:
     def get_file_url(self, file_name, expiration=3600):
         """
         Generate a URL for a file that expires after a certain time.
-        Uses caching to avoid generating new URLs unnecessarily.
+        Uses caching to avoid generating new URLs unnecessarily; cached URLs
+        close to expiry are returned and re-signed in the background.
         
         Args:
             file_name: The name of the file
@@ -154,35 +440,260 @@ class SupabaseStorageService:
         Returns:
             str: The signed URL
         """
-        # Check cache first
-        cache_key = f"{file_name}:{expiration}"
-        cache_entry = self._url_cache.get(cache_key)
+        return self.get_file_urls([file_name], expiration).get(file_name)
+    
+    def get_file_urls(self, file_names, expiration=3600):
+        """
+        Generate signed URLs for several files with at most one storage round trip.
         
-        # If URL is in cache and not expired, return it
-        current_time = time.time()
-        if cache_entry and cache_entry['expires_at'] > current_time:
-            return cache_entry['url']
+        Args:
+            file_names: The names of the files
+            expiration: The number of seconds until the URLs expire
+            
+        Returns:
+            dict: Signed URL keyed by file name (files that could not be signed are omitted)
+        """
+        urls = {}
+        missing = []
+        stale = []
+        now = time.time()
+        for file_name in dict.fromkeys(file_names):
+            entry = get_cache().get(self._url_cache_key(file_name, expiration))
+            if entry:
+                urls[file_name] = entry['url']
+                if now >= entry['refresh_at']:
+                    stale.append(file_name)
+            else:
+                missing.append(file_name)
         
-        # Otherwise generate a new URL
+        if missing:
+            urls.update(self._sign_urls(missing, expiration))
+        if stale:
+            self._schedule_refresh(stale, expiration)
+        return urls
+    
+    def _sign_urls(self, file_names, expiration):
+        """Sign URLs in one storage call and cache them."""
+        storage = self.supabase.storage.from_(self.bucket)
         try:
-            response = self.supabase.storage.from_(self.bucket).create_signed_url(
-                file_name,
-                expiration
-            )
-            
-            if hasattr(response, 'error') and response.error:
-                current_app.logger.error(f"Supabase signed URL error: {response.error}")
-                return None
-            
-            signed_url = response.get('signedURL')
-            if signed_url:
-                # Cache the URL
-                self._url_cache[cache_key] = {
-                    'url': signed_url,
-                    'expires_at': current_time + expiration - 60  # Buffer of 60 seconds
-                }
-                
-            return signed_url
+            if len(file_names) == 1:
+                response = self._call(storage.create_signed_url, file_names[0], expiration)
+                results = [{'path': file_names[0], 'signedURL': response.get('signedURL'), 'error': None}]
+            else:
+                results = self._call(storage.create_signed_urls, list(file_names), expiration)
         except Exception as e:
             current_app.logger.error(f"Supabase Storage signed URL error: {e}")
-            return None 
\ No newline at end of file
+            return {}
+        
+        urls = {}
+        signed_at = time.time()
+        for item in results:
+            if item.get('error') or not item.get('signedURL'):
+                current_app.logger.error(f"Supabase signed URL error for {item.get('path')}: {item.get('error')}")
+                continue
+            urls[item['path']] = item['signedURL']
+            self._cache_url(item['path'], expiration, item['signedURL'], signed_at)
+        return urls
+    
+    def _cache_url(self, file_name, expiration, url, signed_at):
+        # Stop serving a URL 60 seconds before it expires; start re-signing it earlier
+        lifetime = max(expiration - 60, 1)
+        refresh_ahead = current_app.config.get('STORAGE_URL_REFRESH_AHEAD', 0.2)
+        self._url_expirations.add(expiration)
+        get_cache().set(self._url_cache_key(file_name, expiration), {
+            'url': url,
+            'refresh_at': signed_at + lifetime * (1 - refresh_ahead)
+        }, ttl=lifetime)
+    
+    def _schedule_refresh(self, file_names, expiration):
+        """Re-sign URLs that are close to expiry without blocking the request."""
+        with _refresh_lock:
+            file_names = [name for name in file_names if (self.bucket, name, expiration) not in _refreshing]
+            _refreshing.update((self.bucket, name, expiration) for name in file_names)
+        if not file_names:
+            return
+        
+        app = current_app._get_current_object()
+        
+        def refresh():
+            with app.app_context():
+                try:
+                    self._sign_urls(file_names, expiration)
+                finally:
+                    with _refresh_lock:
+                        _refreshing.difference_update((self.bucket, name, expiration) for name in file_names)
+        
+        _refresh_executor.submit(refresh)
+    
+    def _url_cache_key(self, file_name, expiration):
+        return f"signed_url:{self.bucket}:{file_name}:{expiration}"
+    
+    def get_logo_variants(self, logos):
+        """
+        Get the derivatives generated for content-addressed logos.
+        
+        Logos with every variant in ``LOGO_VARIANTS`` are cached, since their
+        derivatives never change; the others are read with one query.
+        
+        Args:
+            logos: Logo storage paths (others than ``sha256/<hex>`` are ignored)
+            
+        Returns:
+            dict: Generated variant names keyed by logo (logos that could not be
+            looked up are left out)
+        """
+        variants = {}
+        missing = []
+        for logo in dict.fromkeys(logos):
+            if not logo_variant_path(logo, next(iter(LOGO_VARIANTS))):
+                continue
+            cached = get_cache().get(self._variants_cache_key(logo))
+            if cached is not None:
+                variants[logo] = cached
+            else:
+                missing.append(logo)
+        
+        if missing:
+            recorded = self.objects.get_variants(missing)
+            if recorded is None:
+                current_app.logger.error(f"Could not read the logo variants of {len(missing)} logos")
+                return variants
+            for logo in missing:
+                variants[logo] = [variant for variant in LOGO_VARIANTS if variant in recorded.get(logo, ())]
+                self._cache_variants(logo, variants[logo])
+        return variants
+    
+    def record_logo_variants(self, logo, variants):
+        """
+        Record which derivatives of a logo have been generated.
+        
+        Returns:
+            bool: True if they were recorded, False otherwise
+        """
+        variants = [variant for variant in LOGO_VARIANTS if variant in variants]
+        if not self.objects.set_variants(logo, variants):
+            return False
+        self._cache_variants(logo, variants)
+        return True
+    
+    def _cache_variants(self, logo, variants):
+        if len(variants) == len(LOGO_VARIANTS):
+            get_cache().set(self._variants_cache_key(logo), variants, ttl=VARIANTS_CACHE_TTL)
+    
+    def _variants_cache_key(self, logo):
+        return f"logo_variants:{self.bucket}:{logo}"
+
+def resolve_logo_urls(companies, expiration=3600):
+    """
+    Add ``logo_url`` and ``logo_variants`` to company dicts, signing stored
+    logos and their derivatives in one round trip.
+    
+    Logos that are already absolute URLs are passed through unchanged.
+    ``logo_variants`` maps variant names (see ``LOGO_VARIANTS``) to URLs and
+    only lists derivatives recorded as generated, so it is empty for
+    external logos and for logos still being processed. Logos with missing
+    derivatives have them generated in the background.
+    
+    Args:
+        companies: Company dicts as returned by ``to_dict()``
+        expiration: The number of seconds until the URLs expire
+        
+    Returns:
+        list: The same dicts, each with ``logo_url`` and ``logo_variants`` keys
+    """
+    stored = [company.get('logo') for company in companies if _is_storage_path(company.get('logo'))]
+    
+    urls = {}
+    variants = {}
+    if stored:
+        try:
+            service = SupabaseStorageService.get_instance()
+            variants = service.get_logo_variants(stored)
+            paths = stored + [
+                logo_variant_path(logo, variant) for logo, names in variants.items() for variant in names
+            ]
+            urls = service.get_file_urls(paths, expiration)
+        except Exception as e:
+            current_app.logger.error(f"Could not sign company logo URLs: {e}")
+    
+    incomplete = [logo for logo, names in variants.items() if len(names) < len(LOGO_VARIANTS)]
+    if incomplete:
+        # Imported here because app.services.images builds on this module
+        from app.services.images import schedule_logo_variants
+        for logo in incomplete:
+            schedule_logo_variants(logo)
+    
+    for company in companies:
+        logo = company.get('logo')
+        company['logo_url'] = urls.get(logo) if _is_storage_path(logo) else logo
+        company['logo_variants'] = {
+            variant: urls[path] for variant in variants.get(logo, ())
+            if (path := logo_variant_path(logo, variant)) in urls
+        }
+    return companies
+
+def logo_variant_path(logo, variant):
+    """Storage path of a logo derivative, or None for logos that are not content-addressed."""
+    if not logo or not logo.startswith(CONTENT_PREFIX):
+        return None
+    return f"{VARIANT_PREFIX}{logo[len(CONTENT_PREFIX):]}/{variant}.webp"
+
+def _is_storage_path(logo):
+    return bool(logo) and '://' not in logo
+
+def _unwrap_file_storage(file_data, content_type=None):
+    """Return the stream inside a Werkzeug ``FileStorage`` and the client's content type."""
+    if hasattr(file_data, 'stream') and hasattr(file_data, 'mimetype'):
+        return file_data.stream, content_type or file_data.mimetype
+    return file_data, content_type
+
+def _is_seekable(stream):
+    try:
+        return stream.seekable()
+    except (AttributeError, OSError, ValueError):
+        return False
+
+def _hash_stream(stream, chunk_size, copy_to=None):
+    """
+    SHA-256 and size of a stream's remaining content, read in chunks.
+    
+    The stream is rewound to where it started, or, when ``copy_to`` is given,
+    copied there and ``copy_to`` is rewound instead.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    start = stream.tell() if copy_to is None else None
+    while True:
+        chunk = _read_chunk(stream, chunk_size)
+        if not chunk:
+            break
+        digest.update(chunk)
+        size += len(chunk)
+        if copy_to is not None:
+            copy_to.write(chunk)
+    (stream if copy_to is None else copy_to).seek(start or 0)
+    return digest.hexdigest(), size
+
+def _read_chunk(stream, size):
+    """Read up to ``size`` bytes, looping over short reads from sockets and pipes."""
+    parts = []
+    remaining = size
+    while remaining > 0:
+        data = stream.read(remaining)
+        if not data:
+            break
+        parts.append(data)
+        remaining -= len(data)
+    return b''.join(parts)
+
+def _stream_size(stream, already_read=0):
+    """Total size of a seekable stream, or None when it can only be read forward."""
+    try:
+        if not stream.seekable():
+            return None
+        position = stream.tell()
+        end = stream.seek(0, io.SEEK_END)
+        stream.seek(position)
+        return end - position + already_read
+    except (AttributeError, OSError, ValueError):
+        return None
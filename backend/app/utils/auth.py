@@ -1,37 +1,66 @@
+import asyncio
 import functools
 from flask import jsonify, current_app
 from flask_jwt_extended import jwt_required, get_jwt_identity
 from app.utils.error_handlers import APIError
+from app.utils.cache import TTLCache
+from app.utils.cache_backends import get_cache
+
+# Short-lived cache of user rows keyed by user id (JWT subject)
+_user_profile_cache = TTLCache(maxsize=4096, ttl=30)
+
+def _admin_role_key(user_id):
+    return f"admin_role:{user_id}"
+
+def _ensure_admin():
+    """Raise a 403 APIError unless the JWT identity is an administrator."""
+    # Get current user ID from JWT
+    user_id = get_jwt_identity()
+    
+    try:
+        # Access Supabase client from app context
+        supabase = current_app.supabase
+        
+        # Role lookups are shared across workers through the cache backend
+        cache_key = _admin_role_key(user_id)
+        is_admin = get_cache().get(cache_key)
+        if is_admin is None:
+            # Query for the user and check admin status
+            response = supabase.table('users').select('is_admin').eq('id', user_id).execute()
+            is_admin = bool(response.data and response.data[0].get('is_admin', False))
+            get_cache().set(cache_key, is_admin, ttl=current_app.config.get('ADMIN_ROLE_CACHE_TTL', 60))
+        
+        if not is_admin:
+            raise APIError("Administrator privileges required", status_code=403)
+        
+    except Exception as e:
+        if isinstance(e, APIError):
+            raise e
+        else:
+            raise APIError(f"Authorization error: {str(e)}", status_code=403)
 
 def admin_required(fn):
     """
     Decorator for endpoints that require admin privileges.
     Must be used together with jwt_required.
+    Works for both sync and async view functions.
     """
+    if asyncio.iscoroutinefunction(fn):
+        @functools.wraps(fn)
+        @jwt_required()
+        async def async_wrapper(*args, **kwargs):
+            _ensure_admin()
+            # If admin, proceed with the original function
+            return await fn(*args, **kwargs)
+        
+        return async_wrapper
+    
     @functools.wraps(fn)
     @jwt_required()
     def wrapper(*args, **kwargs):
-        # Get current user ID from JWT
-        user_id = get_jwt_identity()
-        
-        try:
-            # Access Supabase client from app context
-            supabase = current_app.supabase
-            
-            # Query for the user and check admin status
-            response = supabase.table('users').select('is_admin').eq('id', user_id).execute()
-            
-            if not response.data or not response.data[0].get('is_admin', False):
-                raise APIError("Administrator privileges required", status_code=403)
-            
-            # If admin, proceed with the original function
-            return fn(*args, **kwargs)
-            
-        except Exception as e:
-            if isinstance(e, APIError):
-                raise e
-            else:
-                raise APIError(f"Authorization error: {str(e)}", status_code=403)
+        _ensure_admin()
+        # If admin, proceed with the original function
+        return fn(*args, **kwargs)
     
     return wrapper
 
@@ -47,4 +76,33 @@ def get_current_user():
         return response.data[0]
     except Exception as e:
         current_app.logger.error(f"Error fetching current user: {str(e)}")
-        return None 
\ No newline at end of file
+        return None 
+
+def get_cached_user_profile(user_id, loader):
+    """
+    Get a user's profile from the short-TTL cache, loading it on a miss.
+    
+    Args:
+        user_id: The user id (JWT subject)
+        loader: Callable taking the user id and returning the profile or None
+    
+    Returns:
+        The cached or freshly loaded profile, or None if the user does not exist
+    """
+    profile = _user_profile_cache.get(user_id)
+    if profile is not None:
+        return profile
+    
+    profile = loader(user_id)
+    if profile is not None:
+        ttl = current_app.config.get('USER_PROFILE_CACHE_TTL', _user_profile_cache.ttl)
+        _user_profile_cache.set(user_id, profile, ttl=ttl)
+    return profile
+
+def invalidate_user_profile(user_id):
+    """Drop a user's cached profile after it changes."""
+    _user_profile_cache.delete(user_id)
+
+def invalidate_admin_role(user_id):
+    """Drop a user's cached admin flag after it changes."""
+    get_cache().delete(_admin_role_key(user_id))
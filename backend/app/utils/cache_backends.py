@@ -0,0 +1,253 @@
+"""
+Pluggable cache backends shared by the application's caches.
+
+``get_cache()`` returns the backend selected by ``CACHE_BACKEND``:
+
+- ``memory``: a per-process LRU (``TTLCache``). This is the default and
+  needs nothing external.
+- ``shared_memory``: an SQLite file on a tmpfs mount (``/dev/shm`` by
+  default). Every worker process on the host sees the same entries.
+- ``redis``: a Redis server (``CACHE_REDIS_URL``), shared by every host.
+
+All backends take the same ``get``/``set``/``delete``/``clear`` calls with
+per-entry TTLs. A backend error counts as a cache miss, so an unreachable
+cache slows requests down but does not fail them. Values in the shared
+backends are pickled; only the application writes to them.
+"""
+import logging
+import os
+import pickle
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Any, Optional
+
+from app.utils.cache import TTLCache
+from app.utils.metrics import metrics
+
+try:
+    import redis
+except ImportError:  # pragma: no cover - redis is only needed for CACHE_BACKEND=redis
+    redis = None
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class CacheBackend:
+    """Base class: subclasses implement the ``_get``/``_set``/``_delete``/``_clear`` primitives."""
+
+    name = 'base'
+    # Whether every worker process reads the same entries (so a delete is seen by all)
+    shared = False
+
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return the cached value or ``default``."""
+        try:
+            value = self._get(key)
+        except Exception as e:
+            logger.warning(f"Cache get failed on {self.name} backend: {e}")
+            value = _MISSING
+        metrics.inc('cache_requests_total', backend=self.name,
+                    result='miss' if value is _MISSING else 'hit')
+        return default if value is _MISSING else value
+
+    def set(self, key: str, value: Any, ttl: Optional[float] = None) -> None:
+        """Store ``value``, expiring after ``ttl`` seconds (never when None)."""
+        try:
+            self._set(key, value, ttl)
+        except Exception as e:
+            logger.warning(f"Cache set failed on {self.name} backend: {e}")
+
+    def delete(self, key: str) -> None:
+        """Remove an entry if present."""
+        try:
+            self._delete(key)
+        except Exception as e:
+            logger.warning(f"Cache delete failed on {self.name} backend: {e}")
+
+    def clear(self) -> None:
+        """Remove every entry owned by this backend."""
+        try:
+            self._clear()
+        except Exception as e:
+            logger.warning(f"Cache clear failed on {self.name} backend: {e}")
+
+    def _get(self, key: str) -> Any:
+        raise NotImplementedError
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        raise NotImplementedError
+
+    def _delete(self, key: str) -> None:
+        raise NotImplementedError
+
+    def _clear(self) -> None:
+        raise NotImplementedError
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Per-process LRU; values are stored by reference."""
+
+    name = 'memory'
+
+    def __init__(self, maxsize: int = 10000):
+        self._cache = TTLCache(maxsize=maxsize, ttl=None)
+
+    def _get(self, key: str) -> Any:
+        return self._cache.get(key, _MISSING)
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        self._cache.set(key, value, ttl=ttl)
+
+    def _delete(self, key: str) -> None:
+        self._cache.delete(key)
+
+    def _clear(self) -> None:
+        self._cache.clear()
+
+
+class SharedMemoryCacheBackend(CacheBackend):
+    """
+    Host-wide cache in an SQLite database on tmpfs.
+
+    Every process opens the same file, so forked workers share entries.
+    When the entry count exceeds ``maxsize`` the least recently written
+    entries are evicted.
+    """
+
+    name = 'shared_memory'
+    shared = True
+
+    def __init__(self, path: Optional[str] = None, maxsize: int = 10000):
+        if path is None:
+            directory = '/dev/shm' if os.path.isdir('/dev/shm') else tempfile.gettempdir()
+            path = os.path.join(directory, 'app-cache.sqlite3')
+        self.path = path
+        self.maxsize = maxsize
+        self._local = threading.local()
+        with self._connection() as conn:
+            conn.execute(
+                'CREATE TABLE IF NOT EXISTS cache ('
+                'key TEXT PRIMARY KEY, value BLOB NOT NULL, expires_at REAL, written_at REAL NOT NULL)'
+            )
+            conn.execute('CREATE INDEX IF NOT EXISTS cache_written_at ON cache (written_at)')
+
+    def _connection(self) -> sqlite3.Connection:
+        # sqlite3 connections must not cross threads; one per thread per process
+        conn = getattr(self._local, 'conn', None)
+        if conn is None or getattr(self._local, 'pid', None) != os.getpid():
+            conn = sqlite3.connect(self.path, timeout=1.0, isolation_level=None)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=OFF')
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _get(self, key: str) -> Any:
+        row = self._connection().execute(
+            'SELECT value, expires_at FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        if row is None:
+            return _MISSING
+        value, expires_at = row
+        if expires_at is not None and expires_at <= time.time():
+            self._delete(key)
+            return _MISSING
+        return pickle.loads(value)
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        now = time.time()
+        expires_at = now + ttl if ttl is not None else None
+        conn = self._connection()
+        conn.execute(
+            'INSERT OR REPLACE INTO cache (key, value, expires_at, written_at) VALUES (?, ?, ?, ?)',
+            (key, pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL), expires_at, now)
+        )
+        # Evict expired entries first, then the oldest ones above maxsize
+        conn.execute('DELETE FROM cache WHERE expires_at IS NOT NULL AND expires_at <= ?', (now,))
+        conn.execute(
+            'DELETE FROM cache WHERE key IN (SELECT key FROM cache ORDER BY written_at DESC LIMIT -1 OFFSET ?)',
+            (self.maxsize,)
+        )
+
+    def _delete(self, key: str) -> None:
+        self._connection().execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def _clear(self) -> None:
+        self._connection().execute('DELETE FROM cache')
+
+
+class RedisCacheBackend(CacheBackend):
+    """Cluster-wide cache on Redis; keys are namespaced with ``prefix``."""
+
+    name = 'redis'
+    shared = True
+
+    def __init__(self, client=None, url: Optional[str] = None, prefix: str = 'app:'):
+        if client is None:
+            if redis is None:
+                raise RuntimeError("CACHE_BACKEND=redis requires the 'redis' package")
+            client = redis.Redis.from_url(url or 'redis://localhost:6379/0',
+                                          socket_timeout=0.5, socket_connect_timeout=0.5)
+        self.client = client
+        self.prefix = prefix
+
+    def _get(self, key: str) -> Any:
+        value = self.client.get(self.prefix + key)
+        return _MISSING if value is None else pickle.loads(value)
+
+    def _set(self, key: str, value: Any, ttl: Optional[float]) -> None:
+        payload = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        if ttl is None:
+            self.client.set(self.prefix + key, payload)
+        elif ttl > 0:
+            self.client.set(self.prefix + key, payload, px=max(1, int(ttl * 1000)))
+
+    def _delete(self, key: str) -> None:
+        self.client.delete(self.prefix + key)
+
+    def _clear(self) -> None:
+        keys = list(self.client.scan_iter(match=self.prefix + '*', count=500))
+        if keys:
+            self.client.delete(*keys)
+
+
+_backend: CacheBackend = MemoryCacheBackend()
+
+
+def get_cache() -> CacheBackend:
+    """Get the configured cache backend."""
+    return _backend
+
+
+def set_cache(backend: CacheBackend) -> None:
+    """Replace the cache backend (used by ``configure_cache`` and tests)."""
+    global _backend
+    _backend = backend
+
+
+def create_cache_backend(config) -> CacheBackend:
+    """Build the backend selected by a Flask config mapping."""
+    kind = config.get('CACHE_BACKEND', 'memory')
+    maxsize = int(config.get('CACHE_MAX_ENTRIES', 10000))
+    if kind == 'memory':
+        return MemoryCacheBackend(maxsize=maxsize)
+    if kind == 'shared_memory':
+        return SharedMemoryCacheBackend(path=config.get('CACHE_SHARED_MEMORY_PATH'), maxsize=maxsize)
+    if kind == 'redis':
+        return RedisCacheBackend(url=config.get('CACHE_REDIS_URL'),
+                                 prefix=config.get('CACHE_KEY_PREFIX', 'app:'))
+    raise ValueError(f"Unknown CACHE_BACKEND: {kind}")
+
+
+def configure_cache(config) -> CacheBackend:
+    """Install the backend selected by a Flask config mapping."""
+    backend = create_cache_backend(config)
+    set_cache(backend)
+    return backend
+
+
+metrics.describe('cache_requests_total', 'counter', 'Shared cache lookups by backend and result.')
@@ -0,0 +1,193 @@
+"""
+Circuit breakers for backing services.
+
+One breaker per dependency (db, auth, storage, search) tracks the outcome of
+recent calls. Once the failure rate over the window crosses the threshold the
+breaker opens and calls fail fast with ``CircuitOpenError`` instead of waiting
+out network timeouts. After the recovery timeout a limited number of half-open
+probe calls are let through; a successful probe closes the breaker again.
+"""
+import threading
+import time
+from collections import deque
+from typing import Any, Callable, Dict
+
+from app.utils.error_handlers import APIError
+from app.utils.metrics import metrics
+from app.utils.retry import is_retryable_error
+
+CLOSED = 'closed'
+OPEN = 'open'
+HALF_OPEN = 'half_open'
+
+_STATE_VALUES = {CLOSED: 0, HALF_OPEN: 1, OPEN: 2}
+
+# Dependencies guarded by a breaker
+DEPENDENCIES = ('db', 'auth', 'storage', 'search')
+
+
+class CircuitOpenError(APIError):
+    """Raised when a call is rejected because its circuit is open"""
+    def __init__(self, name, payload=None):
+        super().__init__(f"The {name} service is temporarily unavailable", status_code=503, payload=payload)
+        self.name = name
+
+
+class CircuitBreaker:
+    """Failure-rate circuit breaker with half-open probing."""
+
+    def __init__(self, name: str, failure_rate_threshold: float = 0.5, minimum_calls: int = 10,
+                 window_size: int = 20, recovery_timeout: float = 30.0, half_open_max_calls: int = 1,
+                 is_failure: Callable[[BaseException], bool] = is_retryable_error):
+        self.name = name
+        self.failure_rate_threshold = failure_rate_threshold
+        self.minimum_calls = minimum_calls
+        self.recovery_timeout = recovery_timeout
+        self.half_open_max_calls = half_open_max_calls
+        self.is_failure = is_failure
+        self._lock = threading.Lock()
+        self._outcomes = deque(maxlen=window_size)
+        self._state = CLOSED
+        self._opened_at = 0.0
+        self._half_open_in_flight = 0
+
+    def configure(self, failure_rate_threshold: float, minimum_calls: int, window_size: int,
+                  recovery_timeout: float) -> None:
+        """Update thresholds; the outcome window is kept."""
+        with self._lock:
+            self.failure_rate_threshold = failure_rate_threshold
+            self.minimum_calls = minimum_calls
+            self.recovery_timeout = recovery_timeout
+            self._outcomes = deque(self._outcomes, maxlen=window_size)
+
+    @property
+    def state(self) -> str:
+        """Current state, moving from open to half-open once the recovery timeout passed."""
+        with self._lock:
+            self._maybe_half_open()
+            return self._state
+
+    @property
+    def is_open(self) -> bool:
+        """True while calls are being rejected without probing."""
+        return self.state == OPEN
+
+    def _maybe_half_open(self) -> None:
+        if self._state == OPEN and time.monotonic() - self._opened_at >= self.recovery_timeout:
+            self._state = HALF_OPEN
+            self._half_open_in_flight = 0
+
+    def _trip(self) -> None:
+        self._state = OPEN
+        self._opened_at = time.monotonic()
+        self._half_open_in_flight = 0
+        metrics.inc('circuit_breaker_opened_total', dependency=self.name)
+
+    def allow_request(self) -> bool:
+        """Reserve permission for one call; False means fail fast."""
+        with self._lock:
+            self._maybe_half_open()
+            if self._state == CLOSED:
+                return True
+            if self._state == HALF_OPEN and self._half_open_in_flight < self.half_open_max_calls:
+                self._half_open_in_flight += 1
+                return True
+            return False
+
+    def record_success(self) -> None:
+        """Record a successful call."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._state = CLOSED
+                self._outcomes.clear()
+                self._half_open_in_flight = 0
+            self._outcomes.append(True)
+
+    def record_failure(self) -> None:
+        """Record a failed call, opening the circuit when the failure rate is too high."""
+        with self._lock:
+            if self._state == HALF_OPEN:
+                self._trip()
+                return
+            self._outcomes.append(False)
+            if len(self._outcomes) >= self.minimum_calls:
+                failures = self._outcomes.count(False)
+                if failures / len(self._outcomes) >= self.failure_rate_threshold:
+                    self._trip()
+
+    def call(self, func: Callable, *args, **kwargs):
+        """
+        Call ``func`` through the breaker.
+
+        Raises:
+            CircuitOpenError: If the circuit is open
+        """
+        if not self.allow_request():
+            metrics.inc('circuit_breaker_rejected_total', dependency=self.name)
+            raise CircuitOpenError(self.name)
+
+        try:
+            result = func(*args, **kwargs)
+        except Exception as e:
+            if self.is_failure(e):
+                self.record_failure()
+            else:
+                # The dependency answered; the request itself was bad
+                self.record_success()
+            raise
+        self.record_success()
+        return result
+
+    def reset(self) -> None:
+        """Force the breaker closed and forget recorded outcomes."""
+        with self._lock:
+            self._state = CLOSED
+            self._outcomes.clear()
+            self._half_open_in_flight = 0
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Describe the breaker for health and metrics endpoints."""
+        with self._lock:
+            self._maybe_half_open()
+            failures = self._outcomes.count(False)
+            total = len(self._outcomes)
+            return {
+                'state': self._state,
+                'failure_rate': round(failures / total, 3) if total else 0.0,
+                'window_calls': total,
+            }
+
+
+_breakers: Dict[str, CircuitBreaker] = {name: CircuitBreaker(name) for name in DEPENDENCIES}
+
+
+def get_breaker(name: str) -> CircuitBreaker:
+    """Get the circuit breaker for a dependency."""
+    return _breakers[name]
+
+
+def breaker_states() -> Dict[str, Dict[str, Any]]:
+    """Snapshot every breaker, keyed by dependency."""
+    return {name: breaker.snapshot() for name, breaker in _breakers.items()}
+
+
+def configure_breakers(config) -> None:
+    """Apply circuit breaker settings from a Flask config mapping."""
+    for breaker in _breakers.values():
+        breaker.configure(
+            failure_rate_threshold=float(config.get('CIRCUIT_BREAKER_FAILURE_RATE', 0.5)),
+            minimum_calls=int(config.get('CIRCUIT_BREAKER_MINIMUM_CALLS', 10)),
+            window_size=int(config.get('CIRCUIT_BREAKER_WINDOW_SIZE', 20)),
+            recovery_timeout=float(config.get('CIRCUIT_BREAKER_RECOVERY_TIMEOUT', 30))
+        )
+
+
+def _collect_breaker_states(registry) -> None:
+    for name, breaker in _breakers.items():
+        registry.set_gauge('circuit_breaker_state', _STATE_VALUES[breaker.state], dependency=name)
+
+
+metrics.describe('circuit_breaker_state', 'gauge', 'Circuit state per dependency (0=closed, 1=half_open, 2=open).')
+metrics.describe('circuit_breaker_opened_total', 'counter', 'Times a circuit has opened.')
+metrics.describe('circuit_breaker_rejected_total', 'counter', 'Calls rejected while a circuit was open.')
+metrics.register_collector(_collect_breaker_states)
@@ -0,0 +1,155 @@
+"""
+Per-request batching of lookups by id.
+
+Handlers and models fetch records one ``find_by_id`` at a time. Within a
+request, a ``DataLoader`` turns those calls into as few queries as
+possible without changing their interface:
+
+- Ids requested in the same event-loop tick (for example from
+  ``asyncio.gather``) are collected and resolved by one call to the
+  loader's batch function, typically a single ``in_('id', ids)`` query.
+- Each id is fetched at most once per request; later lookups reuse the
+  result. Writes call ``forget`` so a request never reads its own stale
+  data.
+
+Loaders live on ``flask.g`` and exist only inside a request, so scripts and
+background jobs keep querying directly. The queries saved are added to the
+request's instrumentation record and reported by ``register_request_metrics``.
+"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict, Hashable, Iterable, List, Optional
+
+from flask import g, has_request_context
+
+from app.utils.metrics import get_request_stats, metrics
+
+# Largest batch handed to a batch function at once
+MAX_BATCH_SIZE = 200
+
+BatchLoad = Callable[[List[Any]], Awaitable[Dict[Any, Any]]]
+
+
+def id_key(id: Any) -> Optional[int]:
+    """Normalize an id from a URL, JWT or JSON body; None for ids that cannot exist."""
+    try:
+        return int(id)
+    except (TypeError, ValueError):
+        return None
+
+
+class DataLoader:
+    """Collects lookups by key and resolves them in batches, caching results."""
+
+    def __init__(self, name: str, batch_load: BatchLoad,
+                 key: Callable[[Any], Optional[Hashable]] = id_key, max_batch_size: int = MAX_BATCH_SIZE):
+        self.name = name
+        self.max_batch_size = max_batch_size
+        self._batch_load = batch_load
+        self._key = key
+        self._futures: Dict[Hashable, asyncio.Future] = {}
+        self._queue: List[Hashable] = []
+        self.loads = 0
+        self.batches = 0
+
+    async def load(self, id: Any) -> Any:
+        """
+        Load one record, sharing the query with every other load of this tick.
+
+        Returns:
+            The record, or None if the batch function did not return it
+        """
+        key = self._key(id)
+        if key is None:
+            return None
+
+        self.loads += 1
+        loop = asyncio.get_running_loop()
+        future = self._futures.get(key)
+        if future is None or future.get_loop() is not loop:
+            future = self._futures[key] = loop.create_future()
+            self._queue.append(key)
+            if len(self._queue) == 1:
+                loop.call_soon(self._dispatch)
+        else:
+            self._saved(1)
+        return await asyncio.shield(future)
+
+    async def load_many(self, ids: Iterable[Any]) -> List[Any]:
+        """Load several records with as few queries as possible, in the order of ``ids``."""
+        return list(await asyncio.gather(*(self.load(id) for id in ids)))
+
+    def forget(self, id: Any) -> None:
+        """Drop a cached record after it was written."""
+        key = self._key(id)
+        future = self._futures.get(key)
+        if future is not None and future.done():
+            del self._futures[key]
+
+    def _dispatch(self) -> None:
+        keys, self._queue = self._queue, []
+        futures = [self._futures[key] for key in keys]
+        for start in range(0, len(keys), self.max_batch_size):
+            end = start + self.max_batch_size
+            asyncio.ensure_future(self._run(keys[start:end], futures[start:end]))
+
+    async def _run(self, keys: List[Hashable], futures: List[asyncio.Future]) -> None:
+        self.batches += 1
+        self._saved(len(keys) - 1)
+        metrics.inc('dataloader_batches_total', loader=self.name)
+        metrics.inc('dataloader_keys_total', len(keys), loader=self.name)
+        try:
+            values = await self._batch_load(keys)
+        except Exception as e:
+            for key, future in zip(keys, futures):
+                # Let a later load retry instead of caching the failure
+                if self._futures.get(key) is future:
+                    del self._futures[key]
+                future.set_exception(e)
+            return
+        for key, future in zip(keys, futures):
+            future.set_result(values.get(key))
+
+    def _saved(self, count: int) -> None:
+        if not count:
+            return
+        metrics.inc('dataloader_queries_saved_total', count, loader=self.name)
+        stats = get_request_stats()
+        if stats is not None:
+            saved = stats.setdefault('queries_saved', {})
+            saved[self.name] = saved.get(self.name, 0) + count
+
+
+def request_loader(name: str, batch_load: BatchLoad, scope: Hashable = None) -> Optional[DataLoader]:
+    """
+    Get this request's loader for ``name``, creating it on first use.
+
+    Args:
+        name: The loader's name (used in metrics)
+        batch_load: Resolves a list of keys to a dict of records keyed the same way
+        scope: Separates loaders whose results differ, e.g. per database client
+
+    Returns:
+        DataLoader: The loader, or None outside a request
+    """
+    if not has_request_context():
+        return None
+    loaders = g.setdefault('_dataloaders', {})
+    loader = loaders.get((name, scope))
+    if loader is None:
+        loader = loaders[(name, scope)] = DataLoader(name, batch_load)
+    return loader
+
+
+def forget(name: str, id: Any) -> None:
+    """Drop a record from this request's ``name`` loaders after writing it."""
+    if not has_request_context():
+        return
+    for (loader_name, _), loader in g.get('_dataloaders', {}).items():
+        if loader_name == name:
+            loader.forget(id)
+
+
+metrics.describe('dataloader_batches_total', 'counter', 'Batched lookups issued by request data loaders.')
+metrics.describe('dataloader_keys_total', 'counter', 'Keys resolved by request data loader batches.')
+metrics.describe('dataloader_queries_saved_total', 'counter',
+                 'Lookups answered by a shared batch or the per-request cache instead of their own query.')
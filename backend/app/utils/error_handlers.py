@@ -39,6 +39,11 @@ class NotFoundError(APIError):
     def __init__(self, message, payload=None):
         super().__init__(message, status_code=404, payload=payload)
 
+class ConflictError(APIError):
+    """Raised when a write conflicts with existing data"""
+    def __init__(self, message, payload=None):
+        super().__init__(message, status_code=409, payload=payload)
+
 def register_error_handlers(app):
     """Register error handlers for the application"""
     
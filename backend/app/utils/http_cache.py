@@ -0,0 +1,35 @@
+"""
+HTTP caching helpers for read-mostly JSON endpoints.
+"""
+import hashlib
+import json
+from typing import Any, Optional
+
+from flask import jsonify, request
+
+
+def compute_etag(payload: Any) -> str:
+    """Compute a strong ETag for a JSON-serializable payload."""
+    body = json.dumps(payload, sort_keys=True, separators=(',', ':'), default=str)
+    return hashlib.sha256(body.encode('utf-8')).hexdigest()
+
+
+def conditional_json(payload: Any, etag: Optional[str] = None, max_age: int = 0,
+                     public: bool = True):
+    """
+    Build a JSON response carrying ``ETag`` and ``Cache-Control`` headers.
+
+    Requests whose ``If-None-Match`` matches the ETag get an empty
+    ``304 Not Modified`` instead of the body.
+
+    Args:
+        payload: The JSON-serializable response body
+        etag: A precomputed ETag; computed from ``payload`` when omitted
+        max_age: Seconds clients and CDNs may reuse the response without revalidating
+        public: Whether shared caches may store the response
+    """
+    response = jsonify(payload)
+    response.set_etag(etag or compute_etag(payload))
+    visibility = 'public' if public else 'private'
+    response.headers['Cache-Control'] = f'{visibility}, max-age={max_age}, must-revalidate'
+    return response.make_conditional(request)
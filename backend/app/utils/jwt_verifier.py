@@ -0,0 +1,203 @@
+"""
+Single, cached JWT verifier shared by every authentication path.
+
+``token_verifier`` verifies HS256 tokens against the configured secret and
+asymmetric Supabase tokens against the project's JWKS (keys cached
+in-process). Tokens that verified successfully are remembered in an LRU until
+their ``exp``, so repeated requests carrying the same bearer token skip
+signature verification and claim parsing. Entries are keyed on a fingerprint
+of the verification settings (key, algorithms, options) as well as the token,
+so a rotated secret or tightened audience never serves stale claims. ``token_required`` routes use it
+through ``authenticate_token`` and ``jwt_required`` routes through
+``CachedJWTManager``, which overrides a private flask_jwt_extended method
+and therefore relies on the exact version pinned in requirements.txt.
+
+``verify_supabase_token`` returns the claims when a token is conclusively
+valid, raises ``jwt.InvalidTokenError`` when it is conclusively invalid, and
+returns None when it cannot decide locally (no secret configured, unknown key
+id, JWKS unreachable) so callers can fall back to asking GoTrue.
+"""
+import hashlib
+import logging
+import threading
+import time
+from typing import Any, Callable, Dict, Optional
+
+import jwt
+from flask import current_app
+from flask_jwt_extended import JWTManager
+from flask_jwt_extended.config import config as jwt_config
+from flask_jwt_extended.default_callbacks import default_decode_key_callback
+
+from app.utils.cache import TTLCache
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+_SYMMETRIC_ALGORITHMS = {'HS256'}
+_ASYMMETRIC_ALGORITHMS = {'RS256', 'ES256'}
+
+
+class TokenVerifier:
+    """Verifies JWTs, caching key material and recently validated tokens."""
+
+    def __init__(self, maxsize: int = 10000):
+        self._validated = TTLCache(maxsize=maxsize, ttl=None)
+        self._encoded_keys: Dict[str, bytes] = {}
+        self._jwks_clients: Dict[str, jwt.PyJWKClient] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def fingerprint(*settings) -> bytes:
+        """Digest of the settings a token was verified with (never stores the key itself)."""
+        return hashlib.sha256(repr(settings).encode()).digest()
+
+    @staticmethod
+    def _cache_key(namespace: str, token: str, fingerprint: bytes):
+        # Key on the whole token so a reused signature with a different payload never hits
+        return namespace, fingerprint, hashlib.sha256(token.encode()).digest()
+
+    def cached_claims(self, namespace: str, token: str, fingerprint: bytes = b'') -> Optional[Dict[str, Any]]:
+        """Return the claims of a previously validated, unexpired token."""
+        claims = self._validated.get(self._cache_key(namespace, token, fingerprint))
+        metrics.inc('jwt_verify_cache_total', result='hit' if claims is not None else 'miss')
+        return dict(claims) if claims is not None else None
+
+    def remember(self, namespace: str, token: str, claims: Dict[str, Any], fingerprint: bytes = b'') -> None:
+        """Cache validated claims until the token expires."""
+        exp = claims.get('exp')
+        if exp is None:
+            return
+        ttl = float(exp) - time.time()
+        if ttl > 0:
+            self._validated.set(self._cache_key(namespace, token, fingerprint), dict(claims), ttl=ttl)
+
+    def clear(self) -> None:
+        """Forget validated tokens and cached keys."""
+        self._validated.clear()
+        with self._lock:
+            self._encoded_keys.clear()
+            self._jwks_clients.clear()
+
+    def _hmac_key(self, secret: str) -> bytes:
+        key = self._encoded_keys.get(secret)
+        if key is None:
+            key = secret.encode('utf-8')
+            with self._lock:
+                self._encoded_keys[secret] = key
+        return key
+
+    def _jwks_client(self, supabase_url: str) -> jwt.PyJWKClient:
+        jwks_url = f"{supabase_url.rstrip('/')}/auth/v1/.well-known/jwks.json"
+        with self._lock:
+            client = self._jwks_clients.get(jwks_url)
+            if client is None:
+                lifespan = current_app.config.get('SUPABASE_JWKS_CACHE_SECONDS', 600)
+                client = jwt.PyJWKClient(jwks_url, cache_keys=True, lifespan=lifespan, timeout=5)
+                self._jwks_clients[jwks_url] = client
+            return client
+
+    def verify(self, token: str, secret: str, algorithms=('HS256',), namespace: str = 'hs256',
+               **options) -> Dict[str, Any]:
+        """
+        Verify an HMAC-signed token, using the validated-token cache.
+
+        Raises:
+            jwt.InvalidTokenError: If the token is invalid
+        """
+        fingerprint = self.fingerprint(secret, sorted(algorithms), sorted(options.items()))
+        claims = self.cached_claims(namespace, token, fingerprint)
+        if claims is not None:
+            return claims
+        claims = jwt.decode(token, self._hmac_key(secret), algorithms=list(algorithms), **options)
+        self.remember(namespace, token, claims, fingerprint)
+        return claims
+
+    def verify_supabase_token(self, token: str) -> Optional[Dict[str, Any]]:
+        """
+        Verify a Supabase access token without calling GoTrue.
+
+        Args:
+            token: The encoded JWT
+
+        Returns:
+            dict: The verified claims, or None if the token cannot be verified locally
+
+        Raises:
+            jwt.InvalidTokenError: If the token is malformed, expired or badly signed
+        """
+        fingerprint = self.fingerprint(current_app.config.get('SUPABASE_JWT_SECRET'),
+                                       current_app.config.get('SUPABASE_URL'))
+        claims = self.cached_claims('supabase', token, fingerprint)
+        if claims is not None:
+            return claims
+
+        header = jwt.get_unverified_header(token)
+        algorithm = header.get('alg')
+        options = {'verify_aud': False, 'require': ['exp', 'sub']}
+
+        if algorithm in _SYMMETRIC_ALGORITHMS:
+            secret = current_app.config.get('SUPABASE_JWT_SECRET')
+            if not secret:
+                return None
+            claims = jwt.decode(token, self._hmac_key(secret), algorithms=[algorithm], options=options)
+        elif algorithm in _ASYMMETRIC_ALGORITHMS:
+            supabase_url = current_app.config.get('SUPABASE_URL')
+            if not supabase_url:
+                return None
+            try:
+                signing_key = self._jwks_client(supabase_url).get_signing_key_from_jwt(token)
+            except jwt.PyJWKClientError as e:
+                logger.warning(f"Could not resolve JWKS signing key: {e}")
+                return None
+            claims = jwt.decode(token, signing_key.key, algorithms=[algorithm], options=options)
+        else:
+            return None
+
+        self.remember('supabase', token, claims, fingerprint)
+        return claims
+
+
+# Process-wide verifier shared by all authentication paths
+token_verifier = TokenVerifier()
+
+metrics.describe('jwt_verify_cache_total', 'counter', 'Validated-token cache lookups by result.')
+
+
+def verify_supabase_token(token: str) -> Optional[Dict[str, Any]]:
+    """Verify a Supabase access token locally (see ``TokenVerifier.verify_supabase_token``)."""
+    return token_verifier.verify_supabase_token(token)
+
+
+class CachedJWTManager(JWTManager):
+    """
+    JWTManager whose decode step goes through ``token_verifier``'s cache.
+
+    flask_jwt_extended still runs its own checks (token type, blocklist,
+    freshness) on the returned claims; only the signature verification and
+    claim parsing are skipped for tokens that were validated before.
+
+    The public ``decode_key_loader``/``token_verification_loader`` hooks run
+    around a full decode and cannot skip it, so this overrides the private
+    ``_decode_jwt_from_config``; the Flask-JWT-Extended version is pinned and
+    tests/test_jwt_verifier.py checks the overridden signature.
+    """
+
+    def _decode_jwt_from_config(self, encoded_token: str, csrf_value=None,
+                                allow_expired: bool = False) -> dict:
+        # CSRF and expired-token decodes depend on more than the token itself, and a
+        # custom decode_key_loader may pick a different key per token
+        if csrf_value is not None or allow_expired or self._decode_key_callback is not default_decode_key_callback:
+            return super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+
+        fingerprint = token_verifier.fingerprint(
+            jwt_config.decode_key, jwt_config.decode_algorithms, jwt_config.decode_audience,
+            jwt_config.decode_issuer, jwt_config.leeway, jwt_config.identity_claim_key
+        )
+        claims = token_verifier.cached_claims('flask_jwt', encoded_token, fingerprint)
+        if claims is not None:
+            return claims
+
+        claims = super()._decode_jwt_from_config(encoded_token, csrf_value, allow_expired)
+        token_verifier.remember('flask_jwt', encoded_token, claims, fingerprint)
+        return claims
@@ -0,0 +1,263 @@
+"""
+Request-level instrumentation.
+
+Records per-request latency, Supabase call counts and time, response size and
+Elasticsearch/storage call counts. The numbers are returned to the client in a
+``Server-Timing`` header and aggregated process-wide for the ``/metrics``
+endpoint (Prometheus text exposition format).
+"""
+import threading
+import time
+from collections import defaultdict
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from flask import Response, g, has_request_context, request
+
+# Dependency kinds tracked per request
+DEPENDENCIES = ('supabase', 'elasticsearch', 'storage')
+
+
+class MetricsRegistry:
+    """Thread-safe store of counters and gauges rendered in Prometheus format."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[Tuple[str, Tuple], float] = defaultdict(float)
+        self._gauges: Dict[Tuple[str, Tuple], float] = {}
+        self._help: Dict[str, Tuple[str, str]] = {}
+        self._collectors: List[Callable[['MetricsRegistry'], None]] = []
+
+    def describe(self, name: str, metric_type: str, help_text: str) -> None:
+        """Register the TYPE and HELP lines for a metric."""
+        self._help[name] = (metric_type, help_text)
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        """Increment a counter."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] += value
+
+    def set_gauge(self, name: str, value: float, **labels) -> None:
+        """Set a gauge to an absolute value."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._gauges[key] = value
+
+    def register_collector(self, collector: Callable[['MetricsRegistry'], None]) -> None:
+        """Register a callback that refreshes gauges right before rendering."""
+        self._collectors.append(collector)
+
+    def reset(self) -> None:
+        """Drop all recorded values (collectors and descriptions are kept)."""
+        with self._lock:
+            self._counters.clear()
+            self._gauges.clear()
+
+    def get(self, name: str, **labels) -> float:
+        """Return the current value of a counter or gauge."""
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            if key in self._gauges:
+                return self._gauges[key]
+            return self._counters.get(key, 0)
+
+    def render(self) -> str:
+        """Render all metrics in the Prometheus text exposition format."""
+        for collector in self._collectors:
+            collector(self)
+
+        with self._lock:
+            samples = list(self._counters.items()) + list(self._gauges.items())
+
+        by_name: Dict[str, List[Tuple[Tuple, float]]] = defaultdict(list)
+        for (name, labels), value in samples:
+            by_name[name].append((labels, value))
+
+        lines = []
+        for name in sorted(by_name):
+            if name in self._help:
+                metric_type, help_text = self._help[name]
+                lines.append(f"# HELP {name} {help_text}")
+                lines.append(f"# TYPE {name} {metric_type}")
+            for labels, value in sorted(by_name[name]):
+                if labels:
+                    label_str = ','.join(f'{k}="{_escape(v)}"' for k, v in labels)
+                    lines.append(f"{name}{{{label_str}}} {value:g}")
+                else:
+                    lines.append(f"{name} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+
+def _escape(value: Any) -> str:
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+
+# Process-wide registry
+metrics = MetricsRegistry()
+metrics.describe('http_requests_total', 'counter', 'Total HTTP requests handled.')
+metrics.describe('http_request_duration_seconds_sum', 'counter', 'Cumulative request latency in seconds.')
+metrics.describe('http_response_bytes_total', 'counter', 'Total response body bytes serialized.')
+metrics.describe('dependency_calls_total', 'counter', 'Calls made to backing services.')
+metrics.describe('dependency_call_duration_seconds_sum', 'counter', 'Cumulative time spent in backing services.')
+metrics.describe('http_request_dependency_calls_total', 'counter',
+                 'Backing-service calls per endpoint; high ratios to requests point at N+1 patterns.')
+metrics.describe('http_request_queries_saved_total', 'counter',
+                 'Queries avoided per endpoint by request data loaders (see app.utils.dataloader).')
+
+
+def _new_request_stats() -> Dict[str, Any]:
+    return {
+        'start': time.perf_counter(),
+        'calls': {kind: 0 for kind in DEPENDENCIES},
+        'durations': {kind: 0.0 for kind in DEPENDENCIES},
+    }
+
+
+def get_request_stats() -> Optional[Dict[str, Any]]:
+    """Get the instrumentation record for the current request, if any."""
+    if not has_request_context():
+        return None
+    return g.get('_request_stats')
+
+
+def record_dependency_call(kind: str, elapsed: float) -> None:
+    """
+    Record a call to a backing service.
+
+    Args:
+        kind: One of ``DEPENDENCIES``
+        elapsed: Time spent in the call in seconds
+    """
+    stats = get_request_stats()
+    if stats is not None:
+        stats['calls'][kind] = stats['calls'].get(kind, 0) + 1
+        stats['durations'][kind] = stats['durations'].get(kind, 0.0) + elapsed
+
+    metrics.inc('dependency_calls_total', dependency=kind)
+    metrics.inc('dependency_call_duration_seconds_sum', elapsed, dependency=kind)
+
+
+def timed_call(kind: str, func: Callable, *args, **kwargs):
+    """Call ``func`` and record it as a call to the ``kind`` dependency."""
+    start = time.perf_counter()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        record_dependency_call(kind, time.perf_counter() - start)
+
+
+class _InstrumentedQuery:
+    """Proxy for a PostgREST query builder that times ``execute()``."""
+
+    def __init__(self, builder, kind: str, breaker=None):
+        self._builder = builder
+        self._kind = kind
+        self._breaker = breaker
+
+    def execute(self, *args, **kwargs):
+        if self._breaker is not None:
+            return self._breaker.call(timed_call, self._kind, self._builder.execute, *args, **kwargs)
+        return timed_call(self._kind, self._builder.execute, *args, **kwargs)
+
+    def __getattr__(self, name):
+        attr = getattr(self._builder, name)
+        if not callable(attr):
+            return attr
+
+        def call(*args, **kwargs):
+            result = attr(*args, **kwargs)
+            if hasattr(result, 'execute'):
+                return _InstrumentedQuery(result, self._kind, self._breaker)
+            return result
+        return call
+
+
+class InstrumentedClient:
+    """
+    Proxy for a Supabase client that records every PostgREST ``execute()``.
+
+    Attributes other than the query entry points (``auth``, ``storage``, ...)
+    are passed through untouched. When a circuit ``breaker`` is given, every
+    ``execute()`` goes through it.
+    """
+
+    _QUERY_ENTRY_POINTS = ('table', 'from_', 'rpc', 'schema')
+
+    def __init__(self, client, kind: str = 'supabase', breaker=None):
+        self._client = client
+        self._kind = kind
+        self._breaker = breaker
+
+    @property
+    def unwrapped(self):
+        """The underlying Supabase client."""
+        return self._client
+
+    def __getattr__(self, name):
+        attr = getattr(self._client, name)
+        if name not in self._QUERY_ENTRY_POINTS:
+            return attr
+
+        def call(*args, **kwargs):
+            return _InstrumentedQuery(attr(*args, **kwargs), self._kind, self._breaker)
+        return call
+
+
+def instrument_client(client, breaker=None):
+    """Wrap a Supabase client so its queries are counted, unless already wrapped."""
+    if client is None or isinstance(client, InstrumentedClient):
+        return client
+    return InstrumentedClient(client, breaker=breaker)
+
+
+def _server_timing_header(stats: Dict[str, Any], total: float) -> str:
+    parts = [f"total;dur={total * 1000:.1f}"]
+    for kind in DEPENDENCIES:
+        count = stats['calls'].get(kind, 0)
+        if count:
+            duration = stats['durations'].get(kind, 0.0) * 1000
+            parts.append(f'{kind};dur={duration:.1f};desc="{count} calls"')
+    saved = sum(stats.get('queries_saved', {}).values())
+    if saved:
+        parts.append(f'batched;desc="{saved} queries saved"')
+    return ', '.join(parts)
+
+
+def register_request_metrics(app) -> None:
+    """Register request instrumentation hooks and the ``/metrics`` endpoint."""
+
+    @app.before_request
+    def _start_request_stats():
+        g._request_stats = _new_request_stats()
+
+    @app.after_request
+    def _finish_request_stats(response: Response) -> Response:
+        stats = get_request_stats()
+        if stats is None:
+            return response
+
+        total = time.perf_counter() - stats['start']
+        endpoint = request.url_rule.rule if request.url_rule else 'unmatched'
+        status = str(response.status_code)
+
+        metrics.inc('http_requests_total', method=request.method, endpoint=endpoint, status=status)
+        metrics.inc('http_request_duration_seconds_sum', total, method=request.method, endpoint=endpoint)
+        if not response.is_streamed:
+            metrics.inc('http_response_bytes_total', response.calculate_content_length() or 0,
+                        endpoint=endpoint)
+        for kind in DEPENDENCIES:
+            count = stats['calls'].get(kind, 0)
+            if count:
+                metrics.inc('http_request_dependency_calls_total', count,
+                            endpoint=endpoint, dependency=kind)
+        for loader, saved in stats.get('queries_saved', {}).items():
+            metrics.inc('http_request_queries_saved_total', saved, endpoint=endpoint, loader=loader)
+
+        response.headers['Server-Timing'] = _server_timing_header(stats, total)
+        return response
+
+    @app.route('/metrics')
+    def metrics_endpoint():
+        """Expose process metrics in Prometheus text format."""
+        return Response(metrics.render(), mimetype='text/plain; version=0.0.4')
+
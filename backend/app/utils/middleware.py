@@ -2,6 +2,7 @@ import jwt
 from flask import request, jsonify, current_app
 from functools import wraps
 from os import environ
+from app.utils.jwt_verifier import token_verifier
 
 def authenticate_token():
     """
@@ -16,8 +17,11 @@ def authenticate_token():
     
     try:
         # Use Supabase JWT secret for consistency with Supabase authentication
-        secret = environ.get('SUPABASE_JWT_SECRET', 'default_jwt_secret_for_development')
-        decoded = jwt.decode(token, secret, algorithms=["HS256"])
+        secret = current_app.config.get('SUPABASE_JWT_SECRET') or environ.get(
+            'SUPABASE_JWT_SECRET', 'default_jwt_secret_for_development'
+        )
+        # Shared verifier: repeated tokens are served from its validated-token cache
+        decoded = token_verifier.verify(token, secret, algorithms=["HS256"])
         return decoded
     except jwt.PyJWTError as error:
         print(f'JWT verification error: {error}')
@@ -38,4 +42,4 @@ def token_required(f):
         kwargs['user_id'] = token_data.get('user_id')
         return f(*args, **kwargs)
         
-    return decorated 
\ No newline at end of file
+    return decorated
@@ -0,0 +1,125 @@
+"""
+Process-wide caches for read-mostly reference data.
+
+A ``ReferenceCache`` holds an immutable snapshot of a whole reference table,
+indexed by id and by (case-insensitive) name. Every write to the table bumps
+a version counter in the database; each process compares its snapshot's
+version against it at most once per ``check_interval`` seconds and reloads
+when it changed, so writes made through another worker are picked up without
+any cross-process messaging. Writes made through this process call
+``invalidate()`` and are visible immediately.
+
+The version and the loaded rows are also kept in the shared cache backend,
+so with a shared backend one worker's reload serves every other worker and
+the version is read from the database once per interval, not once per
+process.
+"""
+import logging
+import threading
+import time
+from typing import Any, Awaitable, Callable, Dict, FrozenSet, Hashable, List, Optional
+
+from app.utils.cache_backends import get_cache
+from app.utils.metrics import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class ReferenceSnapshot:
+    """Immutable view of a reference table at one version."""
+
+    def __init__(self, version: int, rows: List[Any], key: Callable[[Any], Hashable],
+                 name: Callable[[Any], str]):
+        self.version = version
+        self.rows = tuple(rows)
+        self.by_id: Dict[Hashable, Any] = {key(row): row for row in rows}
+        self.by_name: Dict[str, Any] = {name(row).lower(): row for row in rows if name(row)}
+        self.ids: FrozenSet[Hashable] = frozenset(self.by_id)
+
+
+class ReferenceCache:
+    """Lazily loaded, version-checked snapshot of a reference table."""
+
+    def __init__(self, name: str, loader: Callable[[], Awaitable[List[Any]]],
+                 version_loader: Callable[[], Awaitable[int]],
+                 key: Callable[[Any], Hashable] = lambda row: row.id,
+                 row_name: Callable[[Any], str] = lambda row: row.name,
+                 check_interval: float = 30.0, rows_ttl: float = 3600.0):
+        self.name = name
+        self.check_interval = check_interval
+        self.rows_ttl = rows_ttl
+        self._loader = loader
+        self._version_loader = version_loader
+        self._key = key
+        self._row_name = row_name
+        self._lock = threading.Lock()
+        self._snapshot: Optional[ReferenceSnapshot] = None
+        self._checked_at = 0.0
+
+    @property
+    def version(self) -> Optional[int]:
+        """Version of the loaded snapshot, or None before the first load."""
+        snapshot = self._snapshot
+        return snapshot.version if snapshot else None
+
+    async def snapshot(self) -> ReferenceSnapshot:
+        """Return the current snapshot, reloading it if missing or outdated."""
+        snapshot = self._snapshot
+        if snapshot is None:
+            return await self.refresh()
+
+        if time.monotonic() - self._checked_at < self.check_interval:
+            metrics.inc('reference_cache_lookups_total', cache=self.name, result='hit')
+            return snapshot
+
+        try:
+            version = await self._current_version()
+        except Exception as e:
+            # Serve the last snapshot rather than failing reads on a version check
+            logger.warning(f"Could not check {self.name} version: {e}")
+            self._checked_at = time.monotonic()
+            return snapshot
+
+        self._checked_at = time.monotonic()
+        if version != snapshot.version:
+            return await self.refresh(version)
+        metrics.inc('reference_cache_lookups_total', cache=self.name, result='hit')
+        return snapshot
+
+    async def _current_version(self) -> int:
+        key = f'reference:{self.name}:version'
+        version = get_cache().get(key)
+        if version is None:
+            version = await self._version_loader()
+            get_cache().set(key, version, ttl=self.check_interval)
+        return version
+
+    async def refresh(self, version: Optional[int] = None) -> ReferenceSnapshot:
+        """Reload the whole table and swap in a new snapshot."""
+        metrics.inc('reference_cache_lookups_total', cache=self.name, result='reload')
+        # Read the version first so a concurrent write is caught by the next check
+        if version is None:
+            version = await self._current_version()
+
+        rows_key = f'reference:{self.name}:rows:{version}'
+        rows = get_cache().get(rows_key)
+        if rows is None:
+            rows = await self._loader()
+            get_cache().set(rows_key, rows, ttl=self.rows_ttl)
+
+        snapshot = ReferenceSnapshot(version, rows, self._key, self._row_name)
+        with self._lock:
+            self._snapshot = snapshot
+            self._checked_at = time.monotonic()
+        logger.info(f"Loaded {len(snapshot.rows)} {self.name} at version {version}")
+        return snapshot
+
+    def invalidate(self) -> None:
+        """Drop the snapshot so the next read reloads it, and make other workers recheck."""
+        get_cache().delete(f'reference:{self.name}:version')
+        with self._lock:
+            self._snapshot = None
+            self._checked_at = 0.0
+
+
+metrics.describe('reference_cache_lookups_total', 'counter', 'Reference cache reads by cache and result.')
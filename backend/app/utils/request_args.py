@@ -0,0 +1,43 @@
+"""
+Query-string parsing helpers shared by the API blueprints.
+"""
+from typing import List, Optional
+
+from flask import request
+
+
+def parse_ids_arg(name: str = 'ids', limit: Optional[int] = None) -> Optional[List[int]]:
+    """
+    Parse a list of integer ids from the query string.
+
+    Accepts comma-separated values (``?ids=3,1,2``), repeated parameters
+    (``?ids=3&ids=1``) or both. Duplicates are dropped and the first
+    occurrence keeps its position, so responses can follow request order.
+
+    Args:
+        name: The query parameter
+        limit: The most distinct ids allowed
+
+    Returns:
+        list: The ids, or None if the parameter is absent
+
+    Raises:
+        ValueError: If an id is not an integer or there are more than ``limit`` ids
+    """
+    values = request.args.getlist(name)
+    if not values:
+        return None
+
+    ids = []
+    for value in values:
+        for part in value.split(','):
+            part = part.strip()
+            if part:
+                try:
+                    ids.append(int(part))
+                except ValueError:
+                    raise ValueError(f'{name} must be a comma-separated list of integers') from None
+    ids = list(dict.fromkeys(ids))
+    if limit is not None and len(ids) > limit:
+        raise ValueError(f'At most {limit} {name} are allowed per request')
+    return ids
@@ -0,0 +1,184 @@
+"""
+Retry policies with jittered exponential backoff.
+
+Only transient failures (network errors, timeouts and 5xx responses) are
+retried. Delays use "full jitter" so workers that failed together do not
+retry in lockstep, and every policy has an overall deadline so a request
+never spends longer than that waiting on retries.
+"""
+import asyncio
+import functools
+import inspect
+import logging
+import random
+import time
+from typing import Callable, Optional
+
+import httpx
+import requests
+from gotrue.errors import AuthRetryableError
+from postgrest.exceptions import APIError as PostgrestAPIError
+from app.utils.error_handlers import APIError
+
+try:
+    from elastic_transport import ConnectionError as ESConnectionError, ConnectionTimeout as ESConnectionTimeout
+    _ES_TRANSIENT_ERRORS = (ESConnectionError, ESConnectionTimeout)
+except ImportError:  # pragma: no cover - elasticsearch is optional at runtime
+    _ES_TRANSIENT_ERRORS = ()
+
+logger = logging.getLogger(__name__)
+
+# PostgREST error codes for connection/pool problems between PostgREST and Postgres
+_TRANSIENT_POSTGREST_CODES = {'PGRST000', 'PGRST001', 'PGRST002', 'PGRST003'}
+# Postgres SQLSTATEs worth retrying: serialization failure and deadlock
+_TRANSIENT_SQLSTATES = {'40001', '40P01'}
+# SQLSTATE classes: connection exception, insufficient resources, operator intervention
+_TRANSIENT_SQLSTATE_CLASSES = ('08', '53', '57')
+
+_TRANSIENT_NETWORK_ERRORS = (
+    httpx.TransportError,
+    requests.ConnectionError,
+    requests.Timeout,
+    AuthRetryableError,
+    ConnectionError,
+    TimeoutError,
+) + _ES_TRANSIENT_ERRORS
+
+
+def _is_server_error(status) -> bool:
+    try:
+        return 500 <= int(status) < 600
+    except (TypeError, ValueError):
+        return False
+
+
+def is_retryable_error(error: BaseException) -> bool:
+    """
+    Decide whether an error is transient and worth retrying.
+
+    Args:
+        error: The exception raised by the failed call
+
+    Returns:
+        bool: True for network errors, timeouts and 5xx responses
+    """
+    if isinstance(error, APIError):
+        # Our own errors (including open circuits) are never retried
+        return False
+
+    if isinstance(error, _TRANSIENT_NETWORK_ERRORS):
+        return True
+
+    if isinstance(error, PostgrestAPIError):
+        code = error.code
+        if isinstance(code, int) and _is_server_error(code):
+            # Non-JSON bodies (e.g. gateway errors) carry the HTTP status as code
+            return True
+        code = str(code or '')
+        return (
+            code in _TRANSIENT_POSTGREST_CODES
+            or code in _TRANSIENT_SQLSTATES
+            or code.startswith(_TRANSIENT_SQLSTATE_CLASSES)
+        )
+
+    if isinstance(error, httpx.HTTPStatusError):
+        return _is_server_error(error.response.status_code)
+
+    # Storage (StorageApiError.status) and Elasticsearch (ApiError.status_code)
+    for attr in ('status_code', 'status'):
+        if _is_server_error(getattr(error, attr, None)):
+            return True
+
+    return False
+
+
+class RetryPolicy:
+    """
+    Exponential backoff with full jitter, bounded by attempts and a deadline.
+
+    Can be used directly (``policy.call(func, ...)`` / ``await policy.acall(...)``)
+    or as a decorator on sync and async functions.
+    """
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.2, max_delay: float = 5.0,
+                 deadline: Optional[float] = 10.0,
+                 retry_on: Callable[[BaseException], bool] = is_retryable_error,
+                 on_retry: Optional[Callable[[int, BaseException, float], None]] = None):
+        self.max_attempts = max(1, max_attempts)
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.deadline = deadline
+        self.retry_on = retry_on
+        self.on_retry = on_retry
+
+    def compute_delay(self, attempt: int) -> float:
+        """Backoff before retry number ``attempt`` (1-based), with full jitter."""
+        ceiling = min(self.max_delay, self.base_delay * (2 ** (attempt - 1)))
+        return random.uniform(0, ceiling)
+
+    def _next_delay(self, attempt: int, error: BaseException, started: float) -> Optional[float]:
+        """Return the delay before the next attempt, or None to give up."""
+        if attempt >= self.max_attempts or not self.retry_on(error):
+            return None
+
+        delay = self.compute_delay(attempt)
+        if self.deadline is not None:
+            remaining = self.deadline - (time.monotonic() - started)
+            if remaining <= delay:
+                return None
+
+        if self.on_retry:
+            self.on_retry(attempt, error, delay)
+        else:
+            logger.warning(f"Transient error (attempt {attempt}/{self.max_attempts}), "
+                           f"retrying in {delay:.2f}s: {error}")
+        return delay
+
+    def call(self, func: Callable, *args, **kwargs):
+        """Call ``func`` synchronously, retrying transient failures."""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                return func(*args, **kwargs)
+            except Exception as e:
+                delay = self._next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+
+    async def acall(self, func: Callable, *args, **kwargs):
+        """Await ``func`` (coroutine function or plain callable), retrying transient failures."""
+        started = time.monotonic()
+        attempt = 0
+        while True:
+            attempt += 1
+            try:
+                result = func(*args, **kwargs)
+                if inspect.isawaitable(result):
+                    result = await result
+                return result
+            except Exception as e:
+                delay = self._next_delay(attempt, e, started)
+                if delay is None:
+                    raise
+                await asyncio.sleep(delay)
+
+    def __call__(self, func: Callable) -> Callable:
+        """Use the policy as a decorator."""
+        if inspect.iscoroutinefunction(func):
+            @functools.wraps(func)
+            async def async_wrapper(*args, **kwargs):
+                return await self.acall(func, *args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            return self.call(func, *args, **kwargs)
+        return wrapper
+
+
+# Shared policies for PostgREST queries and storage calls
+db_retry_policy = RetryPolicy(max_attempts=3, base_delay=0.1, max_delay=1.0, deadline=5.0)
+storage_retry_policy = RetryPolicy(max_attempts=3, base_delay=0.2, max_delay=2.0, deadline=10.0)
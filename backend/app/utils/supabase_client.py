@@ -5,8 +5,7 @@ Provides a global client instance for database access, storage, and other Supaba
 from supabase import create_client, Client
 import os
 from flask import current_app
-import functools
-import time
+from app.utils.retry import RetryPolicy
 
 # Global client cache
 _client_instance = None
@@ -41,28 +40,26 @@ def get_supabase_client():
     return _client_instance
 
 # Helper for retrying operations
-def with_retry(max_retries=3, delay=1):
+def with_retry(max_retries=3, delay=1, max_delay=10, deadline=30):
     """
-    Decorator to retry a function on failure.
+    Decorator to retry a function on transient failure.
+    
+    Uses exponential backoff with full jitter and only retries transient
+    network/5xx errors (see ``app.utils.retry.is_retryable_error``).
+    Works on both sync and async functions.
     
     Args:
-        max_retries (int): Maximum number of retries
-        delay (int): Delay between retries in seconds
+        max_retries (int): Maximum number of attempts
+        delay (float): Base delay between retries in seconds
+        max_delay (float): Upper bound for a single backoff in seconds
+        deadline (float): Overall time budget for all attempts in seconds
     """
-    def decorator(func):
-        @functools.wraps(func)
-        def wrapper(*args, **kwargs):
-            last_exception = None
-            for attempt in range(max_retries):
-                try:
-                    return func(*args, **kwargs)
-                except Exception as e:
-                    last_exception = e
-                    if attempt < max_retries - 1:
-                        time.sleep(delay)
-            raise last_exception
-        return wrapper
-    return decorator
+    return RetryPolicy(
+        max_attempts=max_retries,
+        base_delay=delay,
+        max_delay=max_delay,
+        deadline=deadline
+    )
 
 @with_retry(max_retries=3)
 def test_connection():
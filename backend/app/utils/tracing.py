@@ -0,0 +1,161 @@
+"""
+Query-level tracing for repository PostgREST calls.
+
+Repositories run their queries through ``traced_execute`` which captures the
+table, operation, filters, row count, payload size and duration of every call.
+A sample of traces is logged at debug level; queries slower than the
+configured threshold are always logged and kept in an in-memory ring buffer
+that admins can inspect.
+"""
+import json
+import logging
+import random
+import threading
+import time
+from collections import deque
+from datetime import datetime
+from typing import Any, Dict, List, Optional
+
+from app.utils.metrics import metrics
+from app.utils.retry import db_retry_policy
+
+logger = logging.getLogger(__name__)
+
+# Operations that are not safe to replay after an ambiguous failure
+_NON_IDEMPOTENT_OPERATIONS = {'insert', 'rpc'}
+
+# PostgREST excludes these from the filter set
+_NON_FILTER_PARAMS = {'select', 'order', 'limit', 'offset', 'on_conflict', 'columns'}
+
+
+class QueryTracer:
+    """Samples query traces and keeps a ring buffer of recent slow queries."""
+
+    def __init__(self, sample_rate: float = 0.1, slow_threshold_ms: float = 500,
+                 buffer_size: int = 100):
+        self.sample_rate = sample_rate
+        self.slow_threshold_ms = slow_threshold_ms
+        self._lock = threading.Lock()
+        self._slow_queries = deque(maxlen=buffer_size)
+
+    def configure(self, config) -> None:
+        """Load tracing settings from a Flask config mapping."""
+        self.sample_rate = float(config.get('QUERY_TRACE_SAMPLE_RATE', self.sample_rate))
+        self.slow_threshold_ms = float(config.get('SLOW_QUERY_THRESHOLD_MS', self.slow_threshold_ms))
+        buffer_size = int(config.get('SLOW_QUERY_BUFFER_SIZE', self._slow_queries.maxlen))
+        with self._lock:
+            self._slow_queries = deque(self._slow_queries, maxlen=buffer_size)
+
+    def record(self, trace: Dict[str, Any]) -> None:
+        """Record a finished query trace."""
+        metrics.inc('db_queries_total', table=trace['table'], operation=trace['operation'])
+
+        if trace['duration_ms'] >= self.slow_threshold_ms:
+            metrics.inc('db_slow_queries_total', table=trace['table'], operation=trace['operation'])
+            logger.warning(
+                f"Slow query ({trace['duration_ms']:.1f}ms): {trace['operation']} {trace['table']} "
+                f"filters={trace['filters']} rows={trace['row_count']}"
+            )
+            with self._lock:
+                self._slow_queries.append(trace)
+        elif self.sample_rate > 0 and random.random() < self.sample_rate:
+            logger.debug(f"Query trace: {trace}")
+
+    def slow_queries(self, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Return recent slow queries, newest first."""
+        with self._lock:
+            items = list(self._slow_queries)
+        items.reverse()
+        return items[:limit] if limit else items
+
+    def clear(self) -> None:
+        """Empty the slow query buffer."""
+        with self._lock:
+            self._slow_queries.clear()
+
+
+# Process-wide tracer, configured from the app config in create_app
+query_tracer = QueryTracer()
+
+metrics.describe('db_queries_total', 'counter', 'Repository queries by table and operation.')
+metrics.describe('db_slow_queries_total', 'counter', 'Repository queries above SLOW_QUERY_THRESHOLD_MS.')
+
+
+def _describe_query(query) -> Dict[str, Any]:
+    """Extract table, operation, filters and payload size from a query builder."""
+    path = getattr(query, 'path', '') or ''
+    method = getattr(query, 'http_method', 'GET')
+    params = getattr(query, 'params', None)
+    payload = getattr(query, 'json', None)
+
+    if path.startswith('/rpc/'):
+        table, operation = path[len('/rpc/'):], 'rpc'
+    else:
+        table = path.lstrip('/')
+        headers = getattr(query, 'headers', None) or {}
+        if method == 'POST' and 'merge-duplicates' in headers.get('prefer', ''):
+            operation = 'upsert'
+        else:
+            operation = {
+                'GET': 'select',
+                'HEAD': 'count',
+                'POST': 'insert',
+                'PATCH': 'update',
+                'DELETE': 'delete',
+            }.get(method, method.lower())
+
+    filters = {}
+    if params is not None:
+        for key, value in params.multi_items():
+            if key not in _NON_FILTER_PARAMS:
+                filters[key] = value
+
+    payload_size = len(json.dumps(payload, default=str)) if payload else 0
+
+    return {
+        'table': table,
+        'operation': operation,
+        'filters': filters,
+        'payload_size': payload_size,
+    }
+
+
+def traced_execute(query):
+    """
+    Execute a PostgREST query builder and record a trace for it.
+
+    Idempotent operations are retried on transient errors with
+    ``db_retry_policy``; inserts and RPCs are executed once.
+
+    Args:
+        query: A query builder (anything with ``execute()``)
+
+    Returns:
+        The response returned by ``query.execute()``
+    """
+    trace = _describe_query(query)
+    start = time.perf_counter()
+    error = None
+    response = None
+    try:
+        if trace['operation'] in _NON_IDEMPOTENT_OPERATIONS:
+            response = query.execute()
+        else:
+            response = db_retry_policy.call(query.execute)
+        return response
+    except Exception as e:
+        error = str(e)
+        raise
+    finally:
+        data = getattr(response, 'data', None)
+        if isinstance(data, list):
+            row_count = len(data)
+        else:
+            row_count = 1 if data else 0
+        trace.update({
+            'duration_ms': (time.perf_counter() - start) * 1000,
+            'row_count': row_count,
+            'error': error,
+            'timestamp': datetime.utcnow().isoformat(),
+        })
+        query_tracer.record(trace)
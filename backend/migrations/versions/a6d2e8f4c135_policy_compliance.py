@@ -0,0 +1,46 @@
+"""policy_compliance
+
+Revision ID: a6d2e8f4c135
+Revises: f3b7d1c9a042
+Create Date: 2026-10-19 19:12:05.482113
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'a6d2e8f4c135'
+down_revision = 'f3b7d1c9a042'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Per-policy consent counts, recomputed by the compliance analytics job
+    op.create_table('policy_compliance',
+        sa.Column('policy_id', sa.BigInteger(), nullable=False),
+        sa.Column('company_id', sa.BigInteger(), nullable=False),
+        sa.Column('data_type_id', sa.BigInteger(), nullable=False),
+        sa.Column('users_total', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('users_disallowed', sa.BigInteger(), nullable=False, server_default='0'),
+        sa.Column('computed_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.ForeignKeyConstraint(['policy_id'], ['data_sharing_policies.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('policy_id')
+    )
+    op.create_index('policy_compliance_company_idx', 'policy_compliance', ['company_id'])
+    op.create_index('policy_compliance_disallowed_idx', 'policy_compliance', ['users_disallowed'])
+
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        # Written and read only by the service role
+        op.execute('ALTER TABLE public.policy_compliance ENABLE ROW LEVEL SECURITY;')
+        op.execute('REVOKE ALL ON public.policy_compliance FROM anon, authenticated;')
+
+
+def downgrade():
+    op.drop_index('policy_compliance_disallowed_idx', table_name='policy_compliance')
+    op.drop_index('policy_compliance_company_idx', table_name='policy_compliance')
+    op.drop_table('policy_compliance')
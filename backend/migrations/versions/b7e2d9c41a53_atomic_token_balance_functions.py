@@ -0,0 +1,122 @@
+"""atomic_token_balance_functions
+
+Revision ID: b7e2d9c41a53
+Revises: 0343cc2f5c42
+Create Date: 2026-10-19 09:12:31.418207
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b7e2d9c41a53'
+down_revision = '0343cc2f5c42'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Postgres functions are only available on PostgreSQL, not SQLite
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        # Optional append-only history of balance changes
+        op.execute("""
+            CREATE TABLE IF NOT EXISTS public.token_ledger (
+                id BIGSERIAL PRIMARY KEY,
+                user_id BIGINT NOT NULL REFERENCES public.users(id) ON DELETE CASCADE,
+                delta INTEGER NOT NULL,
+                balance_after INTEGER NOT NULL,
+                reason VARCHAR(100),
+                created_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            );
+        """)
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS token_ledger_user_id_created_at_idx
+            ON public.token_ledger (user_id, created_at DESC);
+        """)
+        # Only the service role (which bypasses RLS) may read or write the ledger
+        op.execute('ALTER TABLE public.token_ledger ENABLE ROW LEVEL SECURITY;')
+        op.execute('REVOKE ALL ON public.token_ledger FROM anon, authenticated;')
+
+        # Increment or decrement a balance in one statement; never goes below zero
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.adjust_user_tokens(
+                p_user_id BIGINT,
+                p_delta INTEGER,
+                p_reason TEXT DEFAULT NULL,
+                p_record_ledger BOOLEAN DEFAULT TRUE
+            ) RETURNS INTEGER
+            LANGUAGE plpgsql
+            AS $$
+            DECLARE
+                v_balance INTEGER;
+            BEGIN
+                UPDATE public.users
+                SET tokens = tokens + p_delta, updated_at = NOW()
+                WHERE id = p_user_id AND tokens + p_delta >= 0
+                RETURNING tokens INTO v_balance;
+
+                IF NOT FOUND THEN
+                    IF EXISTS (SELECT 1 FROM public.users WHERE id = p_user_id) THEN
+                        RAISE EXCEPTION 'Insufficient tokens' USING ERRCODE = 'check_violation';
+                    END IF;
+                    RAISE EXCEPTION 'User not found' USING ERRCODE = 'no_data_found';
+                END IF;
+
+                IF p_record_ledger THEN
+                    INSERT INTO public.token_ledger (user_id, delta, balance_after, reason)
+                    VALUES (p_user_id, p_delta, v_balance, p_reason);
+                END IF;
+
+                RETURN v_balance;
+            END;
+            $$;
+        """)
+
+        # Credit many users at once; grants is a JSON array of {user_id, amount}
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.credit_user_tokens_bulk(
+                p_grants JSONB,
+                p_reason TEXT DEFAULT NULL,
+                p_record_ledger BOOLEAN DEFAULT TRUE
+            ) RETURNS TABLE (user_id BIGINT, tokens INTEGER)
+            LANGUAGE sql
+            AS $$
+                WITH grants AS (
+                    SELECT (g->>'user_id')::BIGINT AS user_id, SUM((g->>'amount')::INTEGER) AS amount
+                    FROM jsonb_array_elements(p_grants) AS g
+                    GROUP BY 1
+                ),
+                updated AS (
+                    UPDATE public.users AS u
+                    SET tokens = u.tokens + grants.amount, updated_at = NOW()
+                    FROM grants
+                    WHERE u.id = grants.user_id
+                    RETURNING u.id, u.tokens, grants.amount
+                ),
+                ledger AS (
+                    INSERT INTO public.token_ledger (user_id, delta, balance_after, reason)
+                    SELECT id, amount, tokens, p_reason FROM updated WHERE p_record_ledger
+                )
+                SELECT id, tokens FROM updated;
+            $$;
+        """)
+
+        # Balances may only be changed by the backend's service role
+        for signature in ('adjust_user_tokens(BIGINT, INTEGER, TEXT, BOOLEAN)',
+                          'credit_user_tokens_bulk(JSONB, TEXT, BOOLEAN)'):
+            op.execute(f'REVOKE EXECUTE ON FUNCTION public.{signature} FROM PUBLIC, anon, authenticated;')
+            op.execute(f'GRANT EXECUTE ON FUNCTION public.{signature} TO service_role;')
+
+
+def downgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('DROP FUNCTION IF EXISTS public.credit_user_tokens_bulk(JSONB, TEXT, BOOLEAN);')
+        op.execute('DROP FUNCTION IF EXISTS public.adjust_user_tokens(BIGINT, INTEGER, TEXT, BOOLEAN);')
+        op.execute('DROP TABLE IF EXISTS public.token_ledger;')
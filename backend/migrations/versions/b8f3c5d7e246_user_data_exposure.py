@@ -0,0 +1,172 @@
+"""user_data_exposure
+
+Revision ID: b8f3c5d7e246
+Revises: a6d2e8f4c135
+Create Date: 2026-10-19 20:04:37.216980
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'b8f3c5d7e246'
+down_revision = 'a6d2e8f4c135'
+branch_labels = None
+depends_on = None
+
+
+_FUNCTION_SIGNATURES = (
+    'consent_allowed(BIGINT, BIGINT, BIGINT, BOOLEAN)',
+    'refresh_user_exposure(BIGINT, BOOLEAN)',
+    'refresh_policy_exposure(BIGINT, BOOLEAN)',
+    'refresh_all_exposure(BOOLEAN)',
+)
+
+
+def upgrade():
+    # Which companies can receive each of a user's data types, directly or as a policy's third party
+    op.create_table('user_data_exposure',
+        sa.Column('user_id', sa.BigInteger(), nullable=False),
+        sa.Column('policy_id', sa.BigInteger(), nullable=False),
+        sa.Column('company_id', sa.BigInteger(), nullable=False),
+        sa.Column('data_type_id', sa.BigInteger(), nullable=False),
+        sa.Column('via_company_id', sa.BigInteger(), nullable=True),
+        sa.Column('purpose', sa.Text(), nullable=True),
+        sa.ForeignKeyConstraint(['user_id'], ['users.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['policy_id'], ['data_sharing_policies.id'], ondelete='CASCADE'),
+        sa.ForeignKeyConstraint(['company_id'], ['companies.id'], ondelete='CASCADE'),
+        sa.PrimaryKeyConstraint('user_id', 'policy_id', 'company_id')
+    )
+    op.create_index('user_data_exposure_policy_idx', 'user_data_exposure', ['policy_id'])
+
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        # Company override, else global preference, else the application's default
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.consent_allowed(
+                p_user_id BIGINT,
+                p_company_id BIGINT,
+                p_data_type_id BIGINT,
+                p_default BOOLEAN
+            ) RETURNS BOOLEAN
+            LANGUAGE sql
+            STABLE
+            AS $$
+                SELECT COALESCE(
+                    (SELECT allowed FROM public.user_preferences
+                     WHERE user_id = p_user_id AND company_id = p_company_id AND data_type_id = p_data_type_id
+                     ORDER BY id DESC LIMIT 1),
+                    (SELECT allowed FROM public.user_preferences
+                     WHERE user_id = p_user_id AND company_id IS NULL AND data_type_id = p_data_type_id
+                     ORDER BY id DESC LIMIT 1),
+                    p_default
+                );
+            $$;
+        """)
+
+        # Recipients of a policy: its company, then each third party (via the company)
+        op.execute("""
+            CREATE OR REPLACE VIEW public.policy_recipients AS
+                SELECT p.id AS policy_id, p.company_id, NULL::BIGINT AS via_company_id, p.data_type_id, p.purpose
+                FROM public.data_sharing_policies AS p
+                UNION ALL
+                SELECT p.id, t.company_id, p.company_id, p.data_type_id, p.purpose
+                FROM public.data_sharing_policies AS p
+                JOIN public.data_sharing_third_parties AS t ON t.policy_id = p.id;
+        """)
+
+        # Rebuild one user's rows after their preferences change
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.refresh_user_exposure(p_user_id BIGINT, p_default BOOLEAN)
+            RETURNS INTEGER
+            LANGUAGE plpgsql
+            AS $$
+            DECLARE
+                v_rows INTEGER;
+            BEGIN
+                DELETE FROM public.user_data_exposure WHERE user_id = p_user_id;
+
+                INSERT INTO public.user_data_exposure (user_id, policy_id, company_id, data_type_id, via_company_id, purpose)
+                SELECT p_user_id, r.policy_id, r.company_id, r.data_type_id, r.via_company_id, r.purpose
+                FROM public.policy_recipients AS r
+                JOIN public.data_sharing_policies AS p ON p.id = r.policy_id
+                WHERE public.consent_allowed(p_user_id, p.company_id, p.data_type_id, p_default)
+                ON CONFLICT DO NOTHING;
+
+                GET DIAGNOSTICS v_rows = ROW_COUNT;
+                RETURN v_rows;
+            END;
+            $$;
+        """)
+
+        # Rebuild one policy's rows (for every user) after it or its third parties change
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.refresh_policy_exposure(p_policy_id BIGINT, p_default BOOLEAN)
+            RETURNS INTEGER
+            LANGUAGE plpgsql
+            AS $$
+            DECLARE
+                v_rows INTEGER;
+            BEGIN
+                DELETE FROM public.user_data_exposure WHERE policy_id = p_policy_id;
+
+                INSERT INTO public.user_data_exposure (user_id, policy_id, company_id, data_type_id, via_company_id, purpose)
+                SELECT u.id, r.policy_id, r.company_id, r.data_type_id, r.via_company_id, r.purpose
+                FROM public.data_sharing_policies AS p
+                JOIN public.policy_recipients AS r ON r.policy_id = p.id
+                CROSS JOIN public.users AS u
+                WHERE p.id = p_policy_id
+                  AND public.consent_allowed(u.id, p.company_id, p.data_type_id, p_default)
+                ON CONFLICT DO NOTHING;
+
+                GET DIAGNOSTICS v_rows = ROW_COUNT;
+                RETURN v_rows;
+            END;
+            $$;
+        """)
+
+        # Full rebuild, for writes made outside the application
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.refresh_all_exposure(p_default BOOLEAN)
+            RETURNS INTEGER
+            LANGUAGE plpgsql
+            AS $$
+            DECLARE
+                v_rows INTEGER;
+            BEGIN
+                DELETE FROM public.user_data_exposure;
+
+                INSERT INTO public.user_data_exposure (user_id, policy_id, company_id, data_type_id, via_company_id, purpose)
+                SELECT u.id, r.policy_id, r.company_id, r.data_type_id, r.via_company_id, r.purpose
+                FROM public.data_sharing_policies AS p
+                JOIN public.policy_recipients AS r ON r.policy_id = p.id
+                CROSS JOIN public.users AS u
+                WHERE public.consent_allowed(u.id, p.company_id, p.data_type_id, p_default)
+                ON CONFLICT DO NOTHING;
+
+                GET DIAGNOSTICS v_rows = ROW_COUNT;
+                RETURN v_rows;
+            END;
+            $$;
+        """)
+
+        for signature in _FUNCTION_SIGNATURES:
+            op.execute(f'REVOKE EXECUTE ON FUNCTION public.{signature} FROM PUBLIC, anon, authenticated;')
+            op.execute(f'GRANT EXECUTE ON FUNCTION public.{signature} TO service_role;')
+        op.execute('REVOKE ALL ON public.user_data_exposure FROM anon, authenticated;')
+
+
+def downgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        for signature in reversed(_FUNCTION_SIGNATURES):
+            op.execute(f'DROP FUNCTION IF EXISTS public.{signature};')
+        op.execute('DROP VIEW IF EXISTS public.policy_recipients;')
+
+    op.drop_index('user_data_exposure_policy_idx', table_name='user_data_exposure')
+    op.drop_table('user_data_exposure')
@@ -0,0 +1,56 @@
+"""company_graph_versions
+
+Revision ID: c2a7e9f1d358
+Revises: b8f3c5d7e246
+Create Date: 2026-10-19 20:51:18.603442
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c2a7e9f1d358'
+down_revision = 'b8f3c5d7e246'
+branch_labels = None
+depends_on = None
+
+
+# Tables whose rows are edges (or change edges) of the cached company graph
+_GRAPH_TABLES = ('company_relationships', 'data_sharing_third_parties', 'data_sharing_policies')
+
+
+def upgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        # Reuse the reference-data version counters so every worker notices graph writes
+        for table in _GRAPH_TABLES:
+            op.execute(f"""
+                CREATE TRIGGER {table}_bump_version
+                AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.{table}
+                FOR EACH STATEMENT EXECUTE FUNCTION public.bump_reference_data_version();
+            """)
+            op.execute(f"INSERT INTO public.reference_data_versions (name) VALUES ('{table}') ON CONFLICT DO NOTHING;")
+
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS company_relationships_source_idx
+            ON public.company_relationships (source_company_id);
+        """)
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS data_sharing_third_parties_policy_idx
+            ON public.data_sharing_third_parties (policy_id);
+        """)
+
+
+def downgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('DROP INDEX IF EXISTS public.data_sharing_third_parties_policy_idx;')
+        op.execute('DROP INDEX IF EXISTS public.company_relationships_source_idx;')
+        for table in _GRAPH_TABLES:
+            op.execute(f'DROP TRIGGER IF EXISTS {table}_bump_version ON public.{table};')
+            op.execute(f"DELETE FROM public.reference_data_versions WHERE name = '{table}';")
@@ -0,0 +1,353 @@
+"""token_ledger_materialized_balances
+
+Revision ID: c41f6a8e2d90
+Revises: b7e2d9c41a53
+Create Date: 2026-10-19 11:40:07.552913
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41f6a8e2d90'
+down_revision = 'b7e2d9c41a53'
+branch_labels = None
+depends_on = None
+
+
+_FUNCTION_SIGNATURES = (
+    'current_token_balance(BIGINT)',
+    'get_token_balances(BIGINT[])',
+    'adjust_user_tokens(BIGINT, INTEGER, TEXT, BIGINT)',
+    'set_user_tokens(BIGINT, INTEGER, TEXT)',
+    'credit_user_tokens_bulk(JSONB, TEXT)',
+    'compact_token_ledger()',
+)
+
+
+def upgrade():
+    # Postgres functions are only available on PostgreSQL, not SQLite
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        # Ledger rows are folded into token_balances by compaction; purchases keep their package
+        op.execute("""
+            ALTER TABLE public.token_ledger
+                ADD COLUMN IF NOT EXISTS package_id BIGINT REFERENCES public.token_packages(id) ON DELETE SET NULL,
+                ADD COLUMN IF NOT EXISTS compacted_at TIMESTAMP WITH TIME ZONE;
+        """)
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS token_ledger_pending_idx
+            ON public.token_ledger (user_id) INCLUDE (delta)
+            WHERE compacted_at IS NULL;
+        """)
+
+        # Materialized balance per user as of the last compaction
+        op.execute("""
+            CREATE TABLE IF NOT EXISTS public.token_balances (
+                user_id BIGINT PRIMARY KEY REFERENCES public.users(id) ON DELETE CASCADE,
+                balance INTEGER NOT NULL DEFAULT 0,
+                compacted_at TIMESTAMP WITH TIME ZONE DEFAULT NOW()
+            );
+        """)
+        # Only the service role (which bypasses RLS) may read or change balances
+        op.execute('ALTER TABLE public.token_balances ENABLE ROW LEVEL SECURITY;')
+        op.execute('REVOKE ALL ON public.token_balances FROM anon, authenticated;')
+
+        # Existing balances already include every ledger entry written so far
+        op.execute('UPDATE public.token_ledger SET compacted_at = NOW() WHERE compacted_at IS NULL;')
+        op.execute("""
+            INSERT INTO public.token_balances (user_id, balance)
+            SELECT id, COALESCE(tokens, 0) FROM public.users
+            ON CONFLICT (user_id) DO NOTHING;
+        """)
+
+        # New users start with the tokens they were created with; runs as the owner
+        # because the inserting role has no access to token_balances
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.init_token_balance()
+            RETURNS TRIGGER
+            LANGUAGE plpgsql
+            SECURITY DEFINER
+            SET search_path = public
+            AS $$
+            BEGIN
+                INSERT INTO public.token_balances (user_id, balance)
+                VALUES (NEW.id, COALESCE(NEW.tokens, 0))
+                ON CONFLICT (user_id) DO NOTHING;
+                RETURN NEW;
+            END;
+            $$;
+        """)
+        op.execute("""
+            CREATE TRIGGER users_init_token_balance
+            AFTER INSERT ON public.users
+            FOR EACH ROW EXECUTE FUNCTION public.init_token_balance();
+        """)
+
+        # Balance = materialized balance + entries appended since the last compaction
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.current_token_balance(p_user_id BIGINT)
+            RETURNS INTEGER
+            LANGUAGE sql
+            STABLE
+            AS $$
+                SELECT (b.balance + COALESCE((
+                    SELECT SUM(l.delta) FROM public.token_ledger AS l
+                    WHERE l.user_id = b.user_id AND l.compacted_at IS NULL
+                ), 0))::INTEGER
+                FROM public.token_balances AS b
+                WHERE b.user_id = p_user_id;
+            $$;
+        """)
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.get_token_balances(p_user_ids BIGINT[])
+            RETURNS TABLE (user_id BIGINT, tokens INTEGER)
+            LANGUAGE sql
+            STABLE
+            AS $$
+                SELECT b.user_id, (b.balance + COALESCE(SUM(l.delta), 0))::INTEGER
+                FROM public.token_balances AS b
+                LEFT JOIN public.token_ledger AS l
+                    ON l.user_id = b.user_id AND l.compacted_at IS NULL
+                WHERE b.user_id = ANY(p_user_ids)
+                GROUP BY b.user_id, b.balance;
+            $$;
+        """)
+
+        # Writes only append to the ledger; every write serializes per user on an advisory
+        # lock so balance_after and the returned balance include all earlier entries
+        op.execute('DROP FUNCTION IF EXISTS public.adjust_user_tokens(BIGINT, INTEGER, TEXT, BOOLEAN);')
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.adjust_user_tokens(
+                p_user_id BIGINT,
+                p_delta INTEGER,
+                p_reason TEXT DEFAULT NULL,
+                p_package_id BIGINT DEFAULT NULL
+            ) RETURNS INTEGER
+            LANGUAGE plpgsql
+            AS $$
+            DECLARE
+                v_balance INTEGER;
+            BEGIN
+                PERFORM pg_advisory_xact_lock(p_user_id);
+
+                v_balance := public.current_token_balance(p_user_id);
+                IF v_balance IS NULL THEN
+                    RAISE EXCEPTION 'User not found' USING ERRCODE = 'no_data_found';
+                END IF;
+                IF v_balance + p_delta < 0 THEN
+                    RAISE EXCEPTION 'Insufficient tokens' USING ERRCODE = 'check_violation';
+                END IF;
+
+                INSERT INTO public.token_ledger (user_id, delta, balance_after, reason, package_id)
+                VALUES (p_user_id, p_delta, v_balance + p_delta, p_reason, p_package_id);
+
+                RETURN v_balance + p_delta;
+            END;
+            $$;
+        """)
+
+        # Setting an absolute balance computes the delta under the same lock
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.set_user_tokens(
+                p_user_id BIGINT,
+                p_tokens INTEGER,
+                p_reason TEXT DEFAULT NULL
+            ) RETURNS INTEGER
+            LANGUAGE plpgsql
+            AS $$
+            DECLARE
+                v_balance INTEGER;
+            BEGIN
+                IF p_tokens < 0 THEN
+                    RAISE EXCEPTION 'Token balance cannot be negative' USING ERRCODE = 'check_violation';
+                END IF;
+
+                PERFORM pg_advisory_xact_lock(p_user_id);
+
+                v_balance := public.current_token_balance(p_user_id);
+                IF v_balance IS NULL THEN
+                    RAISE EXCEPTION 'User not found' USING ERRCODE = 'no_data_found';
+                END IF;
+
+                IF p_tokens <> v_balance THEN
+                    INSERT INTO public.token_ledger (user_id, delta, balance_after, reason)
+                    VALUES (p_user_id, p_tokens - v_balance, p_tokens, p_reason);
+                END IF;
+
+                RETURN p_tokens;
+            END;
+            $$;
+        """)
+
+        # Locks are taken in user id order before the balances are read, so concurrent
+        # bulk credits cannot deadlock and see every entry committed ahead of them
+        op.execute('DROP FUNCTION IF EXISTS public.credit_user_tokens_bulk(JSONB, TEXT, BOOLEAN);')
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.credit_user_tokens_bulk(
+                p_grants JSONB,
+                p_reason TEXT DEFAULT NULL
+            ) RETURNS TABLE (user_id BIGINT, tokens INTEGER)
+            LANGUAGE plpgsql
+            AS $$
+            #variable_conflict use_column
+            BEGIN
+                PERFORM pg_advisory_xact_lock(ids.user_id)
+                FROM (
+                    SELECT DISTINCT (g->>'user_id')::BIGINT AS user_id
+                    FROM jsonb_array_elements(p_grants) AS g
+                    ORDER BY 1
+                ) AS ids;
+
+                RETURN QUERY
+                WITH grants AS (
+                    SELECT (g->>'user_id')::BIGINT AS user_id, SUM((g->>'amount')::INTEGER) AS amount
+                    FROM jsonb_array_elements(p_grants) AS g
+                    GROUP BY 1
+                ),
+                balances AS (
+                    SELECT b.user_id, grants.amount, b.tokens + grants.amount AS balance_after
+                    FROM grants
+                    JOIN public.get_token_balances(ARRAY(SELECT user_id FROM grants)) AS b
+                        ON b.user_id = grants.user_id
+                ),
+                appended AS (
+                    INSERT INTO public.token_ledger (user_id, delta, balance_after, reason)
+                    SELECT balances.user_id, balances.amount, balances.balance_after, p_reason FROM balances
+                )
+                SELECT balances.user_id, balances.balance_after::INTEGER FROM balances;
+            END;
+            $$;
+        """)
+
+        # Fold pending entries into token_balances and refresh the users.tokens snapshot
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.compact_token_ledger()
+            RETURNS INTEGER
+            LANGUAGE plpgsql
+            AS $$
+            DECLARE
+                v_users INTEGER;
+            BEGIN
+                -- Entries of still-open transactions are invisible here and stay pending
+                WITH folded AS (
+                    UPDATE public.token_ledger
+                    SET compacted_at = NOW()
+                    WHERE compacted_at IS NULL
+                    RETURNING user_id, delta
+                ),
+                totals AS (
+                    SELECT user_id, SUM(delta)::INTEGER AS delta FROM folded GROUP BY user_id
+                ),
+                balances AS (
+                    UPDATE public.token_balances AS b
+                    SET balance = b.balance + totals.delta, compacted_at = NOW()
+                    FROM totals
+                    WHERE b.user_id = totals.user_id
+                    RETURNING b.user_id, b.balance
+                )
+                UPDATE public.users AS u
+                SET tokens = balances.balance
+                FROM balances
+                WHERE u.id = balances.user_id;
+
+                GET DIAGNOSTICS v_users = ROW_COUNT;
+                RETURN v_users;
+            END;
+            $$;
+        """)
+
+        # Balances may only be read and changed by the backend's service role
+        for signature in _FUNCTION_SIGNATURES:
+            op.execute(f'REVOKE EXECUTE ON FUNCTION public.{signature} FROM PUBLIC, anon, authenticated;')
+            op.execute(f'GRANT EXECUTE ON FUNCTION public.{signature} TO service_role;')
+
+
+def downgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        # Make users.tokens authoritative again before dropping the ledger functions
+        op.execute('SELECT public.compact_token_ledger();')
+
+        for signature in _FUNCTION_SIGNATURES:
+            op.execute(f'DROP FUNCTION IF EXISTS public.{signature};')
+        op.execute('DROP TRIGGER IF EXISTS users_init_token_balance ON public.users;')
+        op.execute('DROP FUNCTION IF EXISTS public.init_token_balance();')
+        op.execute('DROP TABLE IF EXISTS public.token_balances;')
+        op.execute('DROP INDEX IF EXISTS public.token_ledger_pending_idx;')
+        op.execute("""
+            ALTER TABLE public.token_ledger
+                DROP COLUMN IF EXISTS compacted_at,
+                DROP COLUMN IF EXISTS package_id;
+        """)
+
+        # Restore the in-place balance functions from b7e2d9c41a53
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.adjust_user_tokens(
+                p_user_id BIGINT,
+                p_delta INTEGER,
+                p_reason TEXT DEFAULT NULL,
+                p_record_ledger BOOLEAN DEFAULT TRUE
+            ) RETURNS INTEGER
+            LANGUAGE plpgsql
+            AS $$
+            DECLARE
+                v_balance INTEGER;
+            BEGIN
+                UPDATE public.users
+                SET tokens = tokens + p_delta, updated_at = NOW()
+                WHERE id = p_user_id AND tokens + p_delta >= 0
+                RETURNING tokens INTO v_balance;
+
+                IF NOT FOUND THEN
+                    IF EXISTS (SELECT 1 FROM public.users WHERE id = p_user_id) THEN
+                        RAISE EXCEPTION 'Insufficient tokens' USING ERRCODE = 'check_violation';
+                    END IF;
+                    RAISE EXCEPTION 'User not found' USING ERRCODE = 'no_data_found';
+                END IF;
+
+                IF p_record_ledger THEN
+                    INSERT INTO public.token_ledger (user_id, delta, balance_after, reason)
+                    VALUES (p_user_id, p_delta, v_balance, p_reason);
+                END IF;
+
+                RETURN v_balance;
+            END;
+            $$;
+        """)
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.credit_user_tokens_bulk(
+                p_grants JSONB,
+                p_reason TEXT DEFAULT NULL,
+                p_record_ledger BOOLEAN DEFAULT TRUE
+            ) RETURNS TABLE (user_id BIGINT, tokens INTEGER)
+            LANGUAGE sql
+            AS $$
+                WITH grants AS (
+                    SELECT (g->>'user_id')::BIGINT AS user_id, SUM((g->>'amount')::INTEGER) AS amount
+                    FROM jsonb_array_elements(p_grants) AS g
+                    GROUP BY 1
+                ),
+                updated AS (
+                    UPDATE public.users AS u
+                    SET tokens = u.tokens + grants.amount, updated_at = NOW()
+                    FROM grants
+                    WHERE u.id = grants.user_id
+                    RETURNING u.id, u.tokens, grants.amount
+                ),
+                ledger AS (
+                    INSERT INTO public.token_ledger (user_id, delta, balance_after, reason)
+                    SELECT id, amount, tokens, p_reason FROM updated WHERE p_record_ledger
+                )
+                SELECT id, tokens FROM updated;
+            $$;
+        """)
+        for signature in ('adjust_user_tokens(BIGINT, INTEGER, TEXT, BOOLEAN)',
+                          'credit_user_tokens_bulk(JSONB, TEXT, BOOLEAN)'):
+            op.execute(f'REVOKE EXECUTE ON FUNCTION public.{signature} FROM PUBLIC, anon, authenticated;')
+            op.execute(f'GRANT EXECUTE ON FUNCTION public.{signature} TO service_role;')
@@ -0,0 +1,66 @@
+"""reference_data_versions
+
+Revision ID: d5a93b7c1e24
+Revises: c41f6a8e2d90
+Create Date: 2026-10-19 14:03:52.190466
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd5a93b7c1e24'
+down_revision = 'c41f6a8e2d90'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Version counters let every worker detect changes to cached reference tables
+    op.create_table('reference_data_versions',
+        sa.Column('name', sa.String(length=100), nullable=False),
+        sa.Column('version', sa.BigInteger(), nullable=False, server_default='1'),
+        sa.Column('updated_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('name')
+    )
+
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        # Any write to a reference table bumps its counter, whoever makes it
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.bump_reference_data_version()
+            RETURNS TRIGGER
+            LANGUAGE plpgsql
+            SECURITY DEFINER
+            SET search_path = public
+            AS $$
+            BEGIN
+                INSERT INTO public.reference_data_versions (name, version, updated_at)
+                VALUES (TG_TABLE_NAME, 1, NOW())
+                ON CONFLICT (name) DO UPDATE
+                SET version = reference_data_versions.version + 1, updated_at = NOW();
+                RETURN NULL;
+            END;
+            $$;
+        """)
+        op.execute("""
+            CREATE TRIGGER data_types_bump_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.data_types
+            FOR EACH STATEMENT EXECUTE FUNCTION public.bump_reference_data_version();
+        """)
+        op.execute("INSERT INTO public.reference_data_versions (name) VALUES ('data_types') ON CONFLICT DO NOTHING;")
+        op.execute('GRANT SELECT ON public.reference_data_versions TO anon, authenticated;')
+
+
+def downgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS data_types_bump_version ON public.data_types;')
+        op.execute('DROP FUNCTION IF EXISTS public.bump_reference_data_version();')
+
+    op.drop_table('reference_data_versions')
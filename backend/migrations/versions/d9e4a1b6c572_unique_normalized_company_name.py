@@ -0,0 +1,60 @@
+"""unique_normalized_company_name
+
+Revision ID: d9e4a1b6c572
+Revises: c2a7e9f1d358
+Create Date: 2026-10-19 22:14:37.518206
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'd9e4a1b6c572'
+down_revision = 'c2a7e9f1d358'
+branch_labels = None
+depends_on = None
+
+
+# Unicode whitespace as Python's str.split() sees it (\s only matches ASCII here);
+# must stay identical to WHITESPACE_CLASS in app/repositories/company.py
+WHITESPACE_CLASS = r'[\t\n\v\f\r \u001c-\u001f\u0085\u00a0\u1680\u2000-\u200a\u2028\u2029\u202f\u205f\u3000]'
+
+# Case-insensitive, with whitespace runs collapsed to one space and then trimmed
+NORMALIZED_NAME = f"lower(btrim(regexp_replace(name, '{WHITESPACE_CLASS}+', ' ', 'g'), ' '))"
+
+
+def upgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        duplicates = conn.execute(sa.text(f"""
+            SELECT {NORMALIZED_NAME} AS normalized, array_agg(id ORDER BY id) AS ids
+            FROM public.companies
+            GROUP BY 1
+            HAVING count(*) > 1
+            ORDER BY 1;
+        """)).fetchall()
+        if duplicates:
+            listing = '; '.join(f"{row.normalized!r}: {list(row.ids)}" for row in duplicates)
+            raise RuntimeError(f"Merge or rename duplicate companies before adding the unique name constraint: {listing}")
+
+        # A stored column (rather than an expression index) so inserts can name it as their conflict target
+        op.execute(f"""
+            ALTER TABLE public.companies
+            ADD COLUMN name_normalized TEXT GENERATED ALWAYS AS ({NORMALIZED_NAME}) STORED;
+        """)
+        op.execute("""
+            ALTER TABLE public.companies
+            ADD CONSTRAINT companies_name_normalized_key UNIQUE (name_normalized);
+        """)
+
+
+def downgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('ALTER TABLE public.companies DROP CONSTRAINT IF EXISTS companies_name_normalized_key;')
+        op.execute('ALTER TABLE public.companies DROP COLUMN IF EXISTS name_normalized;')
@@ -0,0 +1,28 @@
+"""storage_object_variants
+
+Revision ID: e5b1c8d3f607
+Revises: d9e4a1b6c572
+Create Date: 2026-10-19 23:41:08.264915
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b1c8d3f607'
+down_revision = 'd9e4a1b6c572'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Names of the derivatives generated for the object (see LOGO_VARIANTS), so
+    # only existing ones are signed and missing ones can be generated
+    op.add_column('storage_objects',
+        sa.Column('variants', sa.JSON(), nullable=False, server_default=sa.text("'[]'"))
+    )
+
+
+def downgrade():
+    op.drop_column('storage_objects', 'variants')
@@ -0,0 +1,135 @@
+"""content_addressed_storage_objects
+
+Revision ID: e8c2f4a6b913
+Revises: d5a93b7c1e24
+Create Date: 2026-10-19 16:21:44.073518
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'e8c2f4a6b913'
+down_revision = 'd5a93b7c1e24'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # One row per stored blob, keyed by its SHA-256
+    op.create_table('storage_objects',
+        sa.Column('sha256', sa.String(length=64), nullable=False),
+        sa.Column('path', sa.String(length=255), nullable=False),
+        sa.Column('size', sa.BigInteger(), nullable=False),
+        sa.Column('content_type', sa.String(length=255), nullable=True),
+        sa.Column('ref_count', sa.Integer(), nullable=False, server_default='1'),
+        # Set once the object is in the bucket; references taken before then upload it too
+        sa.Column('uploaded', sa.Boolean(), nullable=False, server_default=sa.false()),
+        # Set when the last reference is dropped; the row stays until the object is removed
+        sa.Column('released_at', sa.DateTime(timezone=True), nullable=True),
+        sa.Column('created_at', sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.PrimaryKeyConstraint('sha256'),
+        sa.UniqueConstraint('path')
+    )
+
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('ALTER TABLE public.storage_objects ENABLE ROW LEVEL SECURITY;')
+        op.execute('REVOKE ALL ON public.storage_objects FROM anon, authenticated;')
+
+        # Returns 'upload' when the object is not in the bucket yet and the caller
+        # must upload it (uploads of the same content are idempotent), 'exists' when
+        # it is, and 'removing' while its last reference is being removed; a removal
+        # abandoned for ten minutes is taken over and the object uploaded again
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.acquire_storage_object(
+                p_sha256 TEXT,
+                p_path TEXT,
+                p_size BIGINT,
+                p_content_type TEXT DEFAULT NULL
+            ) RETURNS TEXT
+            LANGUAGE plpgsql
+            AS $$
+            DECLARE
+                v_uploaded BOOLEAN;
+            BEGIN
+                INSERT INTO public.storage_objects (sha256, path, size, content_type, ref_count)
+                VALUES (p_sha256, p_path, p_size, p_content_type, 1)
+                ON CONFLICT (sha256) DO UPDATE
+                SET ref_count = storage_objects.ref_count + 1,
+                    uploaded = storage_objects.uploaded AND storage_objects.ref_count > 0,
+                    released_at = NULL
+                WHERE storage_objects.ref_count > 0
+                   OR storage_objects.released_at < now() - INTERVAL '10 minutes'
+                RETURNING uploaded INTO v_uploaded;
+
+                IF NOT FOUND THEN
+                    RETURN 'removing';
+                END IF;
+                RETURN CASE WHEN v_uploaded THEN 'exists' ELSE 'upload' END;
+            END;
+            $$;
+        """)
+
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.mark_storage_object_uploaded(p_path TEXT)
+            RETURNS BOOLEAN
+            LANGUAGE sql
+            AS $$
+                UPDATE public.storage_objects
+                SET uploaded = TRUE
+                WHERE path = p_path AND ref_count > 0
+                RETURNING TRUE;
+            $$;
+        """)
+
+        # Returns the references left. The last one leaves the row at 0, blocking new
+        # references until purge_storage_object runs after the object is removed;
+        # unregistered paths report 0 so their object can be removed
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.release_storage_object(p_path TEXT)
+            RETURNS INTEGER
+            LANGUAGE sql
+            AS $$
+                WITH released AS (
+                    UPDATE public.storage_objects
+                    SET ref_count = ref_count - 1,
+                        released_at = CASE WHEN ref_count <= 1 THEN now() END
+                    WHERE path = p_path AND ref_count > 0
+                    RETURNING ref_count
+                )
+                SELECT COALESCE((SELECT ref_count FROM released), 0);
+            $$;
+        """)
+
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.purge_storage_object(p_path TEXT)
+            RETURNS VOID
+            LANGUAGE sql
+            AS $$
+                DELETE FROM public.storage_objects WHERE path = p_path AND ref_count <= 0;
+            $$;
+        """)
+
+        for signature in ('acquire_storage_object(TEXT, TEXT, BIGINT, TEXT)',
+                          'mark_storage_object_uploaded(TEXT)',
+                          'release_storage_object(TEXT)',
+                          'purge_storage_object(TEXT)'):
+            op.execute(f'REVOKE EXECUTE ON FUNCTION public.{signature} FROM PUBLIC, anon, authenticated;')
+            op.execute(f'GRANT EXECUTE ON FUNCTION public.{signature} TO service_role;')
+
+
+def downgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('DROP FUNCTION IF EXISTS public.purge_storage_object(TEXT);')
+        op.execute('DROP FUNCTION IF EXISTS public.release_storage_object(TEXT);')
+        op.execute('DROP FUNCTION IF EXISTS public.mark_storage_object_uploaded(TEXT);')
+        op.execute('DROP FUNCTION IF EXISTS public.acquire_storage_object(TEXT, TEXT, BIGINT, TEXT);')
+
+    op.drop_table('storage_objects')
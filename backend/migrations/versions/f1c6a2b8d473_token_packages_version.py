@@ -0,0 +1,39 @@
+"""token_packages_version
+
+Revision ID: f1c6a2b8d473
+Revises: e5b1c8d3f607
+Create Date: 2026-10-20 10:17:42.381956
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f1c6a2b8d473'
+down_revision = 'e5b1c8d3f607'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        # Every worker reloads the cached package catalog (and its ETag) when this changes
+        op.execute("""
+            CREATE TRIGGER token_packages_bump_version
+            AFTER INSERT OR UPDATE OR DELETE OR TRUNCATE ON public.token_packages
+            FOR EACH STATEMENT EXECUTE FUNCTION public.bump_reference_data_version();
+        """)
+        op.execute("INSERT INTO public.reference_data_versions (name) VALUES ('token_packages') ON CONFLICT DO NOTHING;")
+
+
+def downgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('DROP TRIGGER IF EXISTS token_packages_bump_version ON public.token_packages;')
+        op.execute("DELETE FROM public.reference_data_versions WHERE name = 'token_packages';")
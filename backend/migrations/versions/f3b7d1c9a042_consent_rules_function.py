@@ -0,0 +1,63 @@
+"""consent_rules_function
+
+Revision ID: f3b7d1c9a042
+Revises: e8c2f4a6b913
+Create Date: 2026-10-19 18:02:31.914270
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'f3b7d1c9a042'
+down_revision = 'e8c2f4a6b913'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        # Consent lookups read a user's rows for a few companies plus the global (null) ones
+        op.execute("""
+            CREATE INDEX IF NOT EXISTS user_preferences_consent_idx
+            ON public.user_preferences (user_id, company_id) INCLUDE (data_type_id, allowed);
+        """)
+
+        # One JSON object {user_id: [[company_id, data_type_id, allowed], ...]} for a whole
+        # batch of users: a single round trip, and not subject to PostgREST's row limit
+        op.execute("""
+            CREATE OR REPLACE FUNCTION public.get_consent_rules(
+                p_user_ids BIGINT[],
+                p_company_ids BIGINT[] DEFAULT NULL
+            ) RETURNS JSONB
+            LANGUAGE sql
+            STABLE
+            AS $$
+                SELECT COALESCE(jsonb_object_agg(grouped.user_id, grouped.rules), '{}'::jsonb)
+                FROM (
+                    SELECT p.user_id,
+                           jsonb_agg(jsonb_build_array(p.company_id, p.data_type_id, p.allowed) ORDER BY p.id) AS rules
+                    FROM public.user_preferences AS p
+                    WHERE p.user_id = ANY(p_user_ids)
+                      AND (p_company_ids IS NULL OR p.company_id IS NULL OR p.company_id = ANY(p_company_ids))
+                    GROUP BY p.user_id
+                ) AS grouped;
+            $$;
+        """)
+
+        # Reads other users' preferences, so only the backend's service role may call it
+        op.execute('REVOKE EXECUTE ON FUNCTION public.get_consent_rules(BIGINT[], BIGINT[]) FROM PUBLIC, anon, authenticated;')
+        op.execute('GRANT EXECUTE ON FUNCTION public.get_consent_rules(BIGINT[], BIGINT[]) TO service_role;')
+
+
+def downgrade():
+    conn = op.get_bind()
+    dialect = conn.dialect.name
+
+    if dialect == 'postgresql':
+        op.execute('DROP FUNCTION IF EXISTS public.get_consent_rules(BIGINT[], BIGINT[]);')
+        op.execute('DROP INDEX IF EXISTS public.user_preferences_consent_idx;')
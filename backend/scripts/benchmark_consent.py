@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+"""
+Microbenchmarks for consent resolution.
+Compares compiled ConsentRules lookups with resolving each question by
+scanning the user's preference rows, times compilation itself, and times
+a bulk check of 10k questions for 10k distinct users (compile + resolve,
+as POST /api/v1/consent/check does after its query).
+Runs on synthetic data; no database is needed.
+
+Usage: python scripts/benchmark_consent.py [--rows N] [--checks N]
+"""
+import argparse
+import os
+import random
+import sys
+import timeit
+
+# Add the parent directory to sys.path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.services.consent import ConsentRules
+
+def synthetic_rows(count, data_types=40, companies=200, seed=7):
+    """Preference rows for one user: one global entry per data type, the rest company overrides."""
+    rng = random.Random(seed)
+    rows = [
+        {'user_id': 1, 'company_id': None, 'data_type_id': data_type_id, 'allowed': rng.random() < 0.5}
+        for data_type_id in range(1, data_types + 1)
+    ]
+    # At most one preference per (company, data type), as in the database
+    pairs = set()
+    while len(rows) < min(count, data_types * (companies + 1)):
+        pair = (rng.randint(1, companies), rng.randint(1, data_types))
+        if pair in pairs:
+            continue
+        pairs.add(pair)
+        rows.append({'user_id': 1, 'company_id': pair[0], 'data_type_id': pair[1], 'allowed': rng.random() < 0.5})
+    return rows
+
+def scan(rows, company_id, data_type_id, default=False):
+    """Resolve one question the way consumers did before: scan every row."""
+    global_rule = None
+    for row in rows:
+        if row['data_type_id'] != data_type_id:
+            continue
+        if row['company_id'] == company_id:
+            return row['allowed']
+        if row['company_id'] is None:
+            global_rule = row['allowed']
+    return default if global_rule is None else global_rule
+
+def run(rows_count, checks):
+    rows = synthetic_rows(rows_count)
+    rng = random.Random(11)
+    questions = [(rng.randint(1, 250), rng.randint(1, 45)) for _ in range(checks)]
+    rules = ConsentRules.compile(1, rows)
+
+    # Both approaches must agree before their speed matters
+    mismatches = sum(rules.is_allowed(c, d) != scan(rows, c, d) for c, d in questions[:1000])
+    if mismatches:
+        print(f"❌ {mismatches} answers differ between compiled rules and row scans")
+        return False
+
+    compile_time = min(timeit.repeat(lambda: ConsentRules.compile(1, rows), number=10, repeat=5)) / 10
+    lookup_time = min(timeit.repeat(
+        lambda: [rules.is_allowed(c, d) for c, d in questions], number=1, repeat=5
+    )) / checks
+    scan_time = min(timeit.repeat(
+        lambda: [scan(rows, c, d) for c, d in questions[:1000]], number=1, repeat=3
+    )) / min(checks, 1000)
+
+    print(f"Rows per user:        {rows_count}")
+    print(f"Compile:              {compile_time * 1e6:10.1f} µs per user")
+    print(f"Compiled lookup:      {lookup_time * 1e9:10.1f} ns per check")
+    print(f"Row scan:             {scan_time * 1e9:10.1f} ns per check")
+    print(f"Speed-up:             {scan_time / lookup_time:10.1f}x")
+
+    # Bulk check: every question from a different user with a handful of rows
+    triples = {
+        user_id: [[None, d, rng.random() < 0.5] for d in range(1, 6)] + [[rng.randint(1, 50), 3, True]]
+        for user_id in range(1, 10001)
+    }
+    bulk = [(user_id, rng.randint(1, 50), rng.randint(1, 6)) for user_id in triples]
+
+    def bulk_check():
+        rules = {user_id: ConsentRules.from_triples(user_id, rows) for user_id, rows in triples.items()}
+        return [rules[u].is_allowed(c, d) for u, c, d in bulk]
+
+    bulk_time = min(timeit.repeat(bulk_check, number=1, repeat=3))
+    print(f"Bulk check (10k):     {bulk_time * 1e3:10.1f} ms")
+    return True
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--rows', type=int, default=500, help='preference rows per user')
+    parser.add_argument('--checks', type=int, default=100000, help='questions to time')
+    args = parser.parse_args()
+    sys.exit(0 if run(args.rows, args.checks) else 1)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""
+Script to compact the token ledger.
+Folds ledger entries appended since the last run into the materialized
+token balances and refreshes the users.tokens snapshot. Schedule it
+periodically (e.g. every minute from cron).
+"""
+import asyncio
+import os
+import sys
+
+# Add the parent directory to sys.path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.models.user import User
+
+def compact():
+    """Compact the token ledger; returns False on failure."""
+    app = create_app()
+    with app.app_context():
+        compacted = asyncio.run(User.compact_token_ledger())
+    
+    if compacted is None:
+        print("❌ Failed to compact the token ledger")
+        return False
+    
+    print(f"✅ Compacted token ledger for {compacted} users")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if compact() else 1)
@@ -0,0 +1,32 @@
+#!/usr/bin/env python
+"""
+Script to recompute policy compliance analytics.
+Counts, for every data sharing policy, the users who have disallowed its
+company/data type pair and materializes the results in policy_compliance.
+Schedule it periodically (e.g. hourly from cron).
+"""
+import asyncio
+import os
+import sys
+
+# Add the parent directory to sys.path to import from app
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app import create_app
+from app.services.compliance import compute_policy_compliance
+
+def compute():
+    """Recompute policy compliance; returns False on failure."""
+    app = create_app()
+    with app.app_context():
+        try:
+            computed = asyncio.run(compute_policy_compliance())
+        except Exception as e:
+            print(f"❌ Failed to compute policy compliance: {e}")
+            return False
+    
+    print(f"✅ Computed compliance for {computed} policies")
+    return True
+
+if __name__ == "__main__":
+    sys.exit(0 if compute() else 1)
@@ -0,0 +1,30 @@
+from app.utils.cache import TTLCache
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+def test_entries_expire_after_ttl():
+    """Test that entries are dropped once their TTL passes"""
+    clock = FakeClock()
+    cache = TTLCache(maxsize=10, ttl=30, timer=clock)
+    cache.set('user-1', {'id': 'user-1'})
+    clock.now = 29
+    assert cache.get('user-1') == {'id': 'user-1'}
+    clock.now = 31
+    assert cache.get('user-1') is None
+    assert 'user-1' not in cache
+
+def test_least_recently_used_entry_is_evicted():
+    """Test that the cache stays within maxsize"""
+    cache = TTLCache(maxsize=2, ttl=None)
+    cache.set('a', 1)
+    cache.set('b', 2)
+    cache.get('a')
+    cache.set('c', 3)
+    assert 'a' in cache
+    assert 'b' not in cache
+    assert len(cache) == 2
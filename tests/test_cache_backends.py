@@ -0,0 +1,85 @@
+import multiprocessing
+import pytest
+from app.utils.cache_backends import (
+    MemoryCacheBackend, SharedMemoryCacheBackend, RedisCacheBackend, create_cache_backend
+)
+
+@pytest.fixture(params=['memory', 'shared_memory', 'redis'])
+def backend(request, tmp_path):
+    """Each backend, with no external service required"""
+    if request.param == 'memory':
+        return MemoryCacheBackend(maxsize=3)
+    if request.param == 'shared_memory':
+        return SharedMemoryCacheBackend(path=str(tmp_path / 'cache.sqlite3'), maxsize=3)
+    fakeredis = pytest.importorskip('fakeredis')
+    return RedisCacheBackend(client=fakeredis.FakeRedis(), prefix='test:')
+
+def test_round_trip(backend):
+    """Test that values of any picklable type survive a set/get"""
+    backend.set('url', 'https://example.com/a', ttl=60)
+    backend.set('admin', False, ttl=60)
+    backend.set('rows', [{'id': 1}])
+    assert backend.get('url') == 'https://example.com/a'
+    assert backend.get('admin') is False
+    assert backend.get('rows') == [{'id': 1}]
+    assert backend.get('missing', 'default') == 'default'
+
+def test_delete_and_clear(backend):
+    """Test that delete removes one entry and clear removes all"""
+    backend.set('a', 1)
+    backend.set('b', 2)
+    backend.delete('a')
+    assert backend.get('a') is None
+    backend.clear()
+    assert backend.get('b') is None
+
+def test_expired_entries_are_misses(backend):
+    """Test that an entry past its TTL is not returned"""
+    backend.set('short', 'value', ttl=-1)
+    assert backend.get('short') is None
+
+def test_local_backends_are_bounded():
+    """Test that the in-process backend evicts least recently used entries"""
+    backend = MemoryCacheBackend(maxsize=2)
+    backend.set('a', 1)
+    backend.set('b', 2)
+    backend.get('a')
+    backend.set('c', 3)
+    assert backend.get('b') is None
+    assert backend.get('a') == 1
+
+def _write_from_child(path):
+    SharedMemoryCacheBackend(path=path).set('from_child', 'hello', ttl=60)
+
+def test_shared_memory_is_visible_across_processes(tmp_path):
+    """Test that an entry written by another worker process is read back"""
+    path = str(tmp_path / 'cache.sqlite3')
+    backend = SharedMemoryCacheBackend(path=path)
+    process = multiprocessing.get_context('fork').Process(target=_write_from_child, args=(path,))
+    process.start()
+    process.join(10)
+    assert backend.get('from_child') == 'hello'
+
+def test_backend_errors_are_misses():
+    """Test that an unreachable backend degrades to cache misses"""
+    class BrokenClient:
+        def get(self, key):
+            raise ConnectionError('down')
+
+        def set(self, *args, **kwargs):
+            raise ConnectionError('down')
+
+    backend = RedisCacheBackend(client=BrokenClient())
+    backend.set('key', 'value')
+    assert backend.get('key', 'fallback') == 'fallback'
+
+def test_create_cache_backend_from_config(tmp_path):
+    """Test that CACHE_BACKEND selects the backend"""
+    assert isinstance(create_cache_backend({}), MemoryCacheBackend)
+    backend = create_cache_backend({
+        'CACHE_BACKEND': 'shared_memory',
+        'CACHE_SHARED_MEMORY_PATH': str(tmp_path / 'cache.sqlite3')
+    })
+    assert isinstance(backend, SharedMemoryCacheBackend)
+    with pytest.raises(ValueError):
+        create_cache_backend({'CACHE_BACKEND': 'memcached'})
@@ -0,0 +1,67 @@
+import httpx
+import pytest
+from app.utils.circuit_breaker import CircuitBreaker, CircuitOpenError, CLOSED, OPEN, HALF_OPEN
+
+def fail():
+    raise httpx.ConnectError('down')
+
+def succeed():
+    return 'ok'
+
+@pytest.fixture
+def clock(monkeypatch):
+    """Controllable monotonic clock"""
+    now = [1000.0]
+    monkeypatch.setattr('app.utils.circuit_breaker.time.monotonic', lambda: now[0])
+    return now
+
+def test_opens_when_failure_rate_exceeded():
+    """Test that the breaker opens and then fails fast"""
+    breaker = CircuitBreaker('db', failure_rate_threshold=0.5, minimum_calls=4, window_size=4)
+    for func in (succeed, fail, succeed, fail):
+        try:
+            breaker.call(func)
+        except httpx.ConnectError:
+            pass
+    assert breaker.state == OPEN
+
+    calls = []
+    with pytest.raises(CircuitOpenError) as exc_info:
+        breaker.call(lambda: calls.append(1))
+    assert exc_info.value.status_code == 503
+    assert calls == []
+
+def test_client_errors_do_not_open_circuit():
+    """Test that non-transient errors count as the dependency being healthy"""
+    breaker = CircuitBreaker('auth', minimum_calls=2, window_size=2)
+    for _ in range(5):
+        with pytest.raises(ValueError):
+            breaker.call(lambda: (_ for _ in ()).throw(ValueError('bad password')))
+    assert breaker.state == CLOSED
+
+def test_half_open_probe_closes_or_reopens(clock):
+    """Test that a probe after the recovery timeout decides the next state"""
+    breaker = CircuitBreaker('storage', minimum_calls=1, window_size=1, recovery_timeout=30)
+    with pytest.raises(httpx.ConnectError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+
+    clock[0] += 31
+    assert breaker.state == HALF_OPEN
+    with pytest.raises(httpx.ConnectError):
+        breaker.call(fail)
+    assert breaker.state == OPEN
+
+    clock[0] += 31
+    assert breaker.call(succeed) == 'ok'
+    assert breaker.state == CLOSED
+    assert breaker.snapshot() == {'state': CLOSED, 'failure_rate': 0.0, 'window_calls': 1}
+
+def test_half_open_limits_concurrent_probes(clock):
+    """Test that only half_open_max_calls probes are let through"""
+    breaker = CircuitBreaker('search', minimum_calls=1, window_size=1, recovery_timeout=1)
+    with pytest.raises(httpx.ConnectError):
+        breaker.call(fail)
+    clock[0] += 2
+    assert breaker.allow_request()
+    assert not breaker.allow_request()
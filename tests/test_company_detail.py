@@ -0,0 +1,62 @@
+import asyncio
+import pytest
+from app.models.company import Company
+from app.repositories.company import CompanyRepository
+
+ROW = {
+    'id': 1, 'name': 'Acme', 'logo': None, 'created_at': '2025-01-02T03:04:05+00:00',
+    'policies': [
+        {'id': 8, 'company_id': 1, 'data_type_id': 4, 'purpose': 'Analytics',
+         'data_type': {'id': 4, 'name': 'Location'},
+         'third_parties': [{'company': {'id': 6, 'name': 'Maps Inc'}}]},
+        {'id': 7, 'company_id': 1, 'data_type_id': 3, 'purpose': 'Billing',
+         'data_type': {'id': 3, 'name': 'Email'},
+         'third_parties': [{'company': {'id': 5, 'name': 'Payments Ltd'}}, {'company': {'id': 2, 'name': 'Mailer'}}]},
+    ],
+    'related': [{'target_company': {'id': 9, 'name': 'Acme Labs'}}],
+}
+
+@pytest.fixture
+def select_calls(monkeypatch):
+    calls = []
+    class Query:
+        def select(self, columns):
+            calls.append(columns)
+            return self
+        def eq(self, column, value):
+            return self
+    class Response:
+        data = [ROW]
+    class Client:
+        def table(self, name):
+            assert name == 'companies'
+            return Query()
+    monkeypatch.setattr('app.repositories.company.get_supabase', lambda: Client())
+    monkeypatch.setattr('app.repositories.company.traced_execute', lambda query: Response())
+    return calls
+
+def test_detail_is_fetched_with_one_embedded_select(select_calls):
+    """Test that every include is embedded in a single companies query"""
+    asyncio.run(CompanyRepository.get_company_detail(1, ['related', 'third_parties', 'data_types']))
+
+    assert select_calls == [
+        '*,policies:data_sharing_policies!company_id('
+        '*,data_type:data_types(*),third_parties:data_sharing_third_parties(company:companies(*))),'
+        'related:company_relationships!source_company_id(target_company:companies!target_company_id(*))'
+    ]
+
+def test_plain_detail_selects_only_the_company(select_calls):
+    """Test that no embedding is requested without includes"""
+    asyncio.run(CompanyRepository.get_company_detail(1))
+
+    assert select_calls == ['*']
+
+def test_detail_is_shaped_for_the_api(select_calls):
+    """Test that embedded rows are serialized, ordered by id and limited to what was asked for"""
+    detail = asyncio.run(Company.get_detail(1, ['policies', 'third_parties', 'related']))
+
+    assert detail['created_at'] == '2025-01-02T03:04:05+00:00'
+    assert [policy['id'] for policy in detail['policies']] == [7, 8]
+    assert [company['name'] for company in detail['policies'][0]['third_parties']] == ['Mailer', 'Payments Ltd']
+    assert 'data_type' not in detail['policies'][0]
+    assert [company['name'] for company in detail['related_companies']] == ['Acme Labs']
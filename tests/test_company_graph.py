@@ -0,0 +1,131 @@
+import asyncio
+import pytest
+from flask import Flask
+from app.repositories.company import CompanyRepository
+from app.services import company_graph
+from app.utils.cache_backends import MemoryCacheBackend, get_cache, set_cache
+
+# 1 -> 2 -> 3 -> 4, with a shortcut 1 -> 3 through a policy and a cycle back to 1
+EDGES = [
+    (1, 2, 'relationship'),
+    (2, 3, 'relationship'),
+    (3, 4, 'relationship'),
+    (1, 3, 'third_party'),
+    (4, 1, 'relationship'),
+    (5, 5, 'relationship'),
+]
+
+@pytest.fixture
+def graph(monkeypatch):
+    state = {'edges': list(EDGES), 'version': 1, 'loads': 0}
+    async def get_graph_edges():
+        state['loads'] += 1
+        return list(state['edges'])
+    async def get_graph_version():
+        return state['version']
+    monkeypatch.setattr(company_graph.company_graph_cache, '_loader', get_graph_edges)
+    monkeypatch.setattr(company_graph.company_graph_cache, '_version_loader', get_graph_version)
+    monkeypatch.setattr(company_graph.company_graph_cache, 'check_interval', 0)
+    previous = get_cache()
+    set_cache(MemoryCacheBackend())
+    company_graph.invalidate_company_graph()
+    app = Flask(__name__)
+    app.config['COMPANY_GRAPH_MAX_DEPTH'] = 4
+    with app.app_context():
+        yield state
+    company_graph.invalidate_company_graph()
+    set_cache(previous)
+
+def test_reachable_respects_depth_and_shortest_distance(graph):
+    """Test that the search stops at the depth limit and reports shortest distances"""
+    one_hop = asyncio.run(company_graph.related_companies('1', 1))
+    two_hops = asyncio.run(company_graph.related_companies('1', 2))
+
+    assert [(item['company_id'], item['distance']) for item in one_hop] == [(2, 1), (3, 1)]
+    assert [(item['company_id'], item['distance']) for item in two_hops] == [(2, 1), (3, 1), (4, 2)]
+    assert two_hops[2]['path'] == [
+        {'from': 1, 'to': 3, 'kind': 'third_party'},
+        {'from': 3, 'to': 4, 'kind': 'relationship'},
+    ]
+
+def test_cycles_and_self_loops_do_not_revisit_the_start(graph):
+    """Test that cycles terminate and the starting company is never listed"""
+    assert asyncio.run(company_graph.related_companies(5, 4)) == []
+    assert 1 not in asyncio.run(company_graph.reachable(1, 4))
+
+def test_shortest_path_between_companies(graph):
+    """Test that paths are found within the depth limit and None is returned beyond it"""
+    assert [hop['to'] for hop in asyncio.run(company_graph.shortest_path(2, 1, 4))] == [3, 4, 1]
+    assert asyncio.run(company_graph.shortest_path(2, 1, 2)) is None
+    assert asyncio.run(company_graph.shortest_path(2, 2, 1)) == []
+
+def test_results_are_cached_until_the_version_changes(graph):
+    """Test that repeated searches reuse one load and a version bump reloads the edges"""
+    asyncio.run(company_graph.related_companies(1, 2))
+    asyncio.run(company_graph.related_companies(1, 2))
+    assert graph['loads'] == 1
+
+    graph['edges'].append((4, 6, 'relationship'))
+    graph['version'] = 2
+    get_cache().clear()
+    related = asyncio.run(company_graph.related_companies(1, 3))
+
+    assert graph['loads'] == 2
+    assert (6, 3) in [(item['company_id'], item['distance']) for item in related]
+
+def test_find_by_ids_batches_in_filters(monkeypatch):
+    """Test that multi-get splits large id lists into bounded in() filters"""
+    batches = []
+    class Query:
+        def select(self, columns):
+            return self
+        def in_(self, column, ids):
+            batches.append(list(ids))
+            self.ids = ids
+            return self
+    class Response:
+        def __init__(self, ids):
+            self.data = [{'id': id, 'name': f'company-{id}'} for id in ids if id % 2]
+    class Client:
+        def table(self, name):
+            return Query()
+    monkeypatch.setattr('app.repositories.company.get_supabase', lambda: Client())
+    monkeypatch.setattr('app.repositories.company.traced_execute', lambda query: Response(query.ids))
+
+    companies = asyncio.run(CompanyRepository.find_by_ids(list(range(1, 451)) + [1]))
+
+    assert [len(batch) for batch in batches] == [200, 200, 50]
+    assert len(companies) == 225
+    assert companies[3].name == 'company-3'
+
+def test_path_to_unknown_company_is_not_found(graph, monkeypatch):
+    """Test that a path request naming a missing company is a 404 checked with one lookup, before any search"""
+    pytest.importorskip('asgiref')  # Async views need Flask's async extra
+    pytest.importorskip('fastapi')  # Imported by app.api
+    from flask_jwt_extended import JWTManager, create_access_token
+    from app.api.v1.companies import companies_bp
+
+    lookups = []
+    async def find_existing_ids(ids):
+        lookups.append(list(ids))
+        return {id for id in ids if id in (1, 2, 3, 4)}
+    monkeypatch.setattr(CompanyRepository, 'find_existing_ids', staticmethod(find_existing_ids))
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-secret-' + 'x' * 32
+    app.config['COMPANY_GRAPH_MAX_DEPTH'] = 4
+    JWTManager(app)
+    app.register_blueprint(companies_bp, url_prefix='/api/v1/companies')
+    with app.app_context():
+        headers = {'Authorization': f'Bearer {create_access_token(identity="1")}'}
+
+    client = app.test_client()
+    missing = client.get('/api/v1/companies/1/path/99', headers=headers)
+    assert missing.status_code == 404
+    assert missing.get_json()['error'] == 'Company not found'
+    assert lookups == [[1, 99]]
+    assert graph['loads'] == 0
+
+    found = client.get('/api/v1/companies/2/path/1', headers=headers)
+    assert found.status_code == 200
+    assert found.get_json()['distance'] == 3
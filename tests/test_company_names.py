@@ -0,0 +1,100 @@
+import asyncio
+import pathlib
+import re
+import sys
+import pytest
+from postgrest.exceptions import APIError
+from app.repositories.company import WHITESPACE_CLASS, CompanyRepository, normalize_company_name
+from app.utils.error_handlers import ConflictError
+
+class Query:
+    def __init__(self, calls):
+        self.calls = calls
+    def insert(self, rows):
+        self.calls.append(('insert', rows, {}))
+        return self
+    def upsert(self, rows, **options):
+        self.calls.append(('upsert', rows, options))
+        return self
+
+class Response:
+    def __init__(self, data):
+        self.data = data
+
+@pytest.fixture
+def database(monkeypatch):
+    """A companies table that already holds 'Acme Corp' and inserts with ON CONFLICT semantics."""
+    state = {'calls': [], 'names': {'acme corp'}}
+    class Client:
+        def table(self, name):
+            return Query(state['calls'])
+    def traced_execute(query):
+        operation, rows, options = state['calls'][-1]
+        rows = rows if isinstance(rows, list) else [rows]
+        inserted = []
+        for index, row in enumerate(rows):
+            name = normalize_company_name(row['name'])
+            if name in state['names']:
+                if operation == 'insert':
+                    raise APIError({'code': '23505', 'message': 'duplicate key value violates unique constraint '
+                                                                '"companies_name_normalized_key"'})
+                continue
+            state['names'].add(name)
+            inserted.append(dict(row, id=100 + index))
+        return Response(inserted)
+    monkeypatch.setattr('app.repositories.company.get_supabase', lambda: Client())
+    monkeypatch.setattr('app.repositories.company.traced_execute', traced_execute)
+    return state
+
+def test_names_are_normalized_like_the_database():
+    """Test that case and whitespace differences collapse to one name"""
+    assert normalize_company_name('  ACME\tcorp ') == normalize_company_name('Acme Corp') == 'acme corp'
+
+def test_unicode_whitespace_is_normalized_like_the_database():
+    """Test that the whitespace class is exactly str.isspace() and shared with the migration"""
+    everything = ''.join(map(chr, range(sys.maxunicode + 1)))
+    spaces = ''.join(c for c in everything if c.isspace())
+    assert ''.join(re.findall(WHITESPACE_CLASS, everything)) == spaces
+    assert normalize_company_name(spaces + 'Acme' + spaces + 'Corp' + spaces) == 'acme corp'
+    assert normalize_company_name('Acme\u200bCorp') == 'acme\u200bcorp'
+
+    migration = pathlib.Path(__file__).parent.parent / 'backend/migrations/versions/d9e4a1b6c572_unique_normalized_company_name.py'
+    assert f"WHITESPACE_CLASS = r'{WHITESPACE_CLASS}'" in migration.read_text()
+
+def test_create_is_one_insert_and_duplicates_conflict(database):
+    """Test that creation does not pre-scan and a unique violation becomes ConflictError"""
+    company = asyncio.run(CompanyRepository.insert({'name': 'Globex'}))
+    assert company.name == 'Globex'
+
+    with pytest.raises(ConflictError) as conflict:
+        asyncio.run(CompanyRepository.insert({'name': ' acme  CORP'}))
+
+    assert conflict.value.status_code == 409
+    assert [operation for operation, _, _ in database['calls']] == ['insert', 'insert']
+
+def test_other_unique_violations_are_not_name_conflicts(monkeypatch):
+    """Test that a unique violation on another constraint is re-raised rather than reported as a duplicate name"""
+    class Client:
+        def table(self, name):
+            return Query([])
+    def traced_execute(query):
+        raise APIError({'code': '23505', 'message': 'duplicate key value violates unique constraint "companies_pkey"',
+                        'details': 'Key (id)=(7) already exists.'})
+    monkeypatch.setattr('app.repositories.company.get_supabase', lambda: Client())
+    monkeypatch.setattr('app.repositories.company.traced_execute', traced_execute)
+
+    with pytest.raises(APIError) as error:
+        asyncio.run(CompanyRepository.insert({'id': 7, 'name': 'Globex'}))
+    assert not isinstance(error.value, ConflictError)
+
+def test_bulk_insert_reports_conflicts_without_a_pre_scan(database):
+    """Test that one upsert skips existing and repeated names and reports them by index"""
+    rows = [{'name': 'Initech'}, {'name': 'ACME corp'}, {'name': 'Umbrella'}, {'name': 'initech '}]
+
+    created, conflicts = asyncio.run(CompanyRepository.insert_many(rows))
+
+    assert [company.name for company in created] == ['Initech', 'Umbrella']
+    assert conflicts == [1, 3]
+    assert database['calls'] == [
+        ('upsert', rows, {'on_conflict': 'name_normalized', 'ignore_duplicates': True})
+    ]
@@ -0,0 +1,63 @@
+import asyncio
+import pytest
+from flask import Flask
+from app.repositories.compliance import ComplianceRepository
+from app.repositories.preference import UserPreferenceRepository
+from app.services import compliance
+from app.services.compliance import PolicyColumns, consent_matrix
+
+POLICIES = [
+    {'id': 1, 'company_id': 5, 'data_type_id': 10},
+    {'id': 2, 'company_id': 5, 'data_type_id': 11},
+    {'id': 3, 'company_id': 6, 'data_type_id': 10},
+    {'id': 4, 'company_id': 5, 'data_type_id': 10},
+]
+
+TRIPLES = {
+    1: [[None, 10, True], [5, 10, False]],
+    2: [[None, 10, False], [None, 11, True]],
+    3: [[6, 10, True], [6, 10, False]],
+}
+
+def test_matrix_applies_overrides_then_globals_then_default():
+    """Test that overrides win, global rules are broadcast and the default fills the rest"""
+    matrix = consent_matrix([1, 2, 3, 4], TRIPLES, PolicyColumns(POLICIES), default=False)
+    assert matrix.tolist() == [
+        [False, False, True, False],
+        [False, True, False, False],
+        [False, False, False, False],
+        [False, False, False, False],
+    ]
+
+def test_matrix_uses_default_for_missing_preferences():
+    """Test that users without preferences get the configured default everywhere"""
+    matrix = consent_matrix([9], {}, PolicyColumns(POLICIES), default=True)
+    assert matrix.all()
+
+@pytest.fixture
+def app_context():
+    app = Flask(__name__)
+    app.config['CONSENT_DEFAULT_ALLOWED'] = True
+    with app.app_context():
+        yield
+
+def test_compute_policy_compliance_counts_per_policy(app_context, monkeypatch):
+    """Test that counts accumulate across user pages and are materialized per policy"""
+    saved = []
+    async def get_policies():
+        return POLICIES
+    async def get_user_ids(after_id=0, limit=1000):
+        return [user_id for user_id in [1, 2, 3, 4] if user_id > after_id][:limit]
+    async def get_rules(user_ids, company_ids=None):
+        assert company_ids == {5, 6}
+        return {user_id: TRIPLES[user_id] for user_id in user_ids if user_id in TRIPLES}
+    async def save_results(rows):
+        saved.extend(rows)
+    monkeypatch.setattr(ComplianceRepository, 'get_policies', staticmethod(get_policies))
+    monkeypatch.setattr(ComplianceRepository, 'get_user_ids', staticmethod(get_user_ids))
+    monkeypatch.setattr(ComplianceRepository, 'save_results', staticmethod(save_results))
+    monkeypatch.setattr(UserPreferenceRepository, 'get_rules', staticmethod(get_rules))
+
+    assert asyncio.run(compliance.compute_policy_compliance(page_size=3)) == 4
+    assert {row['policy_id']: row['users_disallowed'] for row in saved} == {1: 2, 2: 0, 3: 2, 4: 2}
+    assert {row['users_total'] for row in saved} == {4}
@@ -0,0 +1,160 @@
+import asyncio
+import pickle
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from app.models import preference as preference_models
+from app.models.data_type import DataType
+from app.models.preference import UserPreference
+from app.repositories.preference import UserPreferenceRepository
+from app.schemas.preference import UserPreferenceSchema
+from app.services import consent
+from app.services.consent import ConsentRules
+from app.utils.cache_backends import MemoryCacheBackend, SharedMemoryCacheBackend, get_cache, set_cache
+
+ROWS = [
+    {'user_id': 1, 'company_id': None, 'data_type_id': 10, 'allowed': True},
+    {'user_id': 1, 'company_id': None, 'data_type_id': 11, 'allowed': False},
+    {'user_id': 1, 'company_id': 5, 'data_type_id': 10, 'allowed': False},
+    {'user_id': 1, 'company_id': 5, 'data_type_id': 12, 'allowed': True},
+    {'user_id': 2, 'company_id': None, 'data_type_id': 11, 'allowed': True},
+]
+
+def triples_by_user(rows, user_ids, company_ids=None):
+    """What get_consent_rules returns for the given rows"""
+    triples = {}
+    for row in rows:
+        if row['user_id'] in user_ids and (company_ids is None or row['company_id'] in (None, *company_ids)):
+            triples.setdefault(row['user_id'], []).append([row['company_id'], row['data_type_id'], row['allowed']])
+    return triples
+
+@pytest.fixture
+def app_context(tmp_path):
+    previous = get_cache()
+    set_cache(SharedMemoryCacheBackend(path=str(tmp_path / 'cache.sqlite3')))
+    app = Flask(__name__)
+    app.config['CONSENT_DEFAULT_ALLOWED'] = False
+    with app.app_context():
+        yield
+    set_cache(previous)
+
+def test_company_override_beats_global_rule():
+    """Test that a company-specific preference overrides the global one"""
+    rules = ConsentRules.compile(1, ROWS)
+    assert rules.is_allowed(None, 10)
+    assert not rules.is_allowed(5, 10)
+    assert rules.is_allowed(6, 10)
+
+def test_fallbacks_to_global_rule_then_default():
+    """Test that missing overrides fall back to the global rule, then to the default"""
+    rules = ConsentRules.compile(1, ROWS)
+    assert not rules.is_allowed(5, 11)
+    assert rules.is_allowed(5, 12)
+    assert not rules.is_allowed(6, 12)
+    assert rules.is_allowed(6, 12, default=True)
+    assert rules.is_allowed('5', '12')
+
+def test_rules_survive_pickling():
+    """Test that compiled rules can be stored in a shared cache backend"""
+    rules = pickle.loads(pickle.dumps(ConsentRules.compile(2, ROWS)))
+    assert rules.is_allowed(5, 11)
+    assert rules.bits == {11: 1}
+
+def test_bulk_rules_load_misses_in_one_query(app_context, monkeypatch):
+    """Test that several users' rules are compiled from one query and then cached"""
+    calls = []
+    async def get_rules(user_ids, company_ids=None):
+        calls.append(list(user_ids))
+        return triples_by_user(ROWS, user_ids)
+    monkeypatch.setattr(UserPreferenceRepository, 'get_rules', staticmethod(get_rules))
+
+    rules = asyncio.run(consent.get_consent_rules_bulk(['1', 2, 3]))
+    assert calls == [[1, 2, 3]]
+    assert not rules[3].bits
+    assert asyncio.run(consent.is_allowed('2', 5, 11))
+    assert calls == [[1, 2, 3]]
+
+def test_rules_are_not_cached_per_process(app_context, monkeypatch):
+    """Test that a per-process cache is bypassed, since invalidation would not reach other workers"""
+    set_cache(MemoryCacheBackend())
+    calls = []
+    async def get_rules(user_ids, company_ids=None):
+        calls.append(list(user_ids))
+        return triples_by_user(ROWS, user_ids)
+    monkeypatch.setattr(UserPreferenceRepository, 'get_rules', staticmethod(get_rules))
+
+    assert asyncio.run(consent.is_allowed(2, 5, 11))
+    assert asyncio.run(consent.is_allowed(2, 5, 11))
+    assert calls == [[2], [2]]
+    assert get_cache().get('consent:2') is None
+
+def test_saving_a_preference_invalidates_rules(app_context, monkeypatch):
+    """Test that writing a preference makes the next check recompile"""
+    rows = [dict(row) for row in ROWS]
+    async def get_rules(user_ids, company_ids=None):
+        return triples_by_user(rows, user_ids)
+    async def create(schema):
+        rows.append({'user_id': schema.user_id, 'company_id': schema.company_id,
+                     'data_type_id': schema.data_type_id, 'allowed': schema.allowed})
+        return UserPreferenceSchema(id=99, **rows[-1])
+    monkeypatch.setattr(UserPreferenceRepository, 'get_rules', staticmethod(get_rules))
+    monkeypatch.setattr(UserPreferenceRepository, 'create', staticmethod(create))
+
+    assert not asyncio.run(consent.is_allowed(1, 7, 11))
+    preference = UserPreference(UserPreferenceSchema(user_id=1, company_id=7, data_type_id=11, allowed=True))
+    asyncio.run(preference.save())
+    assert asyncio.run(consent.is_allowed(1, 7, 11))
+
+def test_bulk_check_loads_only_asked_companies(app_context, monkeypatch):
+    """Test that bulk checks query uncached users once, restricted to the companies asked about"""
+    calls = []
+    async def get_rules(user_ids, company_ids=None):
+        calls.append((sorted(user_ids), company_ids))
+        return triples_by_user(ROWS, user_ids, company_ids)
+    monkeypatch.setattr(UserPreferenceRepository, 'get_rules', staticmethod(get_rules))
+
+    checks = [(1, 5, 10), (1, 6, 10), (1, None, 11), (2, 5, 11), (3, 5, 10)] * 2000
+    results = asyncio.run(consent.check_consent_bulk(checks))
+
+    assert results[:5] == [False, True, False, True, False]
+    assert len(results) == 10000
+    assert calls == [([1, 2, 3], {5, 6})]
+    # Partial rules are not cached as if they were complete
+    assert get_cache().get('consent:1') is None
+
+def test_preference_endpoint_drops_compiled_rules(app_context, monkeypatch):
+    """Test that a write through the mounted user-preferences API drops the user's compiled rules"""
+    pytest.importorskip('asgiref')  # Async views need Flask's async extra
+    pytest.importorskip('fastapi')  # Imported by app.api
+    from app.api.v1.user_preferences import user_preferences_bp
+    async def get_rules(user_ids, company_ids=None):
+        return triples_by_user(ROWS, user_ids)
+    async def find(user_id, data_type_id, company_id=None):
+        return None
+    async def create(schema):
+        return UserPreferenceSchema(id=99, **{k: v for k, v in schema.to_dict().items() if k != 'id'})
+    async def exists(cls, id):
+        return True
+    async def refresh_user_exposure(user_id):
+        pass
+    monkeypatch.setattr(UserPreferenceRepository, 'get_rules', staticmethod(get_rules))
+    monkeypatch.setattr(UserPreferenceRepository, 'find', staticmethod(find))
+    monkeypatch.setattr(UserPreferenceRepository, 'create', staticmethod(create))
+    monkeypatch.setattr(DataType, 'exists', classmethod(exists))
+    monkeypatch.setattr(preference_models, 'refresh_user_exposure', refresh_user_exposure)
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-secret-' + 'x' * 32
+    JWTManager(app)
+    app.register_blueprint(user_preferences_bp, url_prefix='/api/v1/user-preferences')
+    with app.app_context():
+        token = create_access_token(identity='1')
+    asyncio.run(consent.is_allowed(1, 7, 11))
+    assert get_cache().get('consent:1') is not None
+
+    response = app.test_client().post('/api/v1/user-preferences/data', json={'data_type_id': 11, 'allowed': True},
+                                      headers={'Authorization': f'Bearer {token}'})
+
+    assert response.status_code == 200
+    assert get_cache().get('consent:1') is None
+
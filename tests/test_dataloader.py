@@ -0,0 +1,87 @@
+import asyncio
+import pytest
+from flask import Flask, g
+from app.repositories.company import CompanyRepository
+from app.schemas.company import CompanySchema
+from app.utils.dataloader import DataLoader, forget, request_loader
+from app.utils.metrics import _new_request_stats
+
+@pytest.fixture
+def request_context():
+    app = Flask(__name__)
+    with app.test_request_context('/'):
+        g._request_stats = _new_request_stats()
+        yield g
+
+def recording_batch_load(calls, missing=()):
+    async def batch_load(keys):
+        calls.append(list(keys))
+        return {key: f'record-{key}' for key in keys if key not in missing}
+    return batch_load
+
+def test_loads_in_the_same_tick_share_one_batch(request_context):
+    """Test that concurrent loads are resolved together and repeats come from the request cache"""
+    calls = []
+    loader = DataLoader('things', recording_batch_load(calls, missing={3}))
+
+    async def scenario():
+        first = await asyncio.gather(loader.load(1), loader.load('2'), loader.load(3), loader.load(1))
+        again = await loader.load(2)
+        return first, again
+
+    first, again = asyncio.run(scenario())
+
+    assert first == ['record-1', 'record-2', None, 'record-1']
+    assert again == 'record-2'
+    assert calls == [[1, 2, 3]]
+    # Five loads, one query
+    assert request_context._request_stats['queries_saved'] == {'things': 4}
+
+def test_invalid_ids_resolve_to_none_without_a_query(request_context):
+    """Test that ids that cannot be integers never reach the batch function"""
+    calls = []
+    loader = DataLoader('things', recording_batch_load(calls))
+
+    assert asyncio.run(loader.load('not-an-id')) is None
+    assert calls == []
+
+def test_forget_and_failures_allow_reloading(request_context):
+    """Test that written records and failed batches are fetched again on the next load"""
+    calls = []
+    loader = request_loader('things', recording_batch_load(calls))
+    asyncio.run(loader.load(1))
+    forget('things', 1)
+    asyncio.run(loader.load(1))
+    assert calls == [[1], [1]]
+
+    attempts = []
+    async def flaky(keys):
+        attempts.append(keys)
+        if len(attempts) == 1:
+            raise RuntimeError('database unavailable')
+        return {key: key for key in keys}
+    flaky_loader = DataLoader('flaky', flaky)
+    with pytest.raises(RuntimeError):
+        asyncio.run(flaky_loader.load(5))
+    assert asyncio.run(flaky_loader.load(5)) == 5
+
+def test_loaders_only_exist_inside_requests():
+    """Test that scripts and background jobs outside a request query directly"""
+    assert request_loader('things', recording_batch_load([])) is None
+
+def test_repository_lookups_are_batched_per_request(request_context, monkeypatch):
+    """Test that find_by_id keeps its interface but shares queries within a request"""
+    calls = []
+    async def find_by_ids(ids):
+        calls.append(list(ids))
+        return {id: CompanySchema(id=id, name=f'company-{id}') for id in ids}
+    monkeypatch.setattr(CompanyRepository, 'find_by_ids', staticmethod(find_by_ids))
+
+    async def scenario():
+        pair = await asyncio.gather(CompanyRepository.find_by_id('4'), CompanyRepository.find_by_id(7))
+        return pair + [await CompanyRepository.find_by_id(4)]
+
+    companies = asyncio.run(scenario())
+
+    assert [company.name for company in companies] == ['company-4', 'company-7', 'company-4']
+    assert calls == [[4, 7]]
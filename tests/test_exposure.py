@@ -0,0 +1,107 @@
+import asyncio
+import pytest
+from flask import Flask
+from app.models.data_type import DataType
+from app.models.preference import UserPreference
+from app.repositories.exposure import ExposureRepository
+from app.repositories.preference import UserPreferenceRepository
+from app.schemas.data_type import DataTypeSchema
+from app.schemas.preference import UserPreferenceSchema
+from app.services import exposure
+from app.utils.cache_backends import MemoryCacheBackend, get_cache, set_cache
+
+ROWS = [
+    {'policy_id': 1, 'data_type_id': 10, 'company_id': 5, 'via_company_id': None,
+     'purpose': 'Billing', 'company': {'id': 5, 'name': 'Acme', 'logo': None}},
+    {'policy_id': 1, 'data_type_id': 10, 'company_id': 7, 'via_company_id': 5,
+     'purpose': 'Billing', 'company': {'id': 7, 'name': 'Payments Ltd', 'logo': None}},
+    {'policy_id': 2, 'data_type_id': 11, 'company_id': 5, 'via_company_id': None,
+     'purpose': 'Analytics', 'company': {'id': 5, 'name': 'Acme', 'logo': None}},
+]
+
+@pytest.fixture
+def app_context(monkeypatch):
+    async def find_by_id(cls, id):
+        return cls(DataTypeSchema(id=id, name=f'type-{id}'))
+    monkeypatch.setattr(DataType, 'find_by_id', classmethod(find_by_id))
+    previous = get_cache()
+    set_cache(MemoryCacheBackend())
+    app = Flask(__name__)
+    app.config['CONSENT_DEFAULT_ALLOWED'] = False
+    with app.app_context():
+        yield
+    set_cache(previous)
+
+def test_exposure_is_grouped_by_data_type(app_context, monkeypatch):
+    """Test that exposure rows are served in one read and grouped per data type"""
+    calls = []
+    async def get_user_exposure(user_id):
+        calls.append(user_id)
+        return ROWS
+    monkeypatch.setattr(ExposureRepository, 'get_user_exposure', staticmethod(get_user_exposure))
+
+    result = asyncio.run(exposure.get_user_exposure('42'))
+
+    assert calls == [42]
+    assert [entry['data_type']['name'] for entry in result] == ['type-10', 'type-11']
+    recipients = result[0]['recipients']
+    assert [recipient['company']['name'] for recipient in recipients] == ['Acme', 'Payments Ltd']
+    assert [recipient['third_party'] for recipient in recipients] == [False, True]
+
+def test_saving_a_preference_refreshes_exposure(app_context, monkeypatch):
+    """Test that a preference write rebuilds the user's exposure with the configured default"""
+    refreshed = []
+    async def create(schema):
+        return UserPreferenceSchema(id=1, **{k: v for k, v in schema.to_dict().items() if k != 'id'})
+    async def refresh_user(user_id, default):
+        refreshed.append((user_id, default))
+        return 0
+    monkeypatch.setattr(UserPreferenceRepository, 'create', staticmethod(create))
+    monkeypatch.setattr(ExposureRepository, 'refresh_user', staticmethod(refresh_user))
+
+    asyncio.run(UserPreference(UserPreferenceSchema(user_id='3', data_type_id=10, allowed=True)).save())
+    assert refreshed == [(3, False)]
+
+def test_bulk_save_writes_together_and_refreshes_once(app_context, monkeypatch):
+    """Test that saving several preferences is one upsert plus one insert and a single refresh"""
+    calls = []
+    class Query:
+        def upsert(self, rows, **options):
+            calls.append(('upsert', rows, options))
+            self.data = [dict(row) for row in rows]
+            return self
+        def insert(self, rows):
+            calls.append(('insert', rows, {}))
+            self.data = [dict(row, id=100 + index) for index, row in enumerate(rows)]
+            return self
+    class Client:
+        def table(self, name):
+            return Query()
+    refreshed, invalidated = [], []
+    async def refresh_user(user_id, default):
+        refreshed.append(user_id)
+        return 0
+    monkeypatch.setattr('app.repositories.preference.get_supabase', lambda: Client())
+    monkeypatch.setattr('app.repositories.preference.traced_execute', lambda query: query)
+    monkeypatch.setattr(ExposureRepository, 'refresh_user', staticmethod(refresh_user))
+    monkeypatch.setattr('app.models.preference.invalidate_consent', invalidated.append)
+
+    preferences = [
+        UserPreference(UserPreferenceSchema(user_id=3, data_type_id=10, company_id=5, allowed=True)),
+        UserPreference(UserPreferenceSchema(id=7, user_id=3, data_type_id=11, company_id=5, allowed=False)),
+        UserPreference(UserPreferenceSchema(user_id=3, data_type_id=12, company_id=5, allowed=True)),
+    ]
+    saved = asyncio.run(UserPreference.save_many(3, preferences))
+
+    assert [operation for operation, _, _ in calls] == ['upsert', 'insert']
+    assert calls[0][2] == {'on_conflict': 'id'}
+    assert [preference.id for preference in saved] == [100, 7, 101]
+    assert refreshed == [3]
+    assert invalidated == [3]
+
+def test_refresh_failure_does_not_fail_the_write(app_context, monkeypatch):
+    """Test that an exposure refresh error is logged rather than raised"""
+    async def refresh_policy(policy_id, default):
+        raise RuntimeError('database unavailable')
+    monkeypatch.setattr(ExposureRepository, 'refresh_policy', staticmethod(refresh_policy))
+    asyncio.run(exposure.refresh_policy_exposure(1))
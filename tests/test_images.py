@@ -0,0 +1,85 @@
+import io
+import pytest
+from flask import Flask
+from PIL import Image
+from app.services.images import generate_logo_variants, render_variant
+
+class FakeStorageService:
+    def __init__(self, files, variants=None):
+        self.files = files
+        self.uploads = {}
+        self.variants = dict(variants or {})
+
+    def get_logo_variants(self, logos):
+        return {logo: self.variants.get(logo, []) for logo in logos}
+
+    def record_logo_variants(self, logo, variants):
+        self.variants[logo] = list(variants)
+        return True
+
+    def download_file(self, name):
+        return self.files[name]
+
+    def _upload_bytes(self, path, data, content_type=None, cache_control=None):
+        self.uploads[path] = (data, content_type, cache_control)
+
+def png_bytes(size, mode='RGBA'):
+    output = io.BytesIO()
+    Image.new(mode, size, (200, 30, 30, 128) if mode == 'RGBA' else 'red').save(output, format='PNG')
+    return output.getvalue()
+
+@pytest.fixture
+def app_context():
+    app = Flask(__name__)
+    with app.app_context():
+        yield
+
+def test_render_variant_fits_longest_side():
+    """Test that a variant keeps the aspect ratio, fits the size and is WebP"""
+    data = render_variant(Image.new('RGB', (1000, 500), 'blue'), 64)
+    with Image.open(io.BytesIO(data)) as variant:
+        assert variant.format == 'WEBP'
+        assert variant.size == (64, 32)
+
+def test_render_variant_does_not_enlarge():
+    """Test that small images are recompressed at their own size"""
+    data = render_variant(Image.new('P', (20, 10)), 256)
+    with Image.open(io.BytesIO(data)) as variant:
+        assert variant.size == (20, 10)
+
+def test_generate_logo_variants_stores_each_variant(app_context):
+    """Test that every variant of a content-addressed logo is uploaded as cacheable WebP"""
+    original = png_bytes((800, 800))
+    logo = 'sha256/' + 'cd' * 32
+    service = FakeStorageService({logo: original})
+
+    paths = generate_logo_variants(logo, service)
+
+    assert set(paths) == {'thumbnail', 'medium'}
+    data, content_type, cache_control = service.uploads[paths['thumbnail']]
+    assert content_type == 'image/webp'
+    assert cache_control
+    assert len(data) < len(original)
+    with Image.open(io.BytesIO(service.uploads[paths['medium']][0])) as medium:
+        assert medium.size == (256, 256)
+        assert medium.mode == 'RGBA'
+    assert service.variants[logo] == ['thumbnail', 'medium']
+
+def test_only_missing_variants_are_generated(app_context):
+    """Test that variants recorded earlier are not rendered again"""
+    logo = 'sha256/' + 'cd' * 32
+    service = FakeStorageService({logo: png_bytes((300, 300))}, variants={logo: ['thumbnail']})
+
+    paths = generate_logo_variants(logo, service)
+
+    assert list(paths) == ['medium']
+    assert service.variants[logo] == ['thumbnail', 'medium']
+    service.uploads.clear()
+    assert generate_logo_variants(logo, service) == {}
+    assert service.uploads == {}
+
+def test_external_logos_are_skipped(app_context):
+    """Test that logos outside content-addressed storage get no variants"""
+    service = FakeStorageService({})
+    assert generate_logo_variants('https://example.com/logo.png', service) == {}
+    assert service.uploads == {}
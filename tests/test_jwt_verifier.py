@@ -0,0 +1,125 @@
+import time
+import jwt
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token, jwt_required, get_jwt_identity
+from app.utils.jwt_verifier import verify_supabase_token, token_verifier, CachedJWTManager
+
+SECRET = 'test-supabase-jwt-secret-with-enough-length'
+
+@pytest.fixture
+def app():
+    """Create a bare Flask app with a Supabase JWT secret"""
+    app = Flask(__name__)
+    app.config['SUPABASE_JWT_SECRET'] = SECRET
+    token_verifier.clear()
+    with app.app_context():
+        yield app
+
+def make_token(secret=SECRET, **claims):
+    payload = {'sub': 'user-123', 'role': 'authenticated', 'exp': int(time.time()) + 60}
+    payload.update(claims)
+    return jwt.encode(payload, secret, algorithm='HS256')
+
+def test_valid_token_is_verified_locally(app):
+    """Test that an HS256 Supabase token is verified without GoTrue"""
+    claims = verify_supabase_token(make_token())
+    assert claims['sub'] == 'user-123'
+
+def test_bad_signature_is_rejected(app):
+    """Test that a token signed with another secret is conclusively invalid"""
+    with pytest.raises(jwt.InvalidSignatureError):
+        verify_supabase_token(make_token(secret='another-secret-of-sufficient-length'))
+
+def test_expired_token_is_rejected(app):
+    """Test that expired tokens are conclusively invalid"""
+    with pytest.raises(jwt.ExpiredSignatureError):
+        verify_supabase_token(make_token(exp=int(time.time()) - 10))
+
+def test_inconclusive_without_secret(app):
+    """Test that verification defers to GoTrue when no secret is configured"""
+    app.config['SUPABASE_JWT_SECRET'] = None
+    assert verify_supabase_token(make_token()) is None
+
+def test_repeated_token_skips_decode(app, monkeypatch):
+    """Test that a validated token is served from the cache until it expires"""
+    token = make_token()
+    verify_supabase_token(token)
+
+    def fail_decode(*args, **kwargs):
+        raise AssertionError('token should not be decoded again')
+    monkeypatch.setattr('app.utils.jwt_verifier.jwt.decode', fail_decode)
+    assert verify_supabase_token(token)['sub'] == 'user-123'
+
+def test_jwt_required_uses_cached_verifier(monkeypatch):
+    """Test that flask_jwt_extended routes share the validated-token cache"""
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = SECRET
+    CachedJWTManager(app)
+    token_verifier.clear()
+
+    @app.route('/me')
+    @jwt_required()
+    def me():
+        return {'user_id': get_jwt_identity()}
+
+    with app.app_context():
+        access_token = create_access_token(identity='user-123')
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {access_token}'}
+    assert client.get('/me', headers=headers).json == {'user_id': 'user-123'}
+
+    calls = []
+    original = JWTManager._decode_jwt_from_config
+    monkeypatch.setattr(JWTManager, '_decode_jwt_from_config',
+                        lambda self, *args, **kwargs: calls.append(1) or original(self, *args, **kwargs))
+    assert client.get('/me', headers=headers).json == {'user_id': 'user-123'}
+    assert calls == []
+
+def test_rotated_secret_does_not_serve_cached_claims(app):
+    """Test that a token cached under one Supabase secret is re-verified after the secret changes"""
+    token = make_token()
+    verify_supabase_token(token)
+
+    app.config['SUPABASE_JWT_SECRET'] = 'rotated-supabase-jwt-secret-of-enough-length'
+    with pytest.raises(jwt.InvalidSignatureError):
+        verify_supabase_token(token)
+
+def test_verify_keys_on_options(app):
+    """Test that claims cached without an audience check are not reused when one is required"""
+    token = make_token(aud='other-service')
+    assert token_verifier.verify(token, SECRET, options={'verify_aud': False})['sub'] == 'user-123'
+    with pytest.raises(jwt.InvalidAudienceError):
+        token_verifier.verify(token, SECRET, audience='this-service')
+
+def test_jwt_required_rechecks_after_secret_change():
+    """Test that changing JWT_SECRET_KEY invalidates tokens cached by CachedJWTManager"""
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = SECRET
+    CachedJWTManager(app)
+    token_verifier.clear()
+
+    @app.route('/me')
+    @jwt_required()
+    def me():
+        return {'user_id': get_jwt_identity()}
+
+    with app.app_context():
+        access_token = create_access_token(identity='user-123')
+
+    client = app.test_client()
+    headers = {'Authorization': f'Bearer {access_token}'}
+    assert client.get('/me', headers=headers).status_code == 200
+
+    app.config['JWT_SECRET_KEY'] = 'rotated-flask-jwt-secret-of-enough-length'
+    assert client.get('/me', headers=headers).status_code == 422
+
+def test_overridden_decode_matches_pinned_library():
+    """Test that the private method CachedJWTManager overrides still exists with the same signature"""
+    import inspect
+    import flask_jwt_extended
+
+    assert flask_jwt_extended.__version__ == '4.5.3'
+    assert (inspect.signature(JWTManager._decode_jwt_from_config)
+            == inspect.signature(CachedJWTManager._decode_jwt_from_config))
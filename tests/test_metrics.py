@@ -0,0 +1,61 @@
+import pytest
+from flask import Flask, jsonify
+from app.utils.metrics import metrics, register_request_metrics, instrument_client
+
+class FakeQuery:
+    """Minimal stand-in for a PostgREST query builder."""
+    def select(self, *args):
+        return self
+
+    def eq(self, *args):
+        return self
+
+    def execute(self):
+        return {'data': []}
+
+class FakeClient:
+    def table(self, name):
+        return FakeQuery()
+
+@pytest.fixture
+def client():
+    """Create a bare Flask app with request metrics registered"""
+    metrics.reset()
+    app = Flask(__name__)
+    register_request_metrics(app)
+    supabase = instrument_client(FakeClient())
+
+    @app.route('/companies')
+    def companies():
+        for company_id in range(3):
+            supabase.table('companies').select('*').eq('id', company_id).execute()
+        return jsonify({'companies': []})
+
+    with app.test_client() as client:
+        yield client
+
+def test_server_timing_header_counts_supabase_calls(client):
+    """Test that each execute() is reported in Server-Timing"""
+    response = client.get('/companies')
+    assert response.status_code == 200
+    header = response.headers['Server-Timing']
+    assert header.startswith('total;dur=')
+    assert 'supabase;dur=' in header
+    assert 'desc="3 calls"' in header
+
+def test_metrics_endpoint(client):
+    """Test that aggregated metrics are exposed in Prometheus format"""
+    client.get('/companies')
+    client.get('/companies')
+    response = client.get('/metrics')
+    body = response.get_data(as_text=True)
+    assert response.status_code == 200
+    assert '# TYPE http_requests_total counter' in body
+    assert 'http_requests_total{endpoint="/companies",method="GET",status="200"} 2' in body
+    assert 'http_request_dependency_calls_total{dependency="supabase",endpoint="/companies"} 6' in body
+
+def test_instrument_client_is_idempotent():
+    """Test that wrapping an instrumented client returns it unchanged"""
+    wrapped = instrument_client(FakeClient())
+    assert instrument_client(wrapped) is wrapped
+    assert instrument_client(None) is None
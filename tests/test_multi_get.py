@@ -0,0 +1,58 @@
+import asyncio
+import pytest
+from flask import Flask
+from app.models import data_type as data_type_models
+from app.models.company import Company
+from app.models.data_type import DataType
+from app.repositories.company import CompanyRepository
+from app.schemas.company import CompanySchema
+from app.schemas.data_type import DataTypeSchema
+from app.utils.reference_cache import ReferenceSnapshot
+from app.utils.request_args import parse_ids_arg
+
+@pytest.fixture
+def app():
+    return Flask(__name__)
+
+def test_ids_are_parsed_in_order_without_duplicates(app):
+    """Test that comma-separated and repeated ids are merged, keeping first occurrences"""
+    with app.test_request_context('/?ids=3,1, 3&ids=2,,1'):
+        assert parse_ids_arg() == [3, 1, 2]
+    with app.test_request_context('/'):
+        assert parse_ids_arg() is None
+
+def test_invalid_or_too_many_ids_are_rejected(app):
+    """Test that non-integer ids and lists over the limit raise ValueError"""
+    with app.test_request_context('/?ids=1,abc'):
+        with pytest.raises(ValueError):
+            parse_ids_arg()
+    with app.test_request_context('/?ids=1,2,3,3'):
+        assert parse_ids_arg(limit=3) == [1, 2, 3]
+    with app.test_request_context('/?ids=1,2,3,4'):
+        with pytest.raises(ValueError):
+            parse_ids_arg(limit=3)
+
+def test_companies_are_returned_in_request_order(monkeypatch):
+    """Test that company multi-get makes one repository call and follows the requested order"""
+    calls = []
+    async def find_by_ids(ids):
+        calls.append(list(ids))
+        return {id: CompanySchema(id=id, name=f'company-{id}') for id in ids if id != 4}
+    monkeypatch.setattr(CompanyRepository, 'find_by_ids', staticmethod(find_by_ids))
+
+    companies = asyncio.run(Company.find_by_ids([5, 4, 2, 5]))
+
+    assert [company.id for company in companies] == [5, 2]
+    assert calls == [[5, 4, 2, 5]]
+
+def test_data_types_are_resolved_from_the_reference_cache(monkeypatch):
+    """Test that data type multi-get reads the cached snapshot, accepting string ids"""
+    rows = [DataTypeSchema(id=id, name=f'type-{id}') for id in (1, 2, 3)]
+    snapshot = ReferenceSnapshot(1, rows, key=lambda row: row.id, name=lambda row: row.name)
+    async def get_snapshot():
+        return snapshot
+    monkeypatch.setattr(data_type_models.data_type_cache, 'snapshot', get_snapshot)
+
+    data_types = asyncio.run(DataType.find_by_ids(['3', 9, 1]))
+
+    assert [data_type.name for data_type in data_types] == ['type-3', 'type-1']
@@ -0,0 +1,93 @@
+import asyncio
+import pytest
+from app.schemas.data_type import DataTypeSchema
+from app.utils.cache_backends import MemoryCacheBackend, get_cache, set_cache
+from app.utils.reference_cache import ReferenceCache
+
+@pytest.fixture(autouse=True)
+def fresh_backend():
+    """Give every test an empty shared cache"""
+    previous = get_cache()
+    set_cache(MemoryCacheBackend())
+    yield
+    set_cache(previous)
+
+class FakeTable:
+    """In-memory reference table with a version counter"""
+    def __init__(self):
+        self.rows = [DataTypeSchema(id=1, name='Email'), DataTypeSchema(id=2, name='Location')]
+        self.version = 1
+        self.loads = 0
+        self.version_checks = 0
+
+    async def load(self):
+        self.loads += 1
+        return list(self.rows)
+
+    async def get_version(self):
+        self.version_checks += 1
+        return self.version
+
+def make_cache(table, check_interval=30):
+    return ReferenceCache('data_types', loader=table.load, version_loader=table.get_version,
+                          check_interval=check_interval)
+
+def test_lookups_by_id_and_name():
+    """Test that a snapshot indexes rows by id and case-insensitive name"""
+    cache = make_cache(FakeTable())
+    snapshot = asyncio.run(cache.snapshot())
+    assert snapshot.by_id[2].name == 'Location'
+    assert snapshot.by_name['email'].id == 1
+    assert 1 in snapshot.ids and 3 not in snapshot.ids
+
+def test_snapshot_is_reused_within_check_interval():
+    """Test that reads inside the interval touch neither the table nor the version"""
+    table = FakeTable()
+    cache = make_cache(table)
+    asyncio.run(cache.snapshot())
+    asyncio.run(cache.snapshot())
+    assert table.loads == 1
+    assert table.version_checks == 1
+
+def test_version_bump_triggers_reload():
+    """Test that a write made by another worker is picked up on the next version check"""
+    table = FakeTable()
+    cache = make_cache(table, check_interval=0)
+    asyncio.run(cache.snapshot())
+
+    table.rows.append(DataTypeSchema(id=3, name='Health'))
+    table.version = 2
+    snapshot = asyncio.run(cache.snapshot())
+    assert 3 in snapshot.ids
+    assert snapshot.version == 2
+    assert table.loads == 2
+
+def test_unchanged_version_does_not_reload():
+    """Test that an unchanged version keeps the current snapshot"""
+    table = FakeTable()
+    cache = make_cache(table, check_interval=0)
+    asyncio.run(cache.snapshot())
+    asyncio.run(cache.snapshot())
+    assert table.loads == 1
+
+def test_invalidate_forces_reload():
+    """Test that local writes are visible immediately after invalidate()"""
+    table = FakeTable()
+    cache = make_cache(table)
+    asyncio.run(cache.snapshot())
+    # The write's trigger bumps the version
+    table.rows.append(DataTypeSchema(id=3, name='Health'))
+    table.version = 2
+    cache.invalidate()
+    snapshot = asyncio.run(cache.snapshot())
+    assert 3 in snapshot.ids
+    assert table.loads == 2
+
+def test_other_workers_reuse_shared_rows():
+    """Test that a second process-level cache is served from the shared backend"""
+    table = FakeTable()
+    asyncio.run(make_cache(table).snapshot())
+    snapshot = asyncio.run(make_cache(table).snapshot())
+    assert snapshot.by_id[1].name == 'Email'
+    assert table.loads == 1
+    assert table.version_checks == 1
@@ -0,0 +1,71 @@
+import asyncio
+import httpx
+import pytest
+from postgrest.exceptions import APIError
+from app.utils.retry import RetryPolicy, is_retryable_error
+
+class Flaky:
+    """Callable that fails a fixed number of times before succeeding"""
+    def __init__(self, failures, error):
+        self.failures = failures
+        self.error = error
+        self.calls = 0
+
+    def __call__(self):
+        self.calls += 1
+        if self.calls <= self.failures:
+            raise self.error
+        return 'ok'
+
+def test_classifier_only_retries_transient_errors():
+    """Test that network errors and 5xx are retryable, client errors are not"""
+    assert is_retryable_error(httpx.ConnectTimeout('timeout'))
+    assert is_retryable_error(ConnectionResetError())
+    assert is_retryable_error(APIError({'code': 503, 'message': 'Service Unavailable'}))
+    assert is_retryable_error(APIError({'code': 'PGRST001', 'message': 'connection lost'}))
+    assert is_retryable_error(APIError({'code': '40001', 'message': 'serialization failure'}))
+    assert not is_retryable_error(APIError({'code': '23505', 'message': 'duplicate key'}))
+    assert not is_retryable_error(APIError({'code': 'PGRST116', 'message': '0 rows'}))
+    assert not is_retryable_error(ValueError('bad input'))
+
+def test_retries_transient_failures(monkeypatch):
+    """Test that transient failures are retried with backoff"""
+    sleeps = []
+    monkeypatch.setattr('app.utils.retry.time.sleep', sleeps.append)
+    func = Flaky(2, httpx.ReadTimeout('slow'))
+    policy = RetryPolicy(max_attempts=3, base_delay=0.1, deadline=None)
+    assert policy.call(func) == 'ok'
+    assert func.calls == 3
+    assert len(sleeps) == 2
+    assert all(0 <= delay <= 0.2 for delay in sleeps)
+
+def test_does_not_retry_permanent_failures(monkeypatch):
+    """Test that non-transient errors are raised immediately"""
+    monkeypatch.setattr('app.utils.retry.time.sleep', lambda delay: None)
+    func = Flaky(1, ValueError('bad input'))
+    with pytest.raises(ValueError):
+        RetryPolicy(max_attempts=5).call(func)
+    assert func.calls == 1
+
+def test_deadline_stops_retrying(monkeypatch):
+    """Test that no retry is attempted once the deadline would be exceeded"""
+    monkeypatch.setattr('app.utils.retry.time.sleep', lambda delay: None)
+    func = Flaky(5, httpx.ConnectError('down'))
+    policy = RetryPolicy(max_attempts=10, base_delay=1.0, deadline=0.0)
+    with pytest.raises(httpx.ConnectError):
+        policy.call(func)
+    assert func.calls == 1
+
+def test_async_variant(monkeypatch):
+    """Test that the decorator supports coroutine functions"""
+    async def no_sleep(delay):
+        return None
+    monkeypatch.setattr('app.utils.retry.asyncio.sleep', no_sleep)
+    flaky = Flaky(1, httpx.ConnectError('down'))
+
+    @RetryPolicy(max_attempts=2, deadline=None)
+    async def fetch():
+        return flaky()
+
+    assert asyncio.run(fetch()) == 'ok'
+    assert flaky.calls == 2
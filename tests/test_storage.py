@@ -0,0 +1,334 @@
+import hashlib
+import io
+import time
+import httpx
+import pytest
+from flask import Flask
+from app.services import images
+from app.services import storage as storage_module
+from app.services.storage import SupabaseStorageService
+from app.utils.cache_backends import MemoryCacheBackend, get_cache, set_cache
+
+class FakeBucket:
+    def __init__(self):
+        self.single_calls = []
+        self.batch_calls = []
+
+    def upload(self, path, data, options):
+        self.uploads = getattr(self, 'uploads', []) + [(path, data)]
+        self.upload_options = options
+        return {'Key': path}
+
+    def remove(self, paths):
+        self.removed = getattr(self, 'removed', []) + list(paths)
+        return [{'name': path} for path in paths]
+
+    def create_signed_url(self, path, expires_in):
+        self.single_calls.append(path)
+        return {'signedURL': f'https://cdn.test/{path}?token={len(self.single_calls)}'}
+
+    def create_signed_urls(self, paths, expires_in):
+        self.batch_calls.append(list(paths))
+        return [{'path': path, 'signedURL': f'https://cdn.test/{path}?batch', 'error': None} for path in paths]
+
+class FakeStorage:
+    def __init__(self, bucket):
+        self.bucket = bucket
+
+    def from_(self, name):
+        return self.bucket
+
+class FakeObjects:
+    """In-memory stand-in for the storage_objects reference counts"""
+    def __init__(self):
+        self.ref_counts = {}
+        self.uploaded = set()
+        self.removing = set()
+        self.variants = {}
+        self.variant_lookups = []
+
+    def acquire(self, sha256, path, size, content_type=None):
+        if path in self.removing:
+            return 'removing'
+        self.ref_counts[path] = self.ref_counts.get(path, 0) + 1
+        return 'exists' if path in self.uploaded else 'upload'
+
+    def mark_uploaded(self, path):
+        self.uploaded.add(path)
+        return True
+
+    def release(self, path):
+        remaining = max(self.ref_counts.pop(path, 0) - 1, 0)
+        if remaining:
+            self.ref_counts[path] = remaining
+        else:
+            self.removing.add(path)
+        return remaining
+
+    def purge(self, path):
+        self.removing.discard(path)
+        self.uploaded.discard(path)
+        return True
+
+    def get_variants(self, paths):
+        self.variant_lookups.append(list(paths))
+        return {path: self.variants.get(path, []) for path in paths}
+
+    def set_variants(self, path, variants):
+        self.variants[path] = list(variants)
+        return True
+
+class FakeSupabase:
+    supabase_url = 'https://project.supabase.co'
+    supabase_key = 'service-key'
+
+    def __init__(self, bucket):
+        self.storage = FakeStorage(bucket)
+
+@pytest.fixture
+def service():
+    """Storage service wired to a fake bucket, skipping the bucket check"""
+    previous = get_cache()
+    set_cache(MemoryCacheBackend())
+    bucket = FakeBucket()
+    service = object.__new__(SupabaseStorageService)
+    service.supabase = FakeSupabase(bucket)
+    service.bucket = 'uploads'
+    service._url_expirations = {3600}
+    service.objects = FakeObjects()
+    app = Flask(__name__)
+    app.config['STORAGE_UPLOAD_CHUNK_SIZE'] = 4
+    with app.app_context():
+        yield service, bucket
+    set_cache(previous)
+
+def test_signed_url_is_cached(service):
+    """Test that a second lookup does not call storage"""
+    service, bucket = service
+    first = service.get_file_url('logo.png')
+    second = service.get_file_url('logo.png')
+    assert first == second
+    assert bucket.single_calls == ['logo.png']
+
+def test_get_file_urls_signs_misses_in_one_batch(service):
+    """Test that only uncached files are signed, in a single call"""
+    service, bucket = service
+    service.get_file_url('a.png')
+    urls = service.get_file_urls(['a.png', 'b.png', 'c.png', 'b.png'])
+    assert set(urls) == {'a.png', 'b.png', 'c.png'}
+    assert bucket.batch_calls == [['b.png', 'c.png']]
+
+def test_urls_near_expiry_are_refreshed_in_background(service, monkeypatch):
+    """Test that a URL past its refresh point is served and re-signed asynchronously"""
+    service, bucket = service
+    stale_url = service.get_file_url('logo.png')
+    entry = get_cache().get('signed_url:uploads:logo.png:3600')
+    get_cache().set('signed_url:uploads:logo.png:3600', {**entry, 'refresh_at': time.time() - 1}, ttl=60)
+
+    assert service.get_file_url('logo.png') == stale_url
+    deadline = time.time() + 5
+    while len(bucket.single_calls) < 2 and time.time() < deadline:
+        time.sleep(0.01)
+    assert len(bucket.single_calls) == 2
+    time.sleep(0.05)
+    assert service.get_file_url('logo.png') != stale_url
+
+def test_resolve_logo_urls_uses_one_round_trip(service, monkeypatch):
+    """Test that a company list signs all stored logos together and keeps absolute URLs"""
+    service, bucket = service
+    monkeypatch.setattr(SupabaseStorageService, 'get_instance', classmethod(lambda cls: service))
+    companies = storage_module.resolve_logo_urls([
+        {'id': 1, 'logo': 'logos/a.png'},
+        {'id': 2, 'logo': 'logos/b.png'},
+        {'id': 3, 'logo': 'https://example.com/c.png'},
+        {'id': 4, 'logo': None},
+    ])
+    assert bucket.batch_calls == [['logos/a.png', 'logos/b.png']]
+    assert companies[0]['logo_url'] == 'https://cdn.test/logos/a.png?batch'
+    assert companies[2]['logo_url'] == 'https://example.com/c.png'
+    assert companies[3]['logo_url'] is None
+
+class TusServer:
+    """Minimal resumable-upload endpoint recording what it receives"""
+    def __init__(self):
+        self.created = None
+        self.chunks = []
+        self.offset = 0
+
+    def handle(self, request):
+        if request.method == 'POST':
+            self.created = request.headers
+            return httpx.Response(201, headers={'Location': 'https://project.supabase.co/upload/1'})
+        assert int(request.headers['Upload-Offset']) == self.offset
+        self.chunks.append(request.content)
+        self.offset += len(request.content)
+        return httpx.Response(204, headers={'Upload-Offset': str(self.offset)})
+
+class ChunkedReader(io.RawIOBase):
+    """Non-seekable stream that tracks the largest read requested"""
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+        self.largest_read = 0
+
+    def readable(self):
+        return True
+
+    def read(self, size=-1):
+        self.largest_read = max(self.largest_read, size)
+        return self._data.read(size)
+
+def test_small_stream_uploads_in_one_request(service):
+    """Test that a stream shorter than a chunk uses the regular upload"""
+    service, bucket = service
+    info = service.upload_file(io.BytesIO(b'abc'), 'small.txt')
+    assert bucket.uploads == [('small.txt', b'abc')]
+    assert info['size'] == 3
+    assert info['sha256'] == hashlib.sha256(b'abc').hexdigest()
+
+def test_large_stream_uploads_in_bounded_chunks(service, monkeypatch):
+    """Test that a large stream is sent as fixed-size TUS chunks with an incremental hash"""
+    service, bucket = service
+    server = TusServer()
+    real_client = httpx.Client
+    monkeypatch.setattr(httpx, 'Client', lambda **kwargs: real_client(transport=httpx.MockTransport(server.handle)))
+
+    data = b'0123456789'
+    stream = ChunkedReader(data)
+    info = service.upload_stream(stream, 'big.bin')
+
+    assert server.chunks == [b'0123', b'4567', b'89']
+    assert stream.largest_read == 4
+    assert server.created['Upload-Defer-Length'] == '1'
+    assert info['size'] == 10
+    assert info['sha256'] == hashlib.sha256(data).hexdigest()
+    assert not getattr(bucket, 'uploads', [])
+
+def test_seekable_stream_declares_length(service, monkeypatch):
+    """Test that the upload length is declared up front when the stream can report it"""
+    service, bucket = service
+    server = TusServer()
+    real_client = httpx.Client
+    monkeypatch.setattr(httpx, 'Client', lambda **kwargs: real_client(transport=httpx.MockTransport(server.handle)))
+
+    service.upload_stream(io.BytesIO(b'0123456789'), 'big.bin')
+    assert server.created['Upload-Length'] == '10'
+
+def test_identical_content_is_uploaded_once(service):
+    """Test that storing the same content twice uploads it once under its hash"""
+    service, bucket = service
+    first = service.upload_file(b'logo')
+    second = service.store_content(io.BytesIO(b'logo'))
+    digest = hashlib.sha256(b'logo').hexdigest()
+    assert first['name'] == second['name'] == f'sha256/{digest}'
+    assert bucket.uploads == [(f'sha256/{digest}', b'logo')]
+    assert bucket.upload_options['cache-control'] == str(storage_module.CONTENT_CACHE_MAX_AGE)
+    assert not first['deduplicated'] and second['deduplicated']
+
+def test_non_seekable_stream_is_spooled_before_upload(service, monkeypatch):
+    """Test that a forward-only stream is hashed and then uploaded in full"""
+    service, bucket = service
+    server = TusServer()
+    real_client = httpx.Client
+    monkeypatch.setattr(httpx, 'Client', lambda **kwargs: real_client(transport=httpx.MockTransport(server.handle)))
+
+    data = b'0123456789'
+    info = service.store_content(ChunkedReader(data))
+    assert info['name'] == f'sha256/{hashlib.sha256(data).hexdigest()}'
+    assert b''.join(server.chunks) == data
+    assert 'cacheControl' in server.created['Upload-Metadata']
+
+def test_failed_upload_releases_reference(service, monkeypatch):
+    """Test that a reference taken for a failed upload is dropped again"""
+    service, bucket = service
+    monkeypatch.setattr(bucket, 'upload', lambda *args: (_ for _ in ()).throw(RuntimeError('down')))
+    with pytest.raises(RuntimeError):
+        service.store_content(b'logo')
+    assert service.objects.ref_counts == {}
+
+def test_reference_taken_during_an_upload_uploads_too(service):
+    """Test that content still being uploaded by another caller is uploaded again, not assumed stored"""
+    service, bucket = service
+    digest = hashlib.sha256(b'logo').hexdigest()
+    name = f'sha256/{digest}'
+    assert service.objects.acquire(digest, name, 4) == 'upload'
+
+    info = service.store_content(b'logo')
+    # The first upload fails and drops its reference
+    assert service.delete_file(name)
+
+    assert not info['deduplicated']
+    assert bucket.uploads == [(name, b'logo')]
+    assert not getattr(bucket, 'removed', [])
+    assert service.store_content(b'logo')['deduplicated']
+
+def test_upload_waits_for_the_removal_of_the_last_reference(service, monkeypatch):
+    """Test that content whose object is being removed is stored again once the removal is done"""
+    service, bucket = service
+    monkeypatch.setattr(storage_module, 'ACQUIRE_RETRY_DELAY', 0)
+    name = service.store_content(b'logo')['name']
+    remove = bucket.remove
+    def remove_while_uploading(paths):
+        # Another request stores the same content between release and removal
+        assert service.objects.acquire(None, name, 4) == 'removing'
+        return remove(paths)
+    monkeypatch.setattr(bucket, 'remove', remove_while_uploading)
+
+    assert service.delete_file(name)
+    info = service.store_content(b'logo')
+
+    assert not info['deduplicated']
+    assert bucket.uploads == [(name, b'logo'), (name, b'logo')]
+    assert service.objects.ref_counts == {name: 1}
+
+def test_shared_content_is_removed_with_last_reference(service):
+    """Test that deleting shared content only removes the object once unreferenced"""
+    service, bucket = service
+    name = service.store_content(b'logo')['name']
+    service.store_content(b'logo')
+    assert service.delete_file(name)
+    assert not getattr(bucket, 'removed', [])
+    assert service.delete_file(name)
+    assert bucket.removed[0] == name
+
+def test_deleting_content_removes_its_logo_variants(service):
+    """Test that derivatives are removed along with the last reference to a logo"""
+    service, bucket = service
+    name = service.store_content(b'logo')['name']
+    service.delete_file(name)
+    digest = name.split('/', 1)[1]
+    assert bucket.removed == [name, f'variants/{digest}/thumbnail.webp', f'variants/{digest}/medium.webp']
+
+def test_resolve_logo_urls_signs_only_recorded_variants(service, monkeypatch):
+    """Test that only variants recorded as generated are signed and missing ones are scheduled"""
+    service, bucket = service
+    monkeypatch.setattr(SupabaseStorageService, 'get_instance', classmethod(lambda cls: service))
+    scheduled = []
+    monkeypatch.setattr(images, 'schedule_logo_variants', scheduled.append)
+    logo = 'sha256/' + 'ab' * 32
+    service.objects.variants[logo] = ['thumbnail']
+
+    company, external = storage_module.resolve_logo_urls([
+        {'id': 1, 'logo': logo},
+        {'id': 2, 'logo': 'https://example.com/c.png'},
+    ])
+
+    thumbnail = storage_module.logo_variant_path(logo, 'thumbnail')
+    assert bucket.batch_calls == [[logo, thumbnail]]
+    assert company['logo_variants'] == {'thumbnail': f'https://cdn.test/{thumbnail}?batch'}
+    assert external['logo_variants'] == {}
+    assert scheduled == [logo]
+
+def test_complete_variants_are_cached(service, monkeypatch):
+    """Test that logos with every variant are neither looked up again nor scheduled"""
+    service, bucket = service
+    monkeypatch.setattr(SupabaseStorageService, 'get_instance', classmethod(lambda cls: service))
+    scheduled = []
+    monkeypatch.setattr(images, 'schedule_logo_variants', scheduled.append)
+    logo = 'sha256/' + 'ab' * 32
+    assert service.record_logo_variants(logo, ['medium', 'thumbnail'])
+
+    company, = storage_module.resolve_logo_urls([{'id': 1, 'logo': logo}])
+
+    assert set(company['logo_variants']) == {'thumbnail', 'medium'}
+    assert service.objects.variant_lookups == []
+    assert scheduled == []
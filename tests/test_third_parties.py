@@ -0,0 +1,105 @@
+import asyncio
+import pytest
+from app.models import company as company_models
+from app.models.company import Company, DataSharingPolicy
+from app.repositories.company import CompanyRepository, DataSharingPolicyRepository
+from app.schemas.company import DataSharingPolicySchema
+
+@pytest.fixture
+def third_parties(monkeypatch):
+    """An in-memory data_sharing_third_parties table for policy 1, recording every write."""
+    state = {'rows': {2, 3, 4}, 'writes': [], 'invalidated': 0, 'refreshed': []}
+    async def get_third_party_ids(policy_id):
+        return sorted(state['rows'])
+    async def add_third_parties(policy_id, company_ids):
+        company_ids = list(company_ids)
+        state['writes'].append(('insert', company_ids))
+        added = [id for id in company_ids if id not in state['rows']]
+        state['rows'].update(added)
+        return added
+    async def remove_third_parties(policy_id, company_ids):
+        company_ids = list(company_ids)
+        state['writes'].append(('delete', company_ids))
+        removed = [id for id in company_ids if id in state['rows']]
+        state['rows'].difference_update(removed)
+        return removed
+    async def refresh_policy_exposure(policy_id):
+        state['refreshed'].append(policy_id)
+    def invalidate_company_graph():
+        state['invalidated'] += 1
+    monkeypatch.setattr(DataSharingPolicyRepository, 'get_third_party_ids', staticmethod(get_third_party_ids))
+    monkeypatch.setattr(DataSharingPolicyRepository, 'add_third_parties', staticmethod(add_third_parties))
+    monkeypatch.setattr(DataSharingPolicyRepository, 'remove_third_parties', staticmethod(remove_third_parties))
+    monkeypatch.setattr(company_models, 'refresh_policy_exposure', refresh_policy_exposure)
+    monkeypatch.setattr(company_models, 'invalidate_company_graph', invalidate_company_graph)
+    return state
+
+def policy():
+    return DataSharingPolicy(DataSharingPolicySchema(id=1, company_id=9, data_type_id=5, purpose='Billing'))
+
+def test_replacing_third_parties_writes_only_the_difference(third_parties):
+    """Test that a PUT-style replace issues one insert and one delete for the diff"""
+    added, removed = asyncio.run(policy().set_third_parties([3, 5, 6, 5]))
+
+    assert (added, removed) == ([5, 6], [2, 4])
+    assert third_parties['writes'] == [('insert', [5, 6]), ('delete', [2, 4])]
+    assert third_parties['rows'] == {3, 5, 6}
+    assert third_parties['invalidated'] == 1
+    assert third_parties['refreshed'] == [1]
+
+def test_unchanged_third_parties_skip_invalidation(third_parties):
+    """Test that attaching companies that are already attached changes nothing downstream"""
+    assert asyncio.run(policy().add_third_parties([2, 3])) == []
+    assert asyncio.run(policy().set_third_parties([4, 3, 2])) == ([], [])
+
+    assert third_parties['invalidated'] == 0
+    assert third_parties['refreshed'] == []
+
+def test_new_policy_is_refreshed_once_with_its_third_parties(third_parties, monkeypatch):
+    """Test that creating a policy attaches its third parties before a single exposure refresh"""
+    async def create(schema):
+        return DataSharingPolicySchema(id=1, company_id=schema.company_id, data_type_id=schema.data_type_id,
+                                       purpose=schema.purpose)
+    monkeypatch.setattr(DataSharingPolicyRepository, 'create', staticmethod(create))
+    third_parties['rows'].clear()
+
+    new_policy = DataSharingPolicy(DataSharingPolicySchema(company_id=9, data_type_id=5, purpose='Billing'))
+    asyncio.run(new_policy.save([3, 4]))
+
+    assert third_parties['writes'] == [('insert', [3, 4])]
+    assert third_parties['invalidated'] == 1
+    assert third_parties['refreshed'] == [1]
+
+def test_missing_companies_are_found_with_one_lookup(monkeypatch):
+    """Test that third-party validation reads all ids at once and reports the missing ones in order"""
+    lookups = []
+    async def find_existing_ids(ids):
+        lookups.append(list(ids))
+        return {1, 3}
+    monkeypatch.setattr(CompanyRepository, 'find_existing_ids', staticmethod(find_existing_ids))
+
+    assert asyncio.run(Company.find_missing_ids([7, 1, 3, 2, 7])) == [7, 2]
+    assert lookups == [[7, 1, 3, 2, 7]]
+
+def test_adding_third_parties_is_a_single_insert(monkeypatch):
+    """Test that the repository attaches all companies in one upsert that ignores duplicates"""
+    calls = []
+    class Query:
+        def upsert(self, rows, **options):
+            calls.append((rows, options))
+            return self
+    class Response:
+        data = [{'policy_id': 1, 'company_id': 3}]
+    class Client:
+        def table(self, name):
+            return Query()
+    monkeypatch.setattr('app.repositories.company.get_supabase', lambda: Client())
+    monkeypatch.setattr('app.repositories.company.traced_execute', lambda query: Response())
+
+    added = asyncio.run(DataSharingPolicyRepository.add_third_parties(1, [2, 3, 2]))
+
+    assert added == [3]
+    assert calls == [(
+        [{'policy_id': 1, 'company_id': 2}, {'policy_id': 1, 'company_id': 3}],
+        {'on_conflict': 'policy_id,company_id', 'ignore_duplicates': True}
+    )]
@@ -0,0 +1,87 @@
+import pytest
+from flask import Flask
+from flask_jwt_extended import JWTManager, create_access_token
+from app.models import user as user_model
+from app.schemas.user import TokenPackageSchema
+from app.utils.cache_backends import MemoryCacheBackend, get_cache, set_cache
+
+pytest.importorskip('asgiref')  # Async views need Flask's async extra
+pytest.importorskip('fastapi')  # Imported by app.api
+
+class FakePackageRepository:
+    """token_packages table whose writes bump the reference-data version, like its trigger"""
+    packages = []
+    version = 1
+    loads = 0
+
+    async def get_all(self, raise_errors=False):
+        FakePackageRepository.loads += 1
+        return list(FakePackageRepository.packages)
+
+    async def get_version(self):
+        return FakePackageRepository.version
+
+    async def create(self, package):
+        saved = package.model_copy(update={'id': len(FakePackageRepository.packages) + 1})
+        FakePackageRepository.packages.append(saved)
+        FakePackageRepository.version += 1
+        return saved
+
+@pytest.fixture
+def client(monkeypatch):
+    """The tokens blueprint with the package repository replaced and user 1 cached as an admin"""
+    from app.api.v1 import tokens
+    FakePackageRepository.packages = [TokenPackageSchema(id=1, name='Starter', amount=100, price=9.99)]
+    FakePackageRepository.version = 1
+    FakePackageRepository.loads = 0
+    monkeypatch.setattr(user_model, 'TokenPackageRepository', FakePackageRepository)
+    monkeypatch.setattr(tokens, 'TokenPackageRepository', FakePackageRepository)
+    previous = get_cache()
+    set_cache(MemoryCacheBackend())
+    user_model.TokenPackage.invalidate_catalog()
+
+    app = Flask(__name__)
+    app.config['JWT_SECRET_KEY'] = 'test-secret-' + 'x' * 32
+    app.config['TOKEN_PACKAGES_MAX_AGE'] = 60
+    app.supabase = None  # The admin role is served from the cache below
+    JWTManager(app)
+    app.register_blueprint(tokens.tokens_bp, url_prefix='/api/v1/tokens')
+    with app.app_context():
+        app.admin_token = create_access_token(identity='1')
+    get_cache().set('admin_role:1', True)
+
+    with app.test_client() as client:
+        client.application = app
+        yield client
+    user_model.TokenPackage.invalidate_catalog()
+    set_cache(previous)
+
+def test_catalog_is_loaded_once(client):
+    """Test that repeated catalog reads are served from the cache"""
+    client.get('/api/v1/tokens/packages')
+    client.get('/api/v1/tokens/packages')
+    assert FakePackageRepository.loads == 1
+
+def test_catalog_revalidates_with_etag(client):
+    """Test that a matching If-None-Match gets 304 with no body"""
+    response = client.get('/api/v1/tokens/packages')
+    etag = response.headers['ETag']
+    assert etag == '"token-packages-1"'
+    assert response.headers['Cache-Control'] == 'public, max-age=60, must-revalidate'
+
+    revalidated = client.get('/api/v1/tokens/packages', headers={'If-None-Match': etag})
+    assert revalidated.status_code == 304
+    assert revalidated.data == b''
+
+def test_admin_write_changes_the_etag(client):
+    """Test that creating a package reloads the catalog under a new version-based ETag"""
+    etag = client.get('/api/v1/tokens/packages').headers['ETag']
+
+    created = client.post('/api/v1/tokens/packages', json={'name': 'Pro', 'amount': 500, 'price': 39.0},
+                          headers={'Authorization': f'Bearer {client.application.admin_token}'})
+    assert created.status_code == 201
+
+    response = client.get('/api/v1/tokens/packages', headers={'If-None-Match': etag})
+    assert response.status_code == 200
+    assert response.headers['ETag'] == '"token-packages-2"'
+    assert [package['name'] for package in response.get_json()] == ['Starter', 'Pro']
@@ -0,0 +1,67 @@
+import pytest
+from httpx import QueryParams
+from app.utils.tracing import QueryTracer, query_tracer, traced_execute
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+class FakeQuery:
+    """Stand-in for a PostgREST query builder."""
+    def __init__(self, path, http_method='GET', params=None, json=None, data=None, error=None):
+        self.path = path
+        self.http_method = http_method
+        self.params = QueryParams(params or {})
+        self.json = json
+        self.headers = {}
+        self._data = data if data is not None else []
+        self._error = error
+
+    def execute(self):
+        if self._error:
+            raise self._error
+        return FakeResponse(self._data)
+
+@pytest.fixture
+def tracer():
+    """Make every query count as slow so it lands in the buffer"""
+    previous = query_tracer.slow_threshold_ms
+    query_tracer.slow_threshold_ms = 0
+    query_tracer.clear()
+    yield query_tracer
+    query_tracer.slow_threshold_ms = previous
+    query_tracer.clear()
+
+def test_traced_execute_captures_query_details(tracer):
+    """Test that table, operation, filters and row count are recorded"""
+    query = FakeQuery('/companies', params={'select': '*', 'id': 'eq.3'}, data=[{'id': 3}])
+    response = traced_execute(query)
+    assert response.data == [{'id': 3}]
+
+    trace = tracer.slow_queries()[0]
+    assert trace['table'] == 'companies'
+    assert trace['operation'] == 'select'
+    assert trace['filters'] == {'id': 'eq.3'}
+    assert trace['row_count'] == 1
+    assert trace['payload_size'] == 0
+
+def test_traced_execute_records_rpc_and_errors(tracer):
+    """Test that failed RPC calls are traced and re-raised"""
+    query = FakeQuery('/rpc/adjust_user_tokens', 'POST', json={'p_amount': 5},
+                      error=RuntimeError('boom'))
+    with pytest.raises(RuntimeError):
+        traced_execute(query)
+
+    trace = tracer.slow_queries()[0]
+    assert trace['table'] == 'adjust_user_tokens'
+    assert trace['operation'] == 'rpc'
+    assert trace['payload_size'] > 0
+    assert trace['error'] == 'boom'
+
+def test_slow_query_buffer_is_bounded():
+    """Test that the ring buffer keeps only the newest entries"""
+    tracer = QueryTracer(slow_threshold_ms=0, buffer_size=2)
+    for i in range(3):
+        tracer.record({'table': 't', 'operation': 'select', 'filters': {}, 'row_count': i,
+                       'duration_ms': 1.0})
+    assert [t['row_count'] for t in tracer.slow_queries()] == [2, 1]
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from postgrest.exceptions import APIError as PostgrestAPIError
+from app.repositories.user import UserRepository
+from app.utils.error_handlers import ValidationError
+
+class FakeResponse:
+    def __init__(self, data):
+        self.data = data
+
+class FakeRpc:
+    """Stand-in for a PostgREST RPC builder."""
+    def __init__(self, name, params, result):
+        self.path = f'/rpc/{name}'
+        self.http_method = 'POST'
+        self.params = None
+        self.json = params
+        self.headers = {}
+        self._result = result
+
+    def execute(self):
+        if isinstance(self._result, Exception):
+            raise self._result
+        return FakeResponse(self._result)
+
+class FakeClient:
+    def __init__(self, result):
+        self.result = result
+        self.calls = []
+
+    def rpc(self, name, params):
+        self.calls.append((name, params))
+        return FakeRpc(name, params, self.result)
+
+def test_adjust_tokens_is_a_single_rpc_call():
+    """Test that adjusting a balance issues one RPC and returns the new balance"""
+    client = FakeClient(result=150)
+    balance = asyncio.run(UserRepository(client).adjust_tokens(7, 50, reason='purchase', package_id=3))
+    assert balance == 150
+    assert client.calls == [('adjust_user_tokens', {
+        'p_user_id': 7, 'p_delta': 50, 'p_reason': 'purchase', 'p_package_id': 3
+    })]
+
+def test_adjust_tokens_reports_insufficient_balance():
+    """Test that the check_violation raised by the function becomes a ValidationError"""
+    client = FakeClient(result=PostgrestAPIError({'code': '23514', 'message': 'Insufficient tokens'}))
+    with pytest.raises(ValidationError):
+        asyncio.run(UserRepository(client).adjust_tokens(7, -500))
+
+def test_adjust_tokens_returns_none_for_unknown_user():
+    """Test that a missing user yields None"""
+    client = FakeClient(result=PostgrestAPIError({'code': 'P0002', 'message': 'User not found'}))
+    assert asyncio.run(UserRepository(client).adjust_tokens(99, 10)) is None
+
+def test_credit_tokens_bulk_maps_balances_by_user():
+    """Test that bulk credits return the new balance per user"""
+    client = FakeClient(result=[{'user_id': 1, 'tokens': 20}, {'user_id': 2, 'tokens': 35}])
+    grants = [{'user_id': 1, 'amount': 10}, {'user_id': 2, 'amount': 5}]
+    balances = asyncio.run(UserRepository(client).credit_tokens_bulk(grants, reason='promo'))
+    assert balances == {1: 20, 2: 35}
+    assert client.calls[0][0] == 'credit_user_tokens_bulk'
+
+def test_token_balances_are_cached_per_process(monkeypatch):
+    """Test that balances are read through the ledger once and then served from the cache"""
+    from flask import Flask
+    from app.models import user as user_model
+
+    client = FakeClient(result=[{'user_id': 4, 'tokens': 12}])
+    monkeypatch.setattr(user_model, 'get_supabase_admin', lambda: client)
+    user_model._token_balance_cache.clear()
+    with Flask(__name__).app_context():
+        first = asyncio.run(user_model.User.get_token_balances([4]))
+        second = asyncio.run(user_model.User.get_token_balances([4]))
+    user_model._token_balance_cache.clear()
+    assert first == second == {'4': 12}
+    assert [name for name, _ in client.calls] == ['get_token_balances']
+
+def test_loaded_users_report_the_ledger_balance(monkeypatch):
+    """Test that users are loaded with their ledger balance rather than the compaction snapshot"""
+    from flask import Flask
+    from app.models import user as user_model
+    from app.schemas.user import UserSchema
+
+    async def find_by_id(self, id):
+        return UserSchema(id=4, email='ada@example.com', password_hash='x',
+                          first_name='Ada', last_name='Lovelace', tokens=3)
+    client = FakeClient(result=[{'user_id': 4, 'tokens': 12}])
+    monkeypatch.setattr('app.repositories.user.get_supabase', lambda: client)
+    monkeypatch.setattr(UserRepository, 'find_by_id', find_by_id)
+    monkeypatch.setattr(user_model, 'get_supabase_admin', lambda: client)
+    user_model._token_balance_cache.clear()
+    with Flask(__name__).app_context():
+        user = asyncio.run(user_model.User.find_by_id(4))
+        # Even once the per-process cache has expired
+        user_model._token_balance_cache.clear()
+        assert user.tokens == 12
+        assert user.to_dict()['tokens'] == 12
+        assert 'password_hash' not in user.to_dict()
+
+def test_update_tokens_sends_the_absolute_balance(monkeypatch):
+    """Test that setting a balance passes the target to the server instead of a delta from the cached balance"""
+    from flask import Flask
+    from app.models import user as user_model
+    from app.schemas.user import UserSchema
+
+    client = FakeClient(result=40)
+    monkeypatch.setattr(user_model, 'get_supabase_admin', lambda: client)
+    monkeypatch.setattr('app.repositories.user.get_supabase', lambda: client)
+    user_model._token_balance_cache.clear()
+    with Flask(__name__).app_context():
+        user = user_model.User(UserSchema(id=4, email='ada@example.com', password_hash='x',
+                                          first_name='Ada', last_name='Lovelace', tokens=3))
+        # A stale cached balance must not influence the write
+        user_model._token_balance_cache.set('4', 999)
+        assert asyncio.run(user.update_tokens(40))
+        assert asyncio.run(user.get_token_balance()) == 40
+    user_model._token_balance_cache.clear()
+    assert client.calls == [('set_user_tokens', {
+        'p_user_id': 4, 'p_tokens': 40, 'p_reason': 'manual_adjustment'
+    })]